@@ -0,0 +1,71 @@
+"""Benchmark of the matplotlib and the anti-aliased polygon rasterizer."""
+from time import perf_counter
+
+
+def benchmark_rasterizers(cell_count=200, repeats=5):
+    import numpy as np
+
+    from cellsium.cli import initialize_cells, initialize_simulator
+    from cellsium.output.render import (
+        get_canvas_points_raw,
+        new_canvas,
+        render_on_canvas_antialiased,
+        render_on_canvas_matplotlib,
+    )
+    from cellsium.parameters import Height, NewCellRadiusFromCenter, Width
+
+    NewCellRadiusFromCenter.value = min(Width.value, Height.value) / 2
+
+    simulator = initialize_simulator()
+    initialize_cells(simulator, count=cell_count)
+    simulator.simulation.world.commit()
+
+    for cell in simulator.simulation.world.cells:
+        cell.position = [
+            cell.position[0] + Width.value / 2,
+            cell.position[1] + Height.value / 2,
+        ]
+
+    shape = new_canvas().shape
+    array_of_points = [
+        get_canvas_points_raw(cell, shape[0])
+        for cell in simulator.simulation.world.cells
+    ]
+
+    results = {}
+
+    for name, rasterizer in [
+        ('matplotlib', render_on_canvas_matplotlib),
+        ('antialiased', render_on_canvas_antialiased),
+    ]:
+        durations = []
+        for _ in range(repeats):
+            before = perf_counter()
+            image = rasterizer(new_canvas(), array_of_points)
+            durations.append(perf_counter() - before)
+
+        results[name] = image
+
+        print(
+            f"{name:>12}: {min(durations) * 1000.0:8.2f} ms per frame "
+            f"({cell_count} cells, {shape[1]}x{shape[0]} px)"
+        )
+
+    difference = np.abs(results['matplotlib'] - results['antialiased'])
+
+    print(
+        f"mean absolute difference: {difference.mean():.5f}, "
+        f"coverage sum ratio: "
+        f"{results['antialiased'].sum() / results['matplotlib'].sum():.4f}"
+    )
+
+    return results
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) == 1:
+        benchmark_rasterizers()
+    else:
+        benchmark_rasterizers(cell_count=int(sys.argv[1]))
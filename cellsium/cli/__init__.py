@@ -90,3 +90,18 @@ def add_output_prefix(output_name: str, output: Output) -> str:
     )
 
     return str(output_name)
+
+
+def add_field_of_view_prefix(output_name: str, number: int) -> str:
+    """
+    Adds the number of a field of view as prefix to an output filename.
+
+    :param output_name: Output name
+    :param number: Number of the field of view
+    :return: Name
+    """
+    output_name = Path(output_name)
+
+    output_name = output_name.parent / ("FOV%03d-" % (number,) + output_name.name)
+
+    return str(output_name)
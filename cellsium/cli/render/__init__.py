@@ -1,10 +1,13 @@
-"""Rendering CLI utility, render a simulation state saved using jsonpickle."""
+"""Rendering CLI utility, render a saved simulation state (jsonpickle or columnar)."""
 
+import zipfile
 from argparse import ArgumentParser, Namespace
 
 import jsonpickle
 
 from ...output import Output
+from ...output.serialization import WorldArchive
+from ...output.writer import flush_writes
 
 
 def subcommand_argparser(parser: ArgumentParser) -> None:
@@ -26,9 +29,18 @@ def subcommand_main(args: Namespace) -> None:
     """
     output = Output()
 
-    with open(args.input, 'r') as fp:
-        data = fp.read()
+    if zipfile.is_zipfile(args.input):
+        with WorldArchive(args.input) as archive:
+            data = archive.world()
+    else:
+        with open(args.input, 'r') as fp:
+            data = fp.read()
 
-    data = jsonpickle.decode(data)
+        data = jsonpickle.decode(data)
 
-    output.write(data, args.output)
+    try:
+        output.write(data, args.output)
+    finally:
+        output.close()
+
+        flush_writes()
@@ -4,15 +4,22 @@ import sys
 from argparse import Namespace
 from functools import partial, reduce
 from time import time
-from typing import Callable, Iterable, Iterator, Optional, Tuple, TypeVar
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar
 
 import numpy as np
 from tunable import Tunable
 
-from ...output import Output
-from ...parameters import NewCellCount, h_to_s, s_to_h
+from ...output import FrameContext, Output
+from ...output.parallel import RenderScheduler, new_render_scheduler_from_tunables
+from ...output.writer import flush_writes
+from ...parameters import Height, NewCellCount, Width, h_to_s, s_to_h
 from ...simulation.simulator import Simulator, Timestep, World
-from .. import add_output_prefix, initialize_cells, initialize_simulator
+from .. import (
+    add_field_of_view_prefix,
+    add_output_prefix,
+    initialize_cells,
+    initialize_simulator,
+)
 
 
 class SimulationDuration(Tunable):
@@ -51,6 +58,22 @@ class BoundariesScaleFactor(Tunable):
     default: float = 1.0
 
 
+class FieldsOfView(Tunable):
+    """Offsets 'x,y;x,y;...' of fields of view, or 'boundaries' to center one on each"""
+
+    default: str = ""
+
+    @classmethod
+    def test(cls, value: str) -> bool:
+        try:
+            parse_fields_of_view(value)
+        except ValueError:
+            return False
+        return True
+
+
+FieldOfView = Tuple[float, float]
+
 log = logging.getLogger(__name__)
 
 
@@ -110,6 +133,64 @@ def add_boundaries_from_tunables(simulator: Simulator) -> Simulator:
     return simulator
 
 
+def parse_fields_of_view(value: str) -> List[FieldOfView]:
+    """
+    Parses a list of field of view offsets.
+
+    :param value: Offsets as 'x,y;x,y;...' or 'boundaries'
+    :return: List of offsets, empty if value is empty or 'boundaries'
+    """
+    value = value.strip()
+
+    if value in ('', 'boundaries'):
+        return []
+
+    fields_of_view = []
+
+    for offset in value.split(';'):
+        x, y = offset.split(',')
+        fields_of_view.append((float(x), float(y)))
+
+    return fields_of_view
+
+
+def fields_of_view_from_boundaries(
+    boundaries: Iterable[np.ndarray], width: float, height: float
+) -> List[FieldOfView]:
+    """
+    Creates one field of view centered on each boundary (e.g. a chamber).
+
+    :param boundaries: Boundaries
+    :param width: Width of the fields of view
+    :param height: Height of the fields of view
+    :return: List of offsets
+    """
+    fields_of_view = []
+
+    for boundary in boundaries:
+        center = (boundary[:, :2].min(axis=0) + boundary[:, :2].max(axis=0)) / 2.0
+        fields_of_view.append(
+            (float(center[0] - width / 2.0), float(center[1] - height / 2.0))
+        )
+
+    return fields_of_view
+
+
+def fields_of_view_from_tunables(world: World) -> List[FieldOfView]:
+    """
+    Determines the fields of view to output from tunables.
+
+    :param world: World, whose boundaries might define the fields of view
+    :return: List of offsets, empty to output the world as is
+    """
+    if FieldsOfView.value.strip() == 'boundaries':
+        return fields_of_view_from_boundaries(
+            world.boundaries, Width.value, Height.value
+        )
+
+    return parse_fields_of_view(FieldsOfView.value)
+
+
 def prepare_output_name(output_name: str, output: Output, prefix: str) -> str:
     """
     Prepare an output name.
@@ -132,6 +213,7 @@ def perform_outputs(
     overwrite: bool = False,
     prefix: bool = False,
     output_count: int = 0,
+    scheduler: Optional[RenderScheduler] = None,
 ) -> None:
     """
     Performs the output operations configured.
@@ -143,9 +225,14 @@ def perform_outputs(
     :param overwrite: Whether to overwrite
     :param prefix: Whether to prefix the outputs with the name of the Output type
     :param output_count: The count of already outputted timesteps
+    :param scheduler: Optional RenderScheduler to render in the background
     :return: None
     """
     log.debug("Outputting simulation state at %.2f h" % (s_to_h(simulation_time),))
+
+    # products shared between all outputs of this simulation state
+    context = FrameContext(world, scheduler=scheduler)
+
     for output in outputs:
         output_before = time()
 
@@ -156,9 +243,10 @@ def perform_outputs(
                 time=simulation_time,
                 output_count=output_count,
                 overwrite=overwrite,
+                context=context,
             )
         else:
-            output.display(world)
+            output.display(world, context=context)
 
         output_after = time()
 
@@ -168,6 +256,46 @@ def perform_outputs(
         )
 
 
+def perform_outputs_in_fields_of_view(
+    world: World,
+    simulation_time: float,
+    fields_of_view: Iterable[Tuple[FieldOfView, Iterable[Output]]],
+    output_name: Optional[str] = None,
+    overwrite: bool = False,
+    prefix: bool = False,
+    output_count: int = 0,
+    scheduler: Optional[RenderScheduler] = None,
+) -> None:
+    """
+    Performs the output operations configured, for each field of view.
+
+    :param world: World to output
+    :param simulation_time: Simulation timepoint
+    :param fields_of_view: Pairs of offsets and the outputs of the field of view
+    :param output_name: Name to output to
+    :param overwrite: Whether to overwrite
+    :param prefix: Whether to prefix the outputs with the name of the Output type
+    :param output_count: The count of already outputted timesteps
+    :param scheduler: Optional RenderScheduler to render in the background
+    :return: None
+    """
+    # all fields of view cull from one index, with a scheduler
+    # the fields of view are rendered in parallel
+    index = FrameContext(world, scheduler=scheduler).get('cell_index')
+
+    for number, ((x, y), outputs) in enumerate(fields_of_view):
+        perform_outputs(
+            world.view(x, y, Width.value, Height.value, index=index),
+            simulation_time,
+            outputs,
+            add_field_of_view_prefix(output_name, number) if output_name else None,
+            overwrite=overwrite,
+            prefix=prefix,
+            output_count=output_count,
+            scheduler=scheduler,
+        )
+
+
 def initialize_output_times_from_tunables():
     """
     Initialize the duration, output_interval and last_output variables,
@@ -262,6 +390,11 @@ def subcommand_main(args: Namespace) -> None:
         time_step=h_to_s(SimulationTimestep.value),
     )
 
+    scheduler = new_render_scheduler_from_tunables()
+
+    # each field of view needs its own outputs, as they might keep state
+    fields_of_view = None
+
     interrupted = False
     try:
         for step_duration, ts in measure_duration(simulation_iterator):
@@ -277,21 +410,55 @@ def subcommand_main(args: Namespace) -> None:
             if (ts.simulation.time - last_output) >= output_interval > 0:
                 last_output = ts.simulation.time
 
-                perform_outputs(
-                    ts.world,
-                    ts.simulation.time,
-                    outputs,
-                    args.output,
-                    overwrite=args.overwrite,
-                    prefix=args.prefix,
-                    output_count=output_count,
-                )
+                if fields_of_view is None:
+                    fields_of_view = [
+                        (offset, outputs if n == 0 else Output.SelectableGetMultiple())
+                        for n, offset in enumerate(
+                            fields_of_view_from_tunables(ts.world)
+                        )
+                    ]
+
+                if fields_of_view:
+                    perform_outputs_in_fields_of_view(
+                        ts.world,
+                        ts.simulation.time,
+                        fields_of_view,
+                        args.output,
+                        overwrite=args.overwrite,
+                        prefix=args.prefix,
+                        output_count=output_count,
+                        scheduler=scheduler,
+                    )
+                else:
+                    perform_outputs(
+                        ts.world,
+                        ts.simulation.time,
+                        outputs,
+                        args.output,
+                        overwrite=args.overwrite,
+                        prefix=args.prefix,
+                        output_count=output_count,
+                        scheduler=scheduler,
+                    )
 
                 output_count += 1
 
     except KeyboardInterrupt:
         log.info("Ctrl-C pressed, stopping simulation.")
         interrupted = True
+    finally:
+        if scheduler:
+            scheduler.close()
+
+        # the first field of view uses outputs
+        for output in outputs + [
+            output
+            for _, field_outputs in (fields_of_view or [])[1:]
+            for output in field_outputs
+        ]:
+            output.close()
+
+        flush_writes()
 
     total_after = time()
     log.info(
@@ -4,7 +4,9 @@ from argparse import Namespace
 import tqdm
 from tunable import Tunable, TunableManager
 
-from ...output import Output
+from ...output import FrameContext, Output
+from ...output.parallel import new_render_scheduler_from_tunables
+from ...output.writer import flush_writes
 from ...parameters import pixel_to_um
 from ...random import RRF
 from .. import add_output_prefix, initialize_cells, initialize_simulator
@@ -68,23 +70,37 @@ def subcommand_main(args: Namespace) -> None:
 
     output_count = 0
 
-    for _ in tqdm.tqdm(range(TrainingDataCount.value)):
-        simulator = initialize_simulator()
-        initialize_cells(simulator, count=next(ccf), cell_type=args.cell)
+    scheduler = new_render_scheduler_from_tunables()
 
-        simulator.step(60.0)
+    try:
+        for _ in tqdm.tqdm(range(TrainingDataCount.value)):
+            simulator = initialize_simulator()
+            initialize_cells(simulator, count=next(ccf), cell_type=args.cell)
+
+            simulator.step(60.0)
+
+            context = FrameContext(simulator.simulation.world, scheduler=scheduler)
+
+            for output in outputs:
+                if args.prefix:
+                    output_name = add_output_prefix(args.output, output=output)
+                else:
+                    output_name = args.output
+
+                output.write(
+                    simulator.simulation.world,
+                    output_name,
+                    overwrite=args.overwrite,
+                    output_count=output_count,
+                    context=context,
+                )
+
+            output_count += 1
+    finally:
+        if scheduler:
+            scheduler.close()
 
         for output in outputs:
-            if args.prefix:
-                output_name = add_output_prefix(args.output, output=output)
-            else:
-                output_name = args.output
-
-            output.write(
-                simulator.simulation.world,
-                output_name,
-                overwrite=args.overwrite,
-                output_count=output_count,
-            )
-
-        output_count += 1
+            output.close()
+
+        flush_writes()
@@ -188,6 +188,43 @@ def get_rotation_matrix3d_angle_axis(
     return r
 
 
+@lru_cache(maxsize=128)
+def cached_revolution_triangles(count: int, steps: int) -> np.ndarray:
+    """
+    Prepare the triangle connectivity of a solid of revolution, caching the result.
+    Returns cached, no-write arrays.
+
+    :param count: Count of points per revolution step
+    :param steps: Steps of the revolution
+    :return: Triangle Indices
+    """
+
+    # Triangle connectivity
+    #
+    # LAST 0 + n + 0 ---- 0 + n + 1 ----- 0 + n + 2
+    #          |    \         |    \
+    #          |      \       |      \
+    #          |        \     |        \
+    # BASE X + n + 0 ---- X + n + 1 ----- X + n + 2
+    #
+
+    base = (np.arange(steps) * count)[:, np.newaxis]
+    last = np.roll(base, 1, axis=0)
+    n = np.arange(count - 1)[np.newaxis, :]
+
+    triangles = np.stack(
+        [
+            np.stack([last + n + 0, base + n + 1, last + n + 1], axis=-1),
+            np.stack([base + n + 0, base + n + 1, last + n], axis=-1),
+        ],
+        axis=2,
+    ).reshape(-1, 3)
+
+    triangles.setflags(write=False)
+
+    return triangles
+
+
 def rotate_and_mesh(
     points: np.ndarray, steps: int = 16, clean: bool = True, close_ends: bool = True
 ) -> Tuple[np.ndarray, np.ndarray]:
@@ -212,50 +249,22 @@ def rotate_and_mesh(
             [[points[0, 0] + eps, 0, 0]], points, [[points[-1, 0] - eps, 0, 0]]
         ]
 
-    all_points = points.repeat(steps, axis=0)
-
-    axis_vector = (
-        (1,),
-        (0,),
-        (0,),
-    )
     max_angle = np.radians(360.0 if clean else 180.0)
 
-    for n, (angle, idx) in enumerate(
-        zip(
-            cached_linspace(0, max_angle, num=steps),
-            range(0, len(points) * steps, len(points)),
-        )
-    ):
-        all_points[idx : idx + len(points)] = rotate3d(points, angle, axis_vector)
-
-    # Triangle connectivity
-    #
-    # LAST 0 + n + 0 ---- 0 + n + 1 ----- 0 + n + 2
-    #          |    \         |    \
-    #          |      \       |      \
-    #          |        \     |        \
-    # BASE X + n + 0 ---- X + n + 1 ----- X + n + 2
-    #
-
-    triangles = []
+    # rotation matrices around the x axis, one per revolution step
+    angles = cached_linspace(0, max_angle, num=steps)
+    cos_a, sin_a = np.cos(angles), np.sin(angles)
 
-    last = len(all_points) - len(points)
+    rotation_matrices = np.zeros((steps, 3, 3))
+    rotation_matrices[:, 0, 0] = 1.0
+    rotation_matrices[:, 1, 1] = cos_a
+    rotation_matrices[:, 1, 2] = -sin_a
+    rotation_matrices[:, 2, 1] = sin_a
+    rotation_matrices[:, 2, 2] = cos_a
 
-    for step in range(steps):
-        base = step * len(points)
-        for n in range(0, len(points) - 1):
-            triangles.append(
-                [
-                    last + n + 0,
-                    base + n + 1,
-                    last + n + 1,
-                ]
-            )
-            triangles.append([base + n + 0, base + n + 1, last + n])
-        last = base
+    all_points = np.matmul(points, rotation_matrices.transpose(0, 2, 1)).reshape(-1, 3)
 
-    return all_points, np.array(triangles)
+    return all_points, cached_revolution_triangles(len(points), steps)
 
 
 __all__ = [
@@ -32,6 +32,10 @@ class Shape:
     def get_approximation_circles(self) -> Iterator[CircleType]:
         pass
 
+    def bounding_radius(self) -> float:
+        # radius of a circle around the origin enclosing the shape
+        return float(np.sqrt((self.raw_points() ** 2).sum(axis=1).max()))
+
 
 class Shape3D(Shape):
     """Base class for implementing 3D cell shapes."""
@@ -80,6 +84,9 @@ class RodShaped(Shape):
         lower, circle_right, upper, circle_left = self.rod_raw_points(simplify=simplify)
         return np.r_[lower, circle_right, upper, circle_left]
 
+    def bounding_radius(self) -> float:
+        return max(self.length, self.width) / 2.0
+
     def get_approximation_circles(self) -> Iterator[Tuple[float, Tuple[float, float]]]:
         diameter = self.width
         radius = diameter / 2.0
@@ -173,6 +180,13 @@ class BentRod(RodShaped):
 
         return points
 
+    def bounding_radius(self) -> float:
+        # bending only moves points along y, each parabolic deformation by at most
+        # abs(factor) * x ** 2, and points of the upper or lower half by only one
+        half_extent = max(self.length, self.width) / 2.0
+        bend = max(abs(self.bend_upper), abs(self.bend_lower)) + abs(self.bend_overall)
+        return float(np.hypot(half_extent, self.width / 2.0 + bend * half_extent**2))
+
     def raw_points3d(
         self, steps: int = 16, simplify: bool = False
     ) -> Tuple[np.ndarray, np.ndarray]:
@@ -218,6 +232,9 @@ class Coccoid(Shape):
     def get_approximation_circles(self) -> Iterator[CircleType]:
         yield self.length / 2, (0.0, 0.0)
 
+    def bounding_radius(self) -> float:
+        return self.length / 2.0
+
 
 class Ellipsoid(Coccoid):
     """Ellipsoid cell geometry."""
@@ -236,6 +253,9 @@ class Ellipsoid(Coccoid):
 
         return points
 
+    def bounding_radius(self) -> float:
+        return max(self.length, self.width) / 2.0
+
 
 class WithPosition:
     """Mixin adding a cell position."""
@@ -1,6 +1,7 @@
 """The output package contains the various output modules."""
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Any, Optional, Tuple
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
 
 from tunable import Selectable, Tunable
 
@@ -144,6 +145,123 @@ class OutputReproducibleFiles(Tunable):
     default: bool = True
 
 
+class FrameContext:
+    """
+    Lazily computed, memoized products of one World snapshot.
+
+    A FrameContext is created once per output step and passed to all outputs
+    (as the context keyword argument), so that intermediate products like
+    the cell outlines in pixel space, bounding boxes, or rendered images are only
+    computed once, no matter how many outputs request them.
+    Products are registered by name with FrameContext.product,
+    the returned values are shared and must not be modified.
+    If a scheduler (e.g. a RenderScheduler) is set, rendering happens in the
+    background and results are passed on in order via FrameContext.then.
+    """
+
+    products: Dict[str, Callable[..., Any]] = {}
+
+    def __init__(self, world: World, scheduler: Optional[Any] = None):
+        self.world = world
+        self.scheduler = scheduler
+        self.cache: Dict[Hashable, Any] = {}
+
+    @classmethod
+    def product(cls, name: str) -> Callable[[Callable], Callable]:
+        """
+        Decorator to register a function computing a named product.
+
+        :param name: Name of the product
+        :return: Decorator, the function is called with the context and \
+        any additional arguments passed to get
+        """
+
+        def _inner(function: Callable) -> Callable:
+            cls.products[name] = function
+            return function
+
+        return _inner
+
+    @classmethod
+    def ensure(cls, world: World, context: Optional["FrameContext"]) -> "FrameContext":
+        """
+        Returns context if it belongs to world, otherwise a new FrameContext
+        (sharing the scheduler of context, if any).
+
+        :param world: World
+        :param context: FrameContext or None
+        :return: FrameContext for world
+        """
+        if context is None:
+            context = cls(world)
+        elif context.world is not world:
+            context = cls(world, scheduler=context.scheduler)
+        return context
+
+    def memoize(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the value stored for key, calling compute to obtain it once.
+
+        :param key: Key
+        :param compute: Callable computing the value
+        :return: Value
+        """
+        if key not in self.cache:
+            self.cache[key] = compute()
+        return self.cache[key]
+
+    def get(self, name: str, *args: Hashable) -> Any:
+        """
+        Returns the registered product name, computing it if necessary.
+
+        :param name: Name of the product
+        :param args: Additional (hashable) arguments, part of the key
+        :return: Product
+        """
+        return self.memoize((name,) + args, lambda: self.products[name](self, *args))
+
+    def then(self, future: Future, callback: Callable[[Any], None]) -> None:
+        """
+        Calls callback with the result of future, either immediately or,
+        if a scheduler is set, once it is available and all earlier callbacks ran.
+
+        :param future: Future
+        :param callback: Callable
+        :return: None
+        """
+        if self.scheduler is None:
+            callback(future.result())
+        else:
+            self.scheduler.then(future, callback)
+
+    def then_all(
+        self, futures: List[Future], callback: Callable[[List[Any]], None]
+    ) -> None:
+        """
+        Calls callback with the results of all futures, once the last one
+        is available, in the same order as FrameContext.then
+        (not at all, if there are no futures).
+
+        :param futures: Futures
+        :param callback: Callable, called with the list of results
+        :return: None
+        """
+        results = [None] * len(futures)
+
+        def _collect(n: int) -> Callable[[Any], None]:
+            def _inner(result: Any) -> None:
+                results[n] = result
+
+                # callbacks are called in order, all results are there
+                if n == len(results) - 1:
+                    callback(results)
+
+            return _inner
+
+        for n, future in enumerate(futures):
+            self.then(future, _collect(n))
+
+
 class Output(Selectable, Selectable.Multiple):
     """
     Base class of the Output classes.
@@ -179,3 +297,12 @@ class Output(Selectable, Selectable.Multiple):
         :return:
         """
         raise RuntimeError("Not implemented")
+
+    def close(self) -> None:
+        """
+        Finishes the output after the last write, e.g. writes pending parts of files.
+        Must be callable multiple times.
+
+        :return: None
+        """
+        pass
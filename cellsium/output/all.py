@@ -1,5 +1,12 @@
 from . import Output
-from .gt import COCOOutput, GenericMaskOutput, YOLOOutput
+from .dataset import PackedDatasetOutput
+from .gt import (
+    COCOOutput,
+    CroppedMaskOutput,
+    GenericMaskOutput,
+    InstanceMaskOutput,
+    YOLOOutput,
+)
 from .mesh import MeshOutput
 from .plot import PlotRenderer
 from .render import (
@@ -8,10 +15,18 @@ from .render import (
     PhaseContrastRenderer,
     PlainRenderer,
     TiffOutput,
+    TiledTiffOutput,
     UnevenIlluminationPhaseContrast,
 )
-from .serialization import CsvOutput, JsonPickleSerializer, QuickAndDirtyTableDumper
+from .serialization import (
+    CellTableOutput,
+    ColumnarSerializer,
+    CsvOutput,
+    JsonPickleSerializer,
+    QuickAndDirtyTableDumper,
+)
 from .svg import SvgRenderer
+from .video import VideoOutput
 from .xml import TrackMateXML
 
 __all__ = [
@@ -19,6 +34,9 @@ __all__ = [
     'YOLOOutput',
     'COCOOutput',
     'GenericMaskOutput',
+    'InstanceMaskOutput',
+    'CroppedMaskOutput',
+    'PackedDatasetOutput',
     'MeshOutput',
     'PlotRenderer',
     'PlainRenderer',
@@ -27,9 +45,13 @@ __all__ = [
     'UnevenIlluminationPhaseContrast',
     'NoisyUnevenIlluminationPhaseContrast',
     'TiffOutput',
+    'TiledTiffOutput',
     'JsonPickleSerializer',
+    'ColumnarSerializer',
     'QuickAndDirtyTableDumper',
+    'CellTableOutput',
     'CsvOutput',
     'SvgRenderer',
     'TrackMateXML',
+    'VideoOutput',
 ]
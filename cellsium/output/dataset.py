@@ -0,0 +1,244 @@
+"""Packed training dataset output, in chunked and memory-mappable shards."""
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from tunable import Tunable
+
+from ..simulation.simulator import World
+from . import FrameContext
+from .gt import GroundTruthOutput, mkdirs
+from .render import PlainRenderer
+from .writer import submit_write
+
+SampleType = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+PACKED_DATASET_ARRAYS = ('images', 'masks', 'boxes')
+
+
+class PackedDatasetChunkSize(Tunable):
+    """Number of samples per shard of the PackedDatasetOutput"""
+
+    default: int = 64
+
+    @classmethod
+    def test(cls, value: int) -> bool:
+        return value >= 1
+
+
+def get_shard_path(path: Path, name: str, shard: int) -> Path:
+    return path / ('%s-%05d.npy' % (name, shard))
+
+
+class PackedDatasetOutput(GroundTruthOutput):
+    """
+    Training dataset packed into shards of fixed-shape .npy arrays.
+
+    Each shard holds chunk size samples: images (N, H, W) uint8, instance label
+    masks (N, H, W) uint16 and the boxes (x_min, y_min, x_max, y_max) of all
+    samples' cells, concatenated. index.npy maps each sample to its shard, row
+    and range of boxes. Use PackedDataset to read it.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        self.path = None
+        self.chunk: Dict[str, List[np.ndarray]] = {
+            name: [] for name in PACKED_DATASET_ARRAYS
+        }
+        self.index: List[Tuple[int, int, int, int]] = []
+        self.shard = 0
+        self.chunk_boxes = 0
+
+        # index writes may finish out of order, older ones are skipped
+        self.index_lock = Lock()
+        self.index_written = -1
+
+    def _write_initializations(
+        self, world: World, file_name: str, overwrite: bool = False, **kwargs
+    ) -> None:
+        base_path = Path(file_name)
+
+        if self.current == 0:
+            # some initializations
+
+            if not overwrite and base_path.exists():
+                raise RuntimeError(f"Path {base_path} already exists. Not overwriting.")
+
+            mkdirs(base_path)
+
+            self.path = base_path
+
+    def append(self, image: np.ndarray, mask: np.ndarray, boxes: np.ndarray) -> None:
+        """
+        Appends a sample, writing a shard once it is complete.
+
+        :param image: Image
+        :param mask: Instance label mask
+        :param boxes: Boxes of the cells, one row (x_min, y_min, x_max, y_max) each
+        :return: None
+        """
+        row = len(self.chunk['images'])
+
+        self.index.append(
+            (self.shard, row, self.chunk_boxes, self.chunk_boxes + len(boxes))
+        )
+        self.chunk_boxes += len(boxes)
+
+        for name, array in zip(PACKED_DATASET_ARRAYS, (image, mask, boxes)):
+            self.chunk[name].append(array)
+
+        if row + 1 == PackedDatasetChunkSize.value:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes the pending samples as a (possibly incomplete) shard and the index.
+
+        :return: None
+        """
+        if not self.chunk['images']:
+            return
+
+        submit_write(
+            np.save,
+            get_shard_path(self.path, 'images', self.shard),
+            np.stack(self.chunk['images']),
+        )
+        submit_write(
+            np.save,
+            get_shard_path(self.path, 'masks', self.shard),
+            np.stack(self.chunk['masks']),
+        )
+        submit_write(
+            np.save,
+            get_shard_path(self.path, 'boxes', self.shard),
+            np.concatenate(self.chunk['boxes']).astype(np.float32).reshape(-1, 4),
+        )
+
+        # the index always covers all written shards
+        submit_write(self.write_index, self.shard, np.array(self.index, dtype=np.int64))
+
+        for name in PACKED_DATASET_ARRAYS:
+            self.chunk[name] = []
+
+        self.shard += 1
+        self.chunk_boxes = 0
+
+    def write_index(self, shard: int, index: np.ndarray) -> None:
+        """
+        Writes the index, unless the index of a later shard was written already.
+
+        :param shard: Last shard covered by the index
+        :param index: Index
+        :return: None
+        """
+        with self.index_lock:
+            if shard < self.index_written:
+                return
+
+            np.save(self.path / 'index.npy', index)
+            self.index_written = shard
+
+    def close(self) -> None:
+        """
+        Writes the last, incomplete shard.
+
+        :return: None
+        """
+        if self.path is not None:
+            self.flush()
+
+    def __del__(self):
+        self.close()
+
+    def _write_perform(
+        self,
+        world: World,
+        file_name: str,
+        overwrite: bool = False,
+        context: Optional[FrameContext] = None,
+        **kwargs
+    ) -> None:
+        shape = self.canvas_shape
+
+        mask = context.get('instance_labels', shape, 'uint16')
+        boxes = np.array(
+            [
+                (bbox.x_min, bbox.y_min, bbox.x_max, bbox.y_max)
+                for bbox in context.get('ground_truth_bboxes', shape)
+            ],
+            dtype=np.float32,
+        ).reshape(-1, 4)
+
+        def _append(image: np.ndarray) -> None:
+            self.append(PlainRenderer.convert(image), mask, boxes)
+
+        # the rendered image might still be pending
+        channel = self.channels[0]
+        context.then(channel.output_later(world, context), _append)
+
+
+class PackedDataset:
+    """
+    Reader of datasets written by PackedDatasetOutput.
+
+    Samples are (image, mask, boxes) tuples. Random access memory-maps the
+    shards as needed, iteration streams through them shard by shard.
+    """
+
+    def __init__(self, path: str, mmap_mode: Optional[str] = 'r'):
+        self.path = Path(path)
+        self.mmap_mode = mmap_mode
+        self.index = np.load(self.path / 'index.npy')
+        self.shards: Dict[int, Dict[str, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def shard(self, shard: int) -> Dict[str, np.ndarray]:
+        """
+        Returns the (memory-mapped) arrays of a shard.
+
+        :param shard: Shard number
+        :return: Dictionary of the arrays
+        """
+        if shard not in self.shards:
+            self.shards[shard] = {
+                name: np.load(
+                    get_shard_path(self.path, name, shard), mmap_mode=self.mmap_mode
+                )
+                for name in PACKED_DATASET_ARRAYS
+            }
+
+        return self.shards[shard]
+
+    def __getitem__(self, n: int) -> SampleType:
+        shard, row, box_start, box_stop = self.index[n]
+
+        arrays = self.shard(shard)
+
+        return (
+            arrays['images'][row],
+            arrays['masks'][row],
+            arrays['boxes'][box_start:box_stop],
+        )
+
+    def __iter__(self) -> Iterator[SampleType]:
+        for shard in np.unique(self.index[:, 0]):
+            arrays = {
+                name: np.load(get_shard_path(self.path, name, shard))
+                for name in PACKED_DATASET_ARRAYS
+            }
+
+            for _, row, box_start, box_stop in self.index[self.index[:, 0] == shard]:
+                yield (
+                    arrays['images'][row],
+                    arrays['masks'][row],
+                    arrays['boxes'][box_start:box_stop],
+                )
+
+
+__all__ = ['PackedDatasetOutput', 'PackedDataset']
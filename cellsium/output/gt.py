@@ -3,21 +3,25 @@ import json
 from collections import namedtuple
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Iterable, Optional
+from typing import Any, Dict, Iterable, List, Optional, TextIO, Tuple
 
 import cv2
 import numpy as np
+from tifffile import imwrite as tiff_imwrite
 from tunable import Tunable
 
 from ..model import CellGeometry
 from ..simulation.simulator import World
-from . import Output, OutputReproducibleFiles, ShapeType
+from . import FrameContext, Output, OutputReproducibleFiles, ShapeType, check_overwrite
 from .render import (
     PlainRenderer,
     RenderChannels,
     get_canvas_points_for_cell,
+    get_canvas_shape,
+    get_visible_cells,
     new_canvas,
 )
+from .writer import submit_write
 
 BBoxContour = namedtuple(
     'BBoxContour',
@@ -44,8 +48,12 @@ BBoxContour = namedtuple(
 
 
 def get_bbox_for_cell(cell: CellGeometry, shape: ShapeType) -> BBoxContour:
-    points = get_canvas_points_for_cell(cell, image_height=shape[0])
+    return get_bbox_for_points(
+        get_canvas_points_for_cell(cell, image_height=shape[0]), shape
+    )
+
 
+def get_bbox_for_points(points: np.ndarray, shape: ShapeType) -> BBoxContour:
     x_min, x_max = points[:, 0].min(), points[:, 0].max()
     y_min, y_max = points[:, 1].min(), points[:, 1].max()
 
@@ -92,6 +100,187 @@ def is_completely_within(bbox: BBoxContour) -> bool:
     )
 
 
+@FrameContext.product('bbox_array')
+def get_bbox_array_for_world(context: FrameContext, shape: ShapeType) -> np.ndarray:
+    # bounding boxes of all cells as rows of x_min, y_min, x_max, y_max,
+    # reduced at once over the concatenated outlines
+    all_points = context.get('canvas_points', shape[0])
+
+    if not all_points:
+        return np.zeros((0, 4))
+
+    points = np.concatenate(all_points)
+    starts = np.cumsum([0] + [len(cell_points) for cell_points in all_points[:-1]])
+
+    return np.c_[
+        np.minimum.reduceat(points, starts, axis=0),
+        np.maximum.reduceat(points, starts, axis=0),
+    ]
+
+
+def get_relative_bbox_array(bbox_array: np.ndarray, shape: ShapeType) -> np.ndarray:
+    return bbox_array / np.array([shape[1], shape[0], shape[1], shape[0]])
+
+
+@FrameContext.product('bboxes_within')
+def get_bboxes_within(context: FrameContext, shape: ShapeType) -> np.ndarray:
+    # vectorized is_completely_within
+    relative = get_relative_bbox_array(context.get('bbox_array', shape), shape)
+    rel_min, rel_max = relative[:, :2], relative[:, 2:]
+
+    return (
+        (0 <= rel_min)
+        & (rel_min <= 1)
+        & (0 <= rel_max)
+        & (rel_max <= 1)
+        & (rel_min < rel_max)
+    ).all(axis=1)
+
+
+@FrameContext.product('bboxes')
+def get_bboxes_for_world(context: FrameContext, shape: ShapeType) -> List[BBoxContour]:
+    bbox_array = context.get('bbox_array', shape)
+
+    x_min, y_min, x_max, y_max = bbox_array.T
+    x_delta, y_delta = (x_max - x_min), (y_max - y_min)
+    x_center, y_center = x_min + x_delta / 2.0, y_min + y_delta / 2.0
+
+    rel_x_min, rel_y_min, rel_x_max, rel_y_max = get_relative_bbox_array(
+        bbox_array, shape
+    ).T
+
+    return [
+        BBoxContour(points, *values)
+        for points, values in zip(
+            context.get('canvas_points', shape[0]),
+            zip(
+                x_min,
+                x_max,
+                y_min,
+                y_max,
+                x_delta,
+                y_delta,
+                x_center,
+                y_center,
+                x_delta / shape[1],
+                y_delta / shape[0],
+                x_center / shape[1],
+                y_center / shape[0],
+                rel_x_min,
+                rel_x_max,
+                rel_y_min,
+                rel_y_max,
+            ),
+        )
+    ]
+
+
+def get_context_of_cells(
+    context: FrameContext, cells: List[CellGeometry], shape: ShapeType
+) -> FrameContext:
+    # the context of the world reduced to cells, the outlines and the index
+    # already computed for the whole world are reused
+    world = context.world.copy()
+    world.cells = cells
+
+    reduced = FrameContext(world, scheduler=context.scheduler)
+
+    key = ('canvas_points', shape[0])
+
+    if key in context.cache:
+        all_points = dict(zip(map(id, context.world.cells), context.cache[key]))
+        reduced.cache[key] = [all_points[id(cell)] for cell in cells]
+
+    key = ('cell_index',)
+
+    if key in context.cache:
+        reduced.cache[key] = context.cache[key].subset(cells)
+
+    return reduced
+
+
+@FrameContext.product('visible_context')
+def get_visible_context(context: FrameContext, shape: ShapeType) -> FrameContext:
+    # the context of the world reduced to the cells possibly visible in the image
+    cells = get_visible_cells(context.world, shape, context=context)
+
+    if len(cells) == len(context.world.cells):
+        return context
+
+    return get_context_of_cells(context, cells, shape)
+
+
+@FrameContext.product('complete_context')
+def get_complete_context(context: FrameContext, shape: ShapeType) -> FrameContext:
+    # the context of the world as it should be rendered for ground truth images
+    if not (
+        GroundTruthOnlyCompleteCells.value
+        and GroundTruthOnlyCompleteCellsInImages.value
+    ):
+        return context
+
+    # cells outside of the image are not complete, their outlines are not needed
+    context = context.get('visible_context', shape)
+
+    within = context.get('bboxes_within', shape)
+
+    if within.all():
+        return context
+
+    return get_context_of_cells(
+        context,
+        [cell for cell, cell_within in zip(context.world.cells, within) if cell_within],
+        shape,
+    )
+
+
+@FrameContext.product('ground_truth_cells')
+def get_ground_truth_cells(
+    context: FrameContext, shape: ShapeType
+) -> List[Tuple[CellGeometry, BBoxContour]]:
+    if GroundTruthOnlyCompleteCells.value:
+        context = context.get('visible_context', shape)
+        return [
+            (cell, bbox)
+            for cell, bbox, within in zip(
+                context.world.cells,
+                context.get('bboxes', shape),
+                context.get('bboxes_within', shape),
+            )
+            if within
+        ]
+    else:
+        return list(zip(context.world.cells, context.get('bboxes', shape)))
+
+
+@FrameContext.product('ground_truth_bboxes')
+def get_ground_truth_bboxes(
+    context: FrameContext, shape: ShapeType
+) -> List[BBoxContour]:
+    return [bbox for _, bbox in context.get('ground_truth_cells', shape)]
+
+
+@FrameContext.product('ground_truth_bbox_array')
+def get_ground_truth_bbox_array(context: FrameContext, shape: ShapeType) -> np.ndarray:
+    # the rows of bbox_array matching ground_truth_bboxes
+    if GroundTruthOnlyCompleteCells.value:
+        context = context.get('visible_context', shape)
+        return context.get('bbox_array', shape)[context.get('bboxes_within', shape)]
+    else:
+        return context.get('bbox_array', shape)
+
+
+@FrameContext.product('cells_mask')
+def get_cells_mask(
+    context: FrameContext, shape: ShapeType, cell_value: int, binary: bool
+) -> np.ndarray:
+    return GenericMaskOutput.generate_cells_mask(
+        [bbox.points for bbox in context.get('ground_truth_bboxes', shape)],
+        cell_value=cell_value,
+        binary=binary,
+    )
+
+
 def possibly_remove_outside_cells(world, shape):
     if (
         GroundTruthOnlyCompleteCells.value
@@ -103,9 +292,12 @@ def possibly_remove_outside_cells(world, shape):
 
 def remove_outside_cells(world, shape):
     world = world.copy()
+    world.cells = get_visible_cells(world, shape)
+
+    within = FrameContext(world).get('bboxes_within', shape)
 
-    for cell in world.cells:
-        if not is_completely_within(get_bbox_for_cell(cell, shape=shape)):
+    for cell, cell_within in zip(list(world.cells), within):
+        if not cell_within:
             world.remove(cell)
 
     world.commit()
@@ -161,10 +353,20 @@ class GroundTruthOutput(Output, Output.Virtual):
         raise RuntimeError("GroundTruthOutput s only support writing.")
 
     def _write_channels(
-        self, world: World, filenames: Iterable[str], overwrite: bool = True
+        self,
+        world: World,
+        filenames: Iterable[str],
+        overwrite: bool = True,
+        context: Optional[FrameContext] = None,
     ) -> None:
         for image_file, channel in zip(filenames, self.channels):
-            channel.write(world, str(image_file), overwrite=overwrite, output_count=-1)
+            channel.write(
+                world,
+                str(image_file),
+                overwrite=overwrite,
+                output_count=-1,
+                context=context,
+            )
             break  # only one channel supported
 
     def _write_initializations(
@@ -185,7 +387,20 @@ class GroundTruthOutput(Output, Output.Virtual):
         if self.current == 0:
             self._write_initializations(world, file_name, overwrite=overwrite)
 
-        return self._write_perform(world, file_name, overwrite=overwrite)
+        # cells which are not completely visible might be omitted from the frame
+        context = FrameContext.ensure(world, kwargs.get('context')).get(
+            'complete_context', self.canvas_shape
+        )
+
+        return self._write_perform(
+            context.world, file_name, overwrite=overwrite, context=context
+        )
+
+
+class YOLOOutputSegmentation(Tunable):
+    """Whether YOLOOutput writes outline polygons (YOLO-seg) instead of boxes."""
+
+    default: bool = False
 
 
 class YOLOOutput(GroundTruthOutput):
@@ -209,7 +424,12 @@ class YOLOOutput(GroundTruthOutput):
             (base_path / 'classes.txt').write_text("cell\n")
 
     def _write_perform(
-        self, world: World, file_name: str, overwrite: bool = False, **kwargs
+        self,
+        world: World,
+        file_name: str,
+        overwrite: bool = False,
+        context: Optional[FrameContext] = None,
+        **kwargs
     ) -> None:
         shape = self.canvas_shape
         digits = self.significant_digits
@@ -219,33 +439,45 @@ class YOLOOutput(GroundTruthOutput):
         image_file = self.image_path / (token + '.png')
         text_file = self.label_path / (token + '.txt')
 
-        world = possibly_remove_outside_cells(world, shape)
-
-        self._write_channels(world, [image_file], overwrite=overwrite)
-
-        lines = []
+        self._write_channels(world, [image_file], overwrite=overwrite, context=context)
 
-        for cell in world.cells:
-            bbox = get_bbox_for_cell(cell, shape)
+        class_ = 0  # only one class at the moment
 
-            if GroundTruthOnlyCompleteCells.value and not is_completely_within(bbox):
-                continue
+        value_format = '%%.%df' % digits
 
-            class_ = 0  # only one class at the moment
+        if YOLOOutputSegmentation.value:
+            # class, followed by the relative outline coordinates
+            outlines = [
+                bbox.points / (shape[1], shape[0])
+                for bbox in context.get('ground_truth_bboxes', shape)
+            ]
 
-            line = f'{class_} ' + ' '.join(
-                ('%%.%df' % digits) % value
-                for value in [
-                    bbox.rel_x_center,
-                    bbox.rel_y_center,
-                    bbox.rel_x_delta,
-                    bbox.rel_y_delta,
-                ]
+            line_formats = [
+                ' '.join(['%d'] + [value_format] * outline.size) for outline in outlines
+            ]
+            values = np.concatenate(
+                [np.r_[class_, outline.ravel()] for outline in outlines] + [[]]
             )
+        else:
+            # class, relative center and relative size
+            x_min, y_min, x_max, y_max = context.get('ground_truth_bbox_array', shape).T
+            x_delta, y_delta = (x_max - x_min), (y_max - y_min)
+            x_center, y_center = x_min + x_delta / 2.0, y_min + y_delta / 2.0
+
+            values = np.c_[
+                np.full(len(x_min), class_),
+                x_center / shape[1],
+                y_center / shape[0],
+                x_delta / shape[1],
+                y_delta / shape[0],
+            ]
+
+            line_formats = [' '.join(['%d'] + [value_format] * 4)] * len(values)
 
-            lines.append(line)
+        # all lines are formatted at once
+        text = "\n".join(line_formats) % tuple(values.ravel())
 
-        text_file.write_text("\n".join(lines))
+        submit_write(text_file.write_text, text)
 
 
 def binary_to_rle(mask: np.ndarray) -> np.ndarray:
@@ -264,14 +496,71 @@ def binary_to_rle(mask: np.ndarray) -> np.ndarray:
     return lens
 
 
-def convert_points_to_rle(points: np.ndarray) -> np.ndarray:
-    mask = PlainRenderer.new_canvas()
-    mask = PlainRenderer.render_cells(mask, [points], fast=True)
-    mask = mask > 0.5
-    lens = binary_to_rle(mask)
+def local_binary_to_rle(
+    mask: np.ndarray, offset: Tuple[int, int], shape: ShapeType
+) -> np.ndarray:
+    # runs as binary_to_rle would produce them for a mask of shape, which is
+    # empty except for the local mask placed at offset (y, x)
+    height, width = shape[:2]
+    y_offset, x_offset = offset
+
+    padded = np.zeros((mask.shape[0] + 2, mask.shape[1]), dtype=np.int8)
+    padded[1:-1, :] = mask
+
+    # run starts and ends, per column, in column-major order
+    x, y = np.nonzero(np.diff(padded, axis=0).T)
+    positions = (x + x_offset).astype(np.int64) * height + (y + y_offset)
+
+    # runs ending at the bottom of one column and continuing at the top of the next
+    continued = positions[1:] == positions[:-1]
+    positions = positions[~(np.r_[continued, False] | np.r_[False, continued])]
+
+    lens = np.diff(np.r_[0, positions, height * width])
+
+    # binary_to_rle does not start with an empty run if the first pixel is set
+    if len(lens) > 1 and lens[0] == 0:
+        lens = lens[1:]
+
+    if len(lens) > 1 and lens[-1] == 0:
+        lens = lens[:-1]
+
     return lens
 
 
+def rasterize_points_in_bbox(
+    points: np.ndarray, shape: ShapeType
+) -> Tuple[np.ndarray, Tuple[int, int]]:
+    # binary mask of the polygon within its (integer) bounding box clipped to a
+    # canvas of shape, rasterized as render_on_canvas_cv2 does, and its offset (y, x)
+    points = points.astype(np.int32)
+
+    x_min, y_min = np.maximum(points.min(axis=0), 0)
+    x_max, y_max = np.maximum(
+        np.minimum(points.max(axis=0) + 1, (shape[1], shape[0])), (x_min, y_min)
+    )
+
+    mask = np.zeros((y_max - y_min, x_max - x_min), dtype=np.uint8)
+
+    if mask.size:
+        cv2.fillPoly(mask, (points - (x_min, y_min))[np.newaxis], 1)
+
+    return mask, (int(y_min), int(x_min))
+
+
+def convert_points_to_rle(
+    points: np.ndarray, shape: Optional[ShapeType] = None
+) -> np.ndarray:
+    if shape is None:
+        shape = get_canvas_shape()
+
+    mask, offset = rasterize_points_in_bbox(points, shape)
+
+    if not mask.size:
+        return np.array([shape[0] * shape[1]])
+
+    return local_binary_to_rle(mask, offset, shape)
+
+
 class COCOEncodeRLE(Tunable):
     """Whether to encode segmentation data as RLE format."""
 
@@ -284,13 +573,165 @@ class COCOOutputStuff(Tunable):
     default: bool = False
 
 
+class COCOOutputShards(Tunable):
+    """Number of COCO annotation files the images are distributed over."""
+
+    default: int = 1
+
+    @classmethod
+    def test(cls, value: int) -> bool:
+        return value >= 1
+
+
+class COCOOutputIndent(Tunable):
+    """Indentation of COCO annotation files (0 for compact files)."""
+
+    default: int = 4
+
+
+class COCOOutputFlushEvery(Tunable):
+    """Number of frames after which partial COCO annotations are flushed to disk."""
+
+    default: int = 1
+
+    @classmethod
+    def test(cls, value: int) -> bool:
+        return value >= 1
+
+
+COCO_STREAMED_KEYS = ('images', 'annotations')
+
+
+def get_coco_partial_path(file_name: Path, key: str) -> Path:
+    return file_name.with_name(file_name.name + '.' + key + '.partial')
+
+
+def _write_coco_list(
+    fp: TextIO, partial: TextIO, indent: Optional[int], level: int = 1
+) -> None:
+    if indent:
+        separators = None
+        inner = '\n' + ' ' * (indent * (level + 1))
+        opening, separator = '[' + inner, ',' + inner
+        closing = '\n' + ' ' * (indent * level) + ']'
+    else:
+        separators = (',', ':')
+        inner = ''
+        opening, separator, closing = '[', ',', ']'
+
+    first = True
+
+    for line in partial:
+        entry = json.dumps(json.loads(line), indent=indent, separators=separators)
+
+        fp.write(opening if first else separator)
+        fp.write(entry.replace('\n', inner))
+
+        first = False
+
+    fp.write('[]' if first else closing)
+
+
+def assemble_coco_annotations(file_name: Path, indent: Optional[int] = 4) -> None:
+    """
+    Assembles a COCO annotation file from the partial files written by a
+    COCOAnnotationStream, one entry at a time, and removes the partial files.
+    Can be used to recover annotations of a prematurely ended run.
+
+    :param file_name: Annotation file name
+    :param indent: Indentation, None or 0 for a compact file
+    :return: None
+    """
+    file_name = Path(file_name)
+
+    head = json.loads(get_coco_partial_path(file_name, 'head').read_text())
+
+    markers = {key: '@@%s@@' % key for key in COCO_STREAMED_KEYS}
+    head.update(markers)
+
+    text = json.dumps(
+        head, indent=indent or None, separators=None if indent else (',', ':')
+    )
+
+    with file_name.open('w') as fp:
+        for key in COCO_STREAMED_KEYS:
+            before, text = text.split('"%s"' % markers[key], 1)
+            fp.write(before)
+
+            with get_coco_partial_path(file_name, key).open() as partial:
+                _write_coco_list(fp, partial, indent or None)
+
+        fp.write(text)
+
+    for key in ('head',) + COCO_STREAMED_KEYS:
+        get_coco_partial_path(file_name, key).unlink()
+
+
+class COCOAnnotationStream:
+    """
+    Writes a COCO annotation file incrementally.
+
+    Images and annotations are appended as JSON lines to partial files next to
+    the annotation file, so memory usage does not grow with the dataset size,
+    and whatever has been flushed survives a premature end of the process.
+    On close, the annotation file is assembled from the partial files.
+    """
+
+    def __init__(self, file_name: Path, head: Dict[str, Any]):
+        self.file_name = Path(file_name)
+
+        get_coco_partial_path(self.file_name, 'head').write_text(json.dumps(head))
+
+        self.partials = {
+            key: get_coco_partial_path(self.file_name, key).open('w')
+            for key in COCO_STREAMED_KEYS
+        }
+
+    def append(self, key: str, entry: Dict[str, Any]) -> None:
+        """
+        Appends an entry to the list key (images or annotations).
+
+        :param key: Key
+        :param entry: Entry
+        :return: None
+        """
+        self.partials[key].write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+    def flush(self) -> None:
+        """
+        Flushes the partial files to disk.
+
+        :return: None
+        """
+        for partial in self.partials.values():
+            partial.flush()
+
+    def close(self, indent: Optional[int] = 4) -> None:
+        """
+        Closes the partial files and assembles the annotation file.
+
+        :param indent: Indentation, None or 0 for a compact file
+        :return: None
+        """
+        if not self.partials:
+            return
+
+        for partial in self.partials.values():
+            partial.close()
+
+        self.partials = {}
+
+        assemble_coco_annotations(self.file_name, indent)
+
+
 class COCOOutput(GroundTruthOutput):
     """Output in the COCO format."""
 
     def __init__(self):
         super().__init__()
 
-        self.annotation_file = None
+        self.streams = []
+        self.annotation_count = 0
 
         # Maybe add parameters to modify metadata ?
         self.coco_structure = {
@@ -320,8 +761,6 @@ class COCOOutput(GroundTruthOutput):
             ],
         }
 
-        self.annotation_file = None
-
     @staticmethod
     def now() -> str:
         if OutputReproducibleFiles.value:
@@ -329,10 +768,14 @@ class COCOOutput(GroundTruthOutput):
         else:
             return str(datetime.now()).split('.')[0]
 
+    def close(self) -> None:
+        for stream in self.streams:
+            stream.close(COCOOutputIndent.value)
+
+        self.streams = []
+
     def __del__(self):
-        if self.annotation_file:
-            with self.annotation_file.open('w+') as fp:
-                json.dump(self.coco_structure, fp, indent=' ' * 4)
+        self.close()
 
     def _write_initializations(
         self, world: World, file_name: str, overwrite: bool = False, **kwargs
@@ -353,10 +796,29 @@ class COCOOutput(GroundTruthOutput):
 
             mkdirs(base_path, self.image_path, self.stuff_path)
 
-            self.annotation_file = base_path / 'annotations.json'
+            shards = COCOOutputShards.value
+
+            if shards == 1:
+                annotation_files = [base_path / 'annotations.json']
+            else:
+                annotation_files = [
+                    base_path / ('annotations-%05d.json' % shard)
+                    for shard in range(shards)
+                ]
+
+            # images and annotations are streamed, only the head is kept
+            self.streams = [
+                COCOAnnotationStream(annotation_file, self.coco_structure)
+                for annotation_file in annotation_files
+            ]
 
     def _write_perform(
-        self, world: World, file_name: str, overwrite: bool = False, **kwargs
+        self,
+        world: World,
+        file_name: str,
+        overwrite: bool = False,
+        context: Optional[FrameContext] = None,
+        **kwargs
     ) -> None:
         shape = self.canvas_shape
         digits = self.significant_digits
@@ -368,11 +830,13 @@ class COCOOutput(GroundTruthOutput):
 
         image_file = self.image_path / image_file_name
 
-        world = possibly_remove_outside_cells(world, shape)
+        self._write_channels(world, [image_file], overwrite=overwrite, context=context)
 
-        self._write_channels(world, [image_file], overwrite=overwrite)
+        # images (with their annotations) are distributed round robin over shards
+        stream = self.streams[self.current % len(self.streams)]
 
-        self.coco_structure['images'].append(
+        stream.append(
+            'images',
             {
                 'id': self.current,
                 'width': self.canvas_shape[1],
@@ -382,22 +846,12 @@ class COCOOutput(GroundTruthOutput):
                 'flickr_url': '',
                 'coco_url': '',
                 'date_captured': self.now(),
-            }
+            },
         )
 
         class_ = 0 if not write_stuff else 1
 
-        cells_coords = []
-
-        for cell in world.cells:
-            bbox = get_bbox_for_cell(cell, shape)
-
-            if GroundTruthOnlyCompleteCells.value and not is_completely_within(bbox):
-                continue
-
-            if write_stuff:
-                cells_coords.append(bbox.points)
-
+        for bbox in context.get('ground_truth_bboxes', shape):
             area = cv2.contourArea(bbox.points.astype(np.float32))
 
             if not COCOEncodeRLE.value:
@@ -410,26 +864,31 @@ class COCOOutput(GroundTruthOutput):
                     'size': shape,
                 }
 
-            self.coco_structure['annotations'].append(
+            stream.append(
+                'annotations',
                 {
-                    'id': len(self.coco_structure['annotations']),
+                    'id': self.annotation_count,
                     'image_id': self.current,
                     'category_id': class_,
                     'segmentation': segmentation,
                     'area': area,
                     'bbox': [bbox.x_min, bbox.y_min, bbox.x_delta, bbox.y_delta],
                     'iscrowd': iscrowd,
-                }
+                },
             )
 
+            self.annotation_count += 1
+
+        if (self.current + 1) % COCOOutputFlushEvery.value == 0:
+            for a_stream in self.streams:
+                a_stream.flush()
+
         if write_stuff:
             stuff_file = self.stuff_path / image_file_name
 
             GenericMaskOutput.imwrite(
                 stuff_file,
-                GenericMaskOutput.generate_cells_mask(
-                    cells_coords, cell_value=class_, binary=True
-                ),
+                context.get('cells_mask', shape, class_, True),
                 overwrite=overwrite,
             )
 
@@ -446,6 +905,120 @@ class MaskOutputCellValue(Tunable):
     default: bool = 255
 
 
+class MaskOutputDistances(Tunable):
+    """Whether GenericMaskOutput also writes distance to cell boundary maps"""
+
+    default: bool = False
+
+
+class MaskOutputFlows(Tunable):
+    """Whether GenericMaskOutput also writes unit vectors towards the cell centroids"""
+
+    default: bool = False
+
+
+class MaskOutputStarConvexRays(Tunable):
+    """Number of ray distances from each cell centroid to the outline (0: none)"""
+
+    default: int = 0
+
+    @classmethod
+    def test(cls, value: int) -> bool:
+        return value >= 0
+
+
+def get_star_convex_distances(
+    points: np.ndarray, center: np.ndarray, rays: int
+) -> np.ndarray:
+    # distances from center to the outline along rays equally spaced angles,
+    # intersecting every ray with every outline segment at once
+    angles = np.arange(rays) * (2 * np.pi / rays)
+    directions = np.c_[np.cos(angles), np.sin(angles)][:, np.newaxis, :]
+
+    starts = (points - center)[np.newaxis, :, :]
+    edges = -(np.roll(points, -1, axis=0) - points)[np.newaxis, :, :]
+
+    def cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+    # solve center + t * direction == start - u * edge via Cramer's rule
+    with np.errstate(divide='ignore', invalid='ignore'):
+        determinant = cross(directions, edges)
+        t = cross(starts, edges) / determinant
+        u = cross(directions, starts) / determinant
+
+    hit = (determinant != 0) & (u >= 0.0) & (u <= 1.0) & (t >= 0.0)
+
+    distances = np.where(hit, t, np.inf).min(axis=1)
+    distances[~np.isfinite(distances)] = 0.0
+
+    return distances
+
+
+@FrameContext.product('star_convex_rays')
+def get_star_convex_rays(
+    context: FrameContext, shape: ShapeType, rays: int
+) -> np.ndarray:
+    # per cell: center x, center y and the ray distances, in pixels. one polygon
+    # per cell, cast from its centroid, not per pixel distances as in StarDist
+    result = []
+
+    for bbox in context.get('ground_truth_bboxes', shape):
+        points = bbox.points.astype(np.float64)
+        moments = cv2.moments(points.astype(np.float32))
+
+        if moments['m00'] > 0:
+            center = np.array([moments['m10'], moments['m01']]) / moments['m00']
+        else:
+            center = points.mean(axis=0)
+
+        result.append(np.r_[center, get_star_convex_distances(points, center, rays)])
+
+    return np.array(result, dtype=np.float32).reshape(-1, 2 + rays)
+
+
+@FrameContext.product('distances_and_flows')
+def get_distances_and_flows(
+    context: FrameContext, shape: ShapeType
+) -> Tuple[np.ndarray, np.ndarray]:
+    # distance to the cell boundary and unit vectors (dy, dx) pointing towards
+    # the cell's mask centroid, both computed within each cell's bounding box only.
+    # the flows are not the gradients of a diffusion from the center (Cellpose),
+    # for strongly bent cells the centroid may lie outside of the cell
+    distances = np.zeros(shape[:2], dtype=np.float32)
+    flows = np.zeros((2,) + tuple(shape[:2]), dtype=np.float32)
+
+    for bbox in context.get('ground_truth_bboxes', shape):
+        mask, (y, x) = rasterize_points_in_bbox(bbox.points, shape)
+
+        if not mask.any():
+            continue
+
+        height, width = mask.shape
+        window = np.s_[y : y + height, x : x + width]
+
+        # the padding makes the bounding box edges count as boundary
+        distance = cv2.distanceTransform(
+            np.pad(mask, 1), cv2.DIST_L2, cv2.DIST_MASK_PRECISE
+        )[1:-1, 1:-1]
+
+        ys, xs = np.nonzero(mask)
+        center_y, center_x = ys.mean(), xs.mean()
+
+        delta_y = center_y - np.arange(height, dtype=np.float32)[:, np.newaxis]
+        delta_x = center_x - np.arange(width, dtype=np.float32)[np.newaxis, :]
+        length = np.hypot(delta_y, delta_x)
+        length[length == 0.0] = 1.0
+
+        inside = (mask > 0) & (distance >= distances[window])
+
+        np.copyto(distances[window], distance, where=inside)
+        np.copyto(flows[(0,) + window], delta_y / length, where=inside)
+        np.copyto(flows[(1,) + window], delta_x / length, where=inside)
+
+    return distances, flows
+
+
 class GenericMaskOutput(GroundTruthOutput):
     """Generic mask output (i.e. directories of files)."""
 
@@ -475,16 +1048,40 @@ class GenericMaskOutput(GroundTruthOutput):
         self.image_path = base_path / 'images'
         self.mask_path = base_path / 'masks'
 
+        # derived training targets
+        self.distance_path = self.flow_path = self.ray_path = None
+
+        if MaskOutputDistances.value:
+            self.distance_path = base_path / 'distances'
+
+        if MaskOutputFlows.value:
+            self.flow_path = base_path / 'flows'
+
+        if MaskOutputStarConvexRays.value:
+            self.ray_path = base_path / 'rays'
+
         if self.current == 0:
             # some initializations
 
             if not overwrite and base_path.exists():
                 raise RuntimeError(f"Path {base_path} already exists. Not overwriting.")
 
-            mkdirs(base_path, self.image_path, self.mask_path)
+            mkdirs(
+                base_path,
+                self.image_path,
+                self.mask_path,
+                self.distance_path,
+                self.flow_path,
+                self.ray_path,
+            )
 
     def _write_perform(
-        self, world: World, file_name: str, overwrite: bool = False, **kwargs
+        self,
+        world: World,
+        file_name: str,
+        overwrite: bool = False,
+        context: Optional[FrameContext] = None,
+        **kwargs
     ) -> None:
         shape = self.canvas_shape
 
@@ -493,30 +1090,247 @@ class GenericMaskOutput(GroundTruthOutput):
         image_file = self.image_path / (token + '.png')
         mask_file = self.mask_path / (token + '.png')
 
-        world = possibly_remove_outside_cells(world, shape)
+        self._write_channels(world, [image_file], overwrite=overwrite, context=context)
+
+        mask = context.get(
+            'cells_mask', shape, MaskOutputCellValue.value, MaskOutputBinary.value
+        )
+
+        self.imwrite(mask_file, mask, overwrite=overwrite)
+
+        if self.distance_path or self.flow_path:
+            distances, flows = context.get('distances_and_flows', shape)
+
+            if self.distance_path:
+                distance_file = str(self.distance_path / (token + '.tif'))
+                submit_write(
+                    tiff_imwrite, check_overwrite(distance_file, overwrite), distances
+                )
+
+            if self.flow_path:
+                flow_file = str(self.flow_path / (token + '.tif'))
+                submit_write(tiff_imwrite, check_overwrite(flow_file, overwrite), flows)
+
+        if self.ray_path:
+            submit_write(
+                np.save,
+                check_overwrite(str(self.ray_path / (token + '.npy')), overwrite),
+                context.get('star_convex_rays', shape, MaskOutputStarConvexRays.value),
+            )
+
+
+class InstanceMaskOutputType(Tunable):
+    """Data type of InstanceMaskOutput label images (uint16 or uint32)"""
+
+    default: str = 'uint16'
+
+    @classmethod
+    def test(cls, value: str) -> bool:
+        return value in ('uint16', 'uint32')
+
+
+class InstanceMaskOutputMapping(Tunable):
+    """Whether InstanceMaskOutput writes a label to cell id mapping per frame"""
+
+    default: bool = True
+
+
+@FrameContext.product('instance_labels')
+def get_instance_labels(
+    context: FrameContext, shape: ShapeType, dtype: str
+) -> np.ndarray:
+    # labels are assigned in the (deterministic) order of the world's cells,
+    # where cells overlap, the later cell's label is kept
+    points = [bbox.points for _, bbox in context.get('ground_truth_cells', shape)]
+
+    if len(points) > np.iinfo(dtype).max:
+        raise RuntimeError(f"Too many cells for {dtype} instance labels.")
+
+    # OpenCV can not draw into unsigned 32 bit images, but into signed ones
+    labels = np.zeros(shape[:2], dtype=np.uint16 if dtype == 'uint16' else np.int32)
+
+    for label, cell_points in enumerate(points, 1):
+        cv2.fillPoly(labels, cell_points[np.newaxis].astype(np.int32), label)
+
+    return labels.astype(dtype, copy=False)
+
+
+class InstanceMaskOutput(GroundTruthOutput):
+    """Instance label images (i.e. directories of files), one label per cell."""
 
-        self._write_channels(world, [image_file], overwrite=overwrite)
+    def _write_initializations(
+        self, world: World, file_name: str, overwrite: bool = False, **kwargs
+    ) -> None:
+        base_path = Path(file_name)
+        self.image_path = base_path / 'images'
+        self.label_path = base_path / 'labels'
+
+        self.mapping_path = None
+
+        if InstanceMaskOutputMapping.value:
+            self.mapping_path = base_path / 'mappings'
+
+        if self.current == 0:
+            # some initializations
 
-        cell_bboxes = [get_bbox_for_cell(cell, shape) for cell in world.cells]
+            if not overwrite and base_path.exists():
+                raise RuntimeError(f"Path {base_path} already exists. Not overwriting.")
+
+            mkdirs(base_path, self.image_path, self.label_path, self.mapping_path)
+
+    def _write_perform(
+        self,
+        world: World,
+        file_name: str,
+        overwrite: bool = False,
+        context: Optional[FrameContext] = None,
+        **kwargs
+    ) -> None:
+        shape = self.canvas_shape
+        dtype = InstanceMaskOutputType.value
+
+        token = '%012d' % self.current
 
-        if GroundTruthOnlyCompleteCells.value:
-            cell_bboxes = [
-                cell_bbox
-                for cell_bbox in cell_bboxes
-                if is_completely_within(cell_bbox)
+        image_file = self.image_path / (token + '.png')
+
+        self._write_channels(world, [image_file], overwrite=overwrite, context=context)
+
+        labels = context.get('instance_labels', shape, dtype)
+
+        if dtype == 'uint16':
+            PlainRenderer.imwrite(
+                str(self.label_path / (token + '.png')), labels, overwrite=overwrite
+            )
+        else:
+            # PNG does not support 32 bit
+            submit_write(
+                tiff_imwrite,
+                check_overwrite(
+                    str(self.label_path / (token + '.tif')), overwrite=overwrite
+                ),
+                labels,
+            )
+
+        if self.mapping_path:
+            lines = ['label,id'] + [
+                '%d,%d' % (label, getattr(cell, 'id_', 0))
+                for label, (cell, _) in enumerate(
+                    context.get('ground_truth_cells', shape), 1
+                )
             ]
 
-        mask = self.generate_cells_mask(
-            [cell_bbox.points for cell_bbox in cell_bboxes],
-            cell_value=MaskOutputCellValue.value,
-            binary=MaskOutputBinary.value,
+            mapping_file = self.mapping_path / (token + '.csv')
+            check_overwrite(str(mapping_file), overwrite=overwrite)
+            submit_write(mapping_file.write_text, "\n".join(lines) + "\n")
+
+
+class CroppedMaskOutputFormat(Tunable):
+    """Format of CroppedMaskOutput files, npz (compressed) or npy (memory-mappable)"""
+
+    default: str = 'npz'
+
+    @classmethod
+    def test(cls, value: str) -> bool:
+        return value in ('npz', 'npy')
+
+
+CROPPED_MASK_ARRAYS = ('bboxes', 'offsets', 'masks')
+
+
+def read_cropped_masks(
+    file_name: str, mmap_mode: Optional[str] = 'r'
+) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Reads the masks of one image written by CroppedMaskOutput.
+
+    :param file_name: The .npz file, or the common prefix of the .npy files
+    :param mmap_mode: Memory map mode for .npy files
+    :return: Bounding boxes (x, y, width, height) and the cropped masks
+    """
+    if str(file_name).endswith('.npz'):
+        with np.load(file_name) as data:
+            bboxes, offsets, masks = (data[name] for name in CROPPED_MASK_ARRAYS)
+    else:
+        bboxes, offsets, masks = (
+            np.load('%s-%s.npy' % (file_name, name), mmap_mode=mmap_mode)
+            for name in CROPPED_MASK_ARRAYS
         )
 
-        self.imwrite(mask_file, mask, overwrite=overwrite)
+    return bboxes, [
+        masks[start:stop].reshape((height, width))
+        for (_, _, width, height), start, stop in zip(bboxes, offsets[:-1], offsets[1:])
+    ]
+
+
+class CroppedMaskOutput(GroundTruthOutput):
+    """Per cell binary masks cropped to their bounding boxes, packed per image."""
+
+    def _write_initializations(
+        self, world: World, file_name: str, overwrite: bool = False, **kwargs
+    ) -> None:
+        base_path = Path(file_name)
+        self.image_path = base_path / 'images'
+        self.mask_path = base_path / 'masks'
+
+        if self.current == 0:
+            # some initializations
+
+            if not overwrite and base_path.exists():
+                raise RuntimeError(f"Path {base_path} already exists. Not overwriting.")
+
+            mkdirs(base_path, self.image_path, self.mask_path)
+
+    def _write_perform(
+        self,
+        world: World,
+        file_name: str,
+        overwrite: bool = False,
+        context: Optional[FrameContext] = None,
+        **kwargs
+    ) -> None:
+        shape = self.canvas_shape
+
+        token = '%012d' % self.current
+
+        image_file = self.image_path / (token + '.png')
+
+        self._write_channels(world, [image_file], overwrite=overwrite, context=context)
+
+        bboxes, masks = [], []
+
+        for bbox in context.get('ground_truth_bboxes', shape):
+            mask, (y, x) = rasterize_points_in_bbox(bbox.points, shape)
+
+            bboxes.append((x, y, mask.shape[1], mask.shape[0]))
+            masks.append(mask.ravel())
+
+        arrays = dict(
+            bboxes=np.array(bboxes, dtype=np.int32).reshape(-1, 4),
+            offsets=np.cumsum([0] + [len(mask) for mask in masks], dtype=np.int64),
+            masks=np.concatenate(masks) if masks else np.zeros(0, dtype=np.uint8),
+        )
+
+        if CroppedMaskOutputFormat.value == 'npz':
+            submit_write(
+                np.savez_compressed,
+                check_overwrite(str(self.mask_path / (token + '.npz')), overwrite),
+                **arrays
+            )
+        else:
+            for name in CROPPED_MASK_ARRAYS:
+                submit_write(
+                    np.save,
+                    check_overwrite(
+                        str(self.mask_path / ('%s-%s.npy' % (token, name))), overwrite
+                    ),
+                    arrays[name],
+                )
 
 
 __all__ = [
     'YOLOOutput',
     'COCOOutput',
     'GenericMaskOutput',
+    'InstanceMaskOutput',
+    'CroppedMaskOutput',
 ]
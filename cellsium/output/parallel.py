@@ -0,0 +1,224 @@
+"""Parallel rendering of frames in a pool of worker processes."""
+import zlib
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from tunable import SelectableManager, Tunable, TunableManager
+
+from ..random import RRF
+from ..simulation.simulator import World
+from . import FrameContext
+from .render import PlainRenderer, RenderChannels, WorldSnapshot
+
+
+class RenderWorkers(Tunable):
+    """Number of worker processes rendering frames in parallel (0 to disable)"""
+
+    default: int = 0
+
+
+class RenderWorkerThreads(Tunable):
+    """Number of OpenCV threads used by each render worker process"""
+
+    default: int = 1
+
+
+class RenderWorkerMaximumPending(Tunable):
+    """Maximum number of rendered frames waiting to be written, per worker"""
+
+    default: int = 2
+
+
+_worker_renderers: Dict[str, PlainRenderer] = {}
+_worker_seed = 0
+
+
+def get_worker_tunables() -> Dict[str, Any]:
+    """
+    Returns the values of all tunables to be passed to the render workers.
+
+    :return: Dictionary of tunable names and values
+    """
+    # multiple selectables (e.g. Output) are lists of choices,
+    # which can't be represented as a value, workers don't need them
+    multiple = {
+        selectable.__module__ + '.' + selectable.__name__
+        for selectable in SelectableManager.get()
+        if SelectableManager.is_multiple(selectable)
+    }
+
+    return {
+        name: tunable.value
+        for name, tunable in TunableManager.get_long_dict().items()
+        if name not in multiple
+    }
+
+
+def initialize_worker(tunables: Dict[str, Any], seed: int, threads: int) -> None:
+    global _worker_seed
+
+    # tunables of modules not imported by the worker are not needed for rendering
+    known = TunableManager.get_multi_dict()
+    TunableManager.load({key: value for key, value in tunables.items() if key in known})
+    RRF.seed(seed)
+
+    _worker_seed = seed
+
+    # the pool is the parallelism, avoid oversubscription
+    cv2.setNumThreads(threads)
+
+    _worker_renderers.clear()
+
+
+def new_worker_renderer(renderer_name: str) -> PlainRenderer:
+    # renderers draw random numbers when constructed (e.g. the uneven illumination),
+    # seeding by name makes them independent of which worker gets which frame first
+    seed = np.random.SeedSequence([_worker_seed, zlib.crc32(renderer_name.encode())])
+    RRF.seed(int(seed.generate_state(1)[0]))
+
+    return RenderChannels.get_mapping()[renderer_name]()
+
+
+def render_in_worker(
+    renderer_name: str, snapshot: WorldSnapshot, seed: np.random.SeedSequence
+) -> np.ndarray:
+    renderer = _worker_renderers.get(renderer_name)
+
+    if renderer is None:
+        renderer = new_worker_renderer(renderer_name)
+        _worker_renderers[renderer_name] = renderer
+
+    renderer.reseed(seed)
+
+    return renderer.output(snapshot.to_world())
+
+
+class RenderScheduler:
+    """
+    Renders frames in a pool of worker processes.
+
+    Worlds are shipped as compact WorldSnapshot s, each worker keeps its own
+    renderer instances. Per-frame random numbers are drawn from a seed derived
+    from the seed and the submission number, so results are reproducible
+    independent of which worker renders which frame. Renderers drawing random
+    numbers per frame (fluorescence, noise) hence produce different (but equally
+    distributed) images than when rendering sequentially, others the same images.
+    Callbacks registered via then are called in submission order.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        threads: Optional[int] = None,
+        maximum_pending: Optional[int] = None,
+        tunables: Optional[Dict[str, Any]] = None,
+    ):
+        if workers is None:
+            workers = RenderWorkers.value
+
+        if threads is None:
+            threads = RenderWorkerThreads.value
+
+        if maximum_pending is None:
+            maximum_pending = RenderWorkerMaximumPending.value
+
+        if tunables is None:
+            tunables = get_worker_tunables()
+
+        self.seed = RRF.seed_value
+        self.submitted = 0
+        self.maximum_pending = max(1, maximum_pending * workers)
+        self.pending: Deque[Tuple[Future, Callable[[Any], None]]] = deque()
+
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=initialize_worker,
+            initargs=(tunables, self.seed, threads),
+        )
+
+    def submit(
+        self,
+        renderer: PlainRenderer,
+        world: World,
+        context: Optional[FrameContext] = None,
+    ) -> Future:
+        """
+        Submits rendering world with (a worker's instance of) renderer's class.
+
+        :param renderer: Renderer
+        :param world: World
+        :param context: FrameContext of world, sharing the cell index
+        :return: Future of the rendered image
+        """
+        seed = np.random.SeedSequence([self.seed, self.submitted])
+        self.submitted += 1
+
+        return self.executor.submit(
+            render_in_worker,
+            renderer.__class__.__name__,
+            WorldSnapshot(world, context=context),
+            seed,
+        )
+
+    def then(self, future: Future, callback: Callable[[Any], None]) -> None:
+        """
+        Calls callback with the result of future, in submission order.
+        Blocks if too many results are pending.
+
+        :param future: Future
+        :param callback: Callable
+        :return: None
+        """
+        self.pending.append((future, callback))
+
+        while len(self.pending) > self.maximum_pending:
+            self.collect(block_first=True)
+
+        self.collect()
+
+    def collect(self, block_first: bool = False, block: bool = False) -> None:
+        """
+        Calls the callbacks of all pending futures which are done (in order).
+
+        :param block_first: Whether to wait for the first pending future
+        :param block: Whether to wait for all pending futures
+        :return: None
+        """
+        while self.pending and (block or block_first or self.pending[0][0].done()):
+            future, callback = self.pending.popleft()
+            callback(future.result())
+            block_first = False
+
+    def close(self) -> None:
+        """
+        Waits for all pending renderings and shuts down the worker pool.
+
+        :return: None
+        """
+        try:
+            self.collect(block=True)
+        finally:
+            self.executor.shutdown()
+
+    def __enter__(self) -> "RenderScheduler":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def new_render_scheduler_from_tunables() -> Optional[RenderScheduler]:
+    """
+    Creates a RenderScheduler if RenderWorkers is set, otherwise returns None.
+
+    :return: RenderScheduler or None
+    """
+    if RenderWorkers.value > 0:
+        return RenderScheduler()
+    return None
+
+
+__all__ = ['RenderScheduler']
@@ -1,30 +1,65 @@
 """Photorealistic rendered output."""
+import hashlib
+import json
 import os
+import sys
 import warnings
-from typing import Dict, Iterator, List, Optional, Set, Tuple
+from collections import Counter
+from concurrent.futures import Future
+from functools import lru_cache
+from math import cos, sin
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
 import cv2
 import numpy as np
 from matplotlib import pyplot
 from matplotlib.patches import PathPatch as MatplotlibPathPatch
 from matplotlib.path import Path as MatplotlibPath
-from roifile import ImagejRoi
+from roifile import ImagejRoi, roiread, roiwrite
+from scipy.fft import next_fast_len
 from scipy.interpolate import interp1d
 from scipy.ndimage.interpolation import rotate
-from tifffile import TiffWriter
+from tifffile import TiffFile, TiffWriter
 from tunable import Tunable
 
-from ..model import CellGeometry, WithFluorescence
-from ..parameters import Height, Width, um_to_pixel
-from ..random import RRF
-from ..simulation.simulator import World
+from ..model import (
+    BentRod,
+    CellGeometry,
+    Coccoid,
+    RodShaped,
+    Shape,
+    WithAngle,
+    WithFluorescence,
+    WithPosition,
+)
+from ..model.agent import iter_through_class_hierarchy
+from ..parameters import Height, Width, pixel_to_um, um_to_pixel
+from ..random import RRF, RandomNumberGenerator
+from ..simulation.simulator import CellIndex, World
 from . import (
+    FrameContext,
     Output,
     check_overwrite,
+    ensure_path,
     ensure_path_and_extension,
     ensure_path_and_extension_and_number,
 )
 from .plot import MicrometerPerCm
+from .writer import submit_write, write_image
+
+BBoxType = Tuple[int, int, int, int]
 
 
 def bytescale(image: np.ndarray) -> np.ndarray:
@@ -70,12 +105,138 @@ def noise_attempt(
     return the_sum
 
 
+def smooth_random_field_coarse(
+    shape: Tuple[int, int], sigma: float, rng: np.random.Generator
+) -> Tuple[np.ndarray, int]:
+    # white noise, low-pass filtered with a Gaussian (of sigma pixels) in the
+    # Fourier domain, scaled to unit variance (across realizations, not per field).
+    # the domain is padded, so that the periodic boundary does not show.
+    # as the field is smooth, it is generated on a coarser grid and upscaled
+    scale = max(1, int(sigma // 8))
+    sigma /= scale
+
+    low_shape = tuple(int(np.ceil(size / scale)) + 1 for size in shape)
+
+    padding = int(np.ceil(3 * sigma))
+    fft_shape = tuple(next_fast_len(size + padding, real=True) for size in low_shape)
+
+    frequency_y = np.fft.fftfreq(fft_shape[0])[:, np.newaxis]
+    frequency_x = np.fft.rfftfreq(fft_shape[1])[np.newaxis, :]
+
+    transfer = np.exp(
+        -2.0 * (np.pi * sigma) ** 2 * (frequency_x ** 2 + frequency_y ** 2)
+    )
+
+    # variance of filtered unit white noise, the rfft half-plane counts twice
+    # except for the zero (and possibly Nyquist) column
+    weights = np.full(transfer.shape[1], 2.0)
+    weights[0] = 1.0
+    if fft_shape[1] % 2 == 0:
+        weights[-1] = 1.0
+    variance = np.sum(weights * transfer ** 2) / np.prod(fft_shape)
+
+    spectrum = np.fft.rfft2(rng.standard_normal(fft_shape))
+    spectrum *= transfer
+
+    field = np.fft.irfft2(spectrum, s=fft_shape)[: low_shape[0], : low_shape[1]]
+    field = (field / np.sqrt(variance)).astype(np.float32)
+
+    return field, scale
+
+
+def upscale_field(field: np.ndarray, scale: int, window: BBoxType) -> np.ndarray:
+    # only the part of the coarse field needed for the window (plus the support
+    # of the cubic interpolation) is upscaled
+    x_min, y_min, x_max, y_max = window
+
+    if scale == 1:
+        return field[y_min:y_max, x_min:x_max]
+
+    low_x_min, low_y_min = max(x_min // scale - 2, 0), max(y_min // scale - 2, 0)
+    low_x_max = min(-(-x_max // scale) + 2, field.shape[1])
+    low_y_max = min(-(-y_max // scale) + 2, field.shape[0])
+
+    upscaled = cv2.resize(
+        field[low_y_min:low_y_max, low_x_min:low_x_max],
+        dsize=((low_x_max - low_x_min) * scale, (low_y_max - low_y_min) * scale),
+        interpolation=cv2.INTER_CUBIC,
+    )
+
+    x_offset, y_offset = low_x_min * scale, low_y_min * scale
+
+    return upscaled[
+        y_min - y_offset : y_max - y_offset, x_min - x_offset : x_max - x_offset
+    ]
+
+
+def smooth_random_field(
+    shape: Tuple[int, int], sigma: float, rng: np.random.Generator
+) -> np.ndarray:
+    field, scale = smooth_random_field_coarse(shape, sigma, rng)
+
+    return np.ascontiguousarray(upscale_field(field, scale, (0, 0, shape[1], shape[0])))
+
+
+def uneven_illumination_field_coarse(
+    shape: Tuple[int, int], m: int = 10, rng: Optional[np.random.Generator] = None
+) -> Tuple[np.ndarray, int]:
+    if rng is None:
+        rng = RRF.spawn_generator()
+
+    # matches the spectral character of noise_attempt(times=5, m=m),
+    # correlation length proportional to n / m
+    n = max(shape)
+    return smooth_random_field_coarse(shape, sigma=1.15 * n / m, rng=rng)
+
+
+def uneven_illumination_from_coarse(
+    field: np.ndarray, scale: int, window: BBoxType
+) -> np.ndarray:
+    # mean 0.6, standard deviation 0.11 like noise_attempt
+    return 0.6 + 0.11 * upscale_field(field, scale, window)
+
+
+def uneven_illumination_field(
+    shape: Tuple[int, int], m: int = 10, rng: Optional[np.random.Generator] = None
+) -> np.ndarray:
+    field, scale = uneven_illumination_field_coarse(shape, m=m, rng=rng)
+
+    return uneven_illumination_from_coarse(field, scale, (0, 0, shape[1], shape[0]))
+
+
+def load_or_generate_cached(
+    directory: str, key: Dict, generate: Callable[[], np.ndarray]
+) -> np.ndarray:
+    if not directory:
+        return generate()
+
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+    path = Path(directory) / (digest + '.npy')
+
+    if path.is_file():
+        return np.load(str(path), mmap_mode='r')
+
+    array = generate()
+
+    # write to a temporary file first, so concurrent readers never see partial data
+    temporary_path = path.parent / ('%s.%d.tmp.npy' % (digest, os.getpid()))
+    np.save(ensure_path(str(temporary_path)), array)
+    os.replace(str(temporary_path), str(path))
+
+    return array
+
+
 def gaussian(
     array: np.ndarray, dst: np.ndarray = None, sigma: float = 1.0
 ) -> np.ndarray:
     return cv2.GaussianBlur(array, (0, 0), sigmaX=um_to_pixel(sigma), dst=dst)
 
 
+def gaussian_radius(sigma: float = 1.0) -> int:
+    # half the kernel size OpenCV derives for float images
+    return (int(round(um_to_pixel(sigma) * 4 * 2 + 1)) | 1) // 2
+
+
 class LuminanceBackground(Tunable):
     """Luminance (lightness) of the background, in 0-1 units."""
 
@@ -95,20 +256,209 @@ def add_if_uneven(value: int, add: int = 1) -> int:
         return value + add
 
 
-def new_canvas(dtype=np.float32) -> np.ndarray:
+def get_canvas_shape() -> Tuple[int, int]:
     width, height = int(um_to_pixel(Width.value)), int(um_to_pixel(Height.value))
     # make even
     width, height = add_if_uneven(width), add_if_uneven(height)
-    canvas = np.zeros((height, width), dtype=dtype)
+    return height, width
+
+
+def new_canvas(dtype=np.float32) -> np.ndarray:
+    canvas = np.zeros(get_canvas_shape(), dtype=dtype)
     return canvas
 
 
+def get_cells_in_window(
+    index: CellIndex, shape: Tuple[int, int], window: BBoxType
+) -> List[CellGeometry]:
+    # cells which might cover pixels of the window of a canvas of shape,
+    # the margin covers the anti-aliased fringe
+    height = shape[0]
+    x_min, y_min, x_max, y_max = window
+    margin = pixel_to_um(2.0)
+
+    # flip y, to have (0,0) bottom left
+    return index.query(
+        pixel_to_um(x_min) - margin,
+        pixel_to_um(height - y_max) - margin,
+        pixel_to_um(x_max) + margin,
+        pixel_to_um(height - y_min) + margin,
+    )
+
+
+@FrameContext.product('cell_index')
+def get_cell_index(context: FrameContext) -> CellIndex:
+    # cells are moved in-place, the index is only valid for the frame
+    return context.world.index()
+
+
+def get_visible_cells(
+    world: World,
+    shape: Optional[Tuple[int, int]] = None,
+    context: Optional[FrameContext] = None,
+) -> List[CellGeometry]:
+    if shape is None:
+        shape = get_canvas_shape()
+
+    index = FrameContext.ensure(world, context).get('cell_index')
+
+    return get_cells_in_window(index, shape, (0, 0, shape[1], shape[0]))
+
+
+def grow_bbox(bbox: BBoxType, by: int, shape: Tuple[int, int]) -> BBoxType:
+    x_min, y_min, x_max, y_max = bbox
+    height, width = shape
+
+    return (
+        max(x_min - by, 0),
+        max(y_min - by, 0),
+        min(x_max + by, width),
+        min(y_max + by, height),
+    )
+
+
+def crop_to_bbox(array: np.ndarray, window: BBoxType, bbox: BBoxType) -> np.ndarray:
+    # array covers window, return the part covering bbox
+    return array[
+        bbox[1] - window[1] : bbox[3] - window[1],
+        bbox[0] - window[0] : bbox[2] - window[0],
+    ]
+
+
+def iterate_tiles(shape: Tuple[int, int], tile_size: int) -> Iterator[BBoxType]:
+    height, width = shape
+
+    for y in range(0, height, tile_size):
+        for x in range(0, width, tile_size):
+            yield x, y, min(x + tile_size, width), min(y + tile_size, height)
+
+
 class OpenCVimshow(Tunable):
     """Show results using OpenCV"""
 
     default: bool = False
 
 
+class RenderWithMatplotlib(Tunable):
+    """Rasterize cells using matplotlib (legacy) instead of the built-in rasterizer"""
+
+    default: bool = False
+
+
+class RenderOverSample(Tunable):
+    """Over-sampling factor per dimension for the anti-aliased cell rasterizer"""
+
+    default: int = 4
+
+
+class RenderCapsulesAnalytically(Tunable):
+    """Rasterize rod-shaped and coccoid cells from their signed distance field"""
+
+    default: bool = True
+
+
+class PhaseContrastThickness(Tunable):
+    """Cell thickness [um] shown at full contrast in phase contrast (0: use coverage)"""
+
+    default: float = 0.0
+
+    @classmethod
+    def test(cls, value: float) -> bool:
+        return value >= 0.0
+
+
+class RenderTiled(Tunable):
+    """Render tile by tile, without full canvas sized arrays (set by TiledTiffOutput)"""
+
+    default: bool = False
+
+
+class RenderTileSize(Tunable):
+    """Edge length of rendered tiles [pixels, multiple of 16]"""
+
+    default: int = 1024
+
+    @classmethod
+    def test(cls, value: int) -> bool:
+        return value > 0 and value % 16 == 0
+
+
+class RenderNoiseBank(Tunable):
+    """Compose per-frame renderer noise from a bank of precomputed tiles"""
+
+    default: bool = False
+
+
+class RenderNoiseBankTiles(Tunable):
+    """Number of precomputed tiles in the noise bank"""
+
+    default: int = 16
+
+
+class RenderNoiseBankTileSize(Tunable):
+    """Edge length of the precomputed noise bank tiles [pixels]"""
+
+    default: int = 256
+
+
+class NoiseBank:
+    def __init__(
+        self,
+        rng: np.random.Generator,
+        tiles: Optional[int] = None,
+        tile_size: Optional[int] = None,
+    ):
+        if tiles is None:
+            tiles = RenderNoiseBankTiles.value
+
+        if tile_size is None:
+            tile_size = RenderNoiseBankTileSize.value
+
+        self.rng = rng
+        self.tiles = rng.standard_normal((tiles, tile_size, tile_size), np.float32)
+
+    def normal(
+        self, out: np.ndarray, loc: float = 0.0, scale: float = 1.0
+    ) -> np.ndarray:
+        # white noise has no spatial structure, so the seams between randomly
+        # chosen, flipped and transposed tiles on a randomly rolled grid
+        # are statistically invisible
+        count, tile_size = len(self.tiles), self.tiles.shape[1]
+        height, width = out.shape
+
+        roll_y, roll_x = self.rng.integers(0, tile_size, size=2)
+
+        ys = range(-roll_y, height, tile_size)
+        xs = range(-roll_x, width, tile_size)
+
+        choices = self.rng.integers(0, count, size=len(ys) * len(xs))
+        orientations = self.rng.integers(0, 8, size=len(ys) * len(xs))
+
+        slots = ((y, x) for y in ys for x in xs)
+
+        for (y, x), choice, orientation in zip(slots, choices, orientations):
+            tile = self.tiles[choice]
+
+            if orientation & 1:
+                tile = tile[::-1]
+            if orientation & 2:
+                tile = tile[:, ::-1]
+            if orientation & 4:
+                tile = tile.T
+
+            y_from, y_to = max(y, 0), min(y + tile_size, height)
+            x_from, x_to = max(x, 0), min(x + tile_size, width)
+
+            out[y_from:y_to, x_from:x_to] = tile[
+                y_from - y : y_to - y, x_from - x : x_to - x
+            ]
+
+        out *= scale
+        out += loc
+
+        return out
+
+
 def prepare_patch(coordinates: np.ndarray, **kwargs) -> MatplotlibPathPatch:
     actions = [MatplotlibPath.MOVETO] + [MatplotlibPath.LINETO] * (len(coordinates) - 1)
 
@@ -144,6 +494,28 @@ def scale_points_absolute(points: np.ndarray, delta: float = 0.0) -> np.ndarray:
     return points
 
 
+def offset_points(points: np.ndarray, delta: float = 0.0) -> np.ndarray:
+    if delta == 0.0:
+        return points
+
+    x, y = points[:, 0], points[:, 1]
+
+    # move each vertex along its normal, outwards for positive delta
+    tangent = np.empty_like(points)
+    tangent[1:-1] = points[2:] - points[:-2]
+    tangent[0], tangent[-1] = points[1] - points[-1], points[0] - points[-2]
+
+    normal = tangent[:, ::-1] * [1.0, -1.0]
+    length = np.maximum(np.hypot(tangent[:, 0], tangent[:, 1]), np.finfo(float).eps)
+    normal /= length[:, np.newaxis]
+
+    orientation = np.sign(
+        np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]) + x[-1] * y[0] - x[0] * y[-1]
+    )
+
+    return points + orientation * delta * normal
+
+
 # noinspection PyUnusedLocal
 def render_on_canvas_cv2(
     canvas: np.ndarray, array_of_points: np.ndarray, scale_points: float = 1.0, **kwargs
@@ -155,6 +527,64 @@ def render_on_canvas_cv2(
     return canvas
 
 
+def render_on_canvas_antialiased(
+    canvas: np.ndarray,
+    array_of_points: np.ndarray,
+    scale_points: float = 1.0,
+    over_sample: int = 4,
+    shift: int = 8,
+    shrink: float = 0.25,
+) -> np.ndarray:
+    # each polygon is filled with sub-pixel accuracy (fixed-point coordinates with
+    # shift fractional bits) into an over-sampled window around its bounding box,
+    # which is averaged down to pixel coverage and merged into the canvas.
+    # shrinking the polygons slightly mimics the dark outline the matplotlib
+    # renderer draws around each cell
+    height, width = canvas.shape[:2]
+    fixed_point = float(1 << shift)
+
+    for points in array_of_points:
+        points = scale_points_relative(points, scale_points)
+
+        x_min, y_min = np.floor(points.min(axis=0)).astype(int) - 1
+        x_max, y_max = np.ceil(points.max(axis=0)).astype(int) + 2
+
+        x_min, y_min = max(x_min, 0), max(y_min, 0)
+        x_max, y_max = min(x_max, width), min(y_max, height)
+
+        if x_min >= x_max or y_min >= y_max:
+            continue
+
+        points = offset_points(points, -shrink)
+
+        window_shape = (y_max - y_min, x_max - x_min)
+
+        over_sampled = np.zeros(
+            (window_shape[0] * over_sample, window_shape[1] * over_sample),
+            dtype=np.float32,
+        )
+
+        # pixel centers of the over-sampled window in (local) canvas coordinates
+        local_points = (points - [x_min, y_min] + 0.5) * over_sample - 0.5
+
+        cv2.fillPoly(
+            over_sampled,
+            np.round(local_points * fixed_point)[np.newaxis].astype(np.int32),
+            1.0,
+            lineType=cv2.LINE_8,
+            shift=shift,
+        )
+
+        coverage = cv2.resize(
+            over_sampled, dsize=window_shape[::-1], interpolation=cv2.INTER_AREA
+        )
+
+        window = canvas[y_min:y_max, x_min:x_max]
+        np.maximum(window, coverage, out=window)
+
+    return canvas
+
+
 def render_on_canvas_matplotlib(
     canvas: np.ndarray,
     array_of_points: np.ndarray,
@@ -244,6 +674,338 @@ def get_canvas_points_for_cell(
     return points
 
 
+@FrameContext.product('canvas_points')
+def get_canvas_points_for_world(
+    context: FrameContext, image_height: int
+) -> List[np.ndarray]:
+    return [
+        get_canvas_points_for_cell(cell, image_height=image_height)
+        for cell in context.world.cells
+    ]
+
+
+CapsuleType = Tuple[np.ndarray, np.ndarray, float]
+
+
+def get_canvas_capsule_for_cell(
+    cell: CellGeometry, image_height: Optional[int] = None
+) -> Optional[CapsuleType]:
+    # only shapes which are exactly a capsule, i.e. all points within radius
+    # of the medial segment from start to stop, can be handled analytically
+    raw_points = type(cell).raw_points
+
+    if raw_points is Coccoid.raw_points:
+        radius = cell.length / 2.0
+        half_length = 0.0
+    elif raw_points is RodShaped.raw_points or (
+        raw_points is BentRod.raw_points
+        and cell.bend_overall == cell.bend_upper == cell.bend_lower == 0.0
+    ):
+        radius = cell.width / 2.0
+        half_length = max(cell.length / 2.0 - radius, 0.0)
+    else:
+        return None
+
+    position = np.array(cell.position, dtype=np.float64)
+    direction = half_length * np.array([cos(cell.angle), sin(cell.angle)])
+
+    start = um_to_pixel(position - direction)
+    stop = um_to_pixel(position + direction)
+
+    if image_height:
+        # flip y, to have (0,0) bottom left
+        start[1], stop[1] = image_height - start[1], image_height - stop[1]
+
+    return start, stop, um_to_pixel(radius)
+
+
+class WorldSnapshot:
+    # compact, picklable form of a World for rendering: the cells' geometry
+    # parameters (shape, placement and fluorescence) as arrays per cell type.
+    # cell types might be created dynamically, hence the cells are rebuilt
+    # as instances of a type combining just their geometry classes
+    def __init__(self, world: World, context: Optional[FrameContext] = None):
+        # cells outside of the canvas are not needed
+        cells = get_visible_cells(world, context=context)
+
+        self.cell_count = len(cells)
+        self.groups = []
+
+        cells_by_type = {}
+
+        for n, cell in enumerate(cells):
+            cells_by_type.setdefault(type(cell), []).append(n)
+
+        for cell_type, indices in cells_by_type.items():
+            bases = get_geometry_bases(cell_type)
+
+            parameters = {
+                name: pack_parameter([getattr(cells[n], name) for n in indices])
+                for name in get_geometry_parameters(bases)
+            }
+
+            self.groups.append((bases, np.array(indices), parameters))
+
+    def to_world(self) -> World:
+        cells = [None] * self.cell_count
+
+        for bases, indices, parameters in self.groups:
+            cell_type = get_geometry_type(bases)
+
+            for m, n in enumerate(indices):
+                cell = cell_type.__new__(cell_type)
+
+                for name, (values, lengths) in parameters.items():
+                    if lengths is None:
+                        setattr(cell, name, float(values[m]))
+                    else:
+                        setattr(cell, name, values[m, : lengths[m]].tolist())
+
+                cells[n] = cell
+
+        world = World()
+
+        for cell in cells:
+            world.add(cell)
+
+        world.commit()
+
+        return world
+
+
+GeometryClasses = (Shape, WithPosition, WithAngle, WithFluorescence)
+
+
+def is_importable(class_: type) -> bool:
+    module = sys.modules.get(class_.__module__)
+    return getattr(module, class_.__qualname__, None) is class_
+
+
+@lru_cache(maxsize=None)
+def get_geometry_bases(cell_type: type) -> Tuple[type, ...]:
+    # dynamically created classes can not be pickled (by reference)
+    classes = [
+        class_
+        for class_ in cell_type.__mro__
+        if issubclass(class_, GeometryClasses) and is_importable(class_)
+    ]
+    # omit classes already inherited by another one
+    return tuple(
+        class_
+        for class_ in classes
+        if not any(
+            other is not class_ and issubclass(other, class_) for other in classes
+        )
+    )
+
+
+@lru_cache(maxsize=None)
+def get_geometry_type(bases: Tuple[type, ...]) -> type:
+    return type('CellGeometrySnapshot', bases, {})
+
+
+@lru_cache(maxsize=None)
+def get_geometry_parameters(bases: Tuple[type, ...]) -> Tuple[str, ...]:
+    names = []
+
+    for class_ in iter_through_class_hierarchy(get_geometry_type(bases)):
+        if issubclass(class_, GeometryClasses):
+            for name in class_.defaults().keys():
+                if name not in names:
+                    names.append(name)
+
+    return tuple(names)
+
+
+def pack_parameter(values: list) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    # scalars become a vector, lists (of possibly varying length) a padded matrix
+    if not values or np.isscalar(values[0]):
+        return np.array(values, dtype=np.float64), None
+
+    lengths = np.array([len(value) for value in values])
+    packed = np.full((len(values), lengths.max(initial=0)), np.nan)
+
+    for n, value in enumerate(values):
+        packed[n, : len(value)] = value
+
+    return packed, lengths
+
+
+def get_geometry_key(cell: CellGeometry) -> Hashable:
+    # cells with equal keys are rendered identically
+    bases = get_geometry_bases(type(cell))
+
+    return bases, tuple(
+        value if np.isscalar(value) else tuple(np.ravel(value).tolist())
+        for value in (getattr(cell, name) for name in get_geometry_parameters(bases))
+    )
+
+
+def get_canvas_bbox_for_cell(cell: CellGeometry, image_height: int) -> BBoxType:
+    # generous enough to contain the anti-aliased fringe of either rasterizer
+    points = get_canvas_points_raw(cell, image_height)
+
+    x_min, y_min = np.floor(points.min(axis=0)).astype(int) - 2
+    x_max, y_max = np.ceil(points.max(axis=0)).astype(int) + 3
+
+    return int(x_min), int(y_min), int(x_max), int(y_max)
+
+
+def bboxes_intersect(a: BBoxType, b: BBoxType) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class DirtyRegions:
+    # tracks the cells' geometry between consecutive frames, the dirty region
+    # encloses every cell which appeared or vanished since the previous frame,
+    # i.e. which moved, grew or divided
+    def __init__(self, shape: Tuple[int, int]):
+        self.shape = shape
+        self.counts: Counter = Counter()
+        self.bboxes: Dict[Hashable, BBoxType] = {}
+        self.cells: List[Tuple[CellGeometry, BBoxType]] = []
+
+    def update(self, cells: Iterable[CellGeometry]) -> Optional[BBoxType]:
+        height, width = self.shape
+
+        counts, bboxes, self.cells = Counter(), {}, []
+
+        for cell in cells:
+            key = get_geometry_key(cell)
+            counts[key] += 1
+
+            bbox = bboxes.get(key) or self.bboxes.get(key)
+            if bbox is None:
+                bbox = get_canvas_bbox_for_cell(cell, height)
+
+            bboxes[key] = bbox
+            self.cells.append((cell, bbox))
+
+        changed = (counts - self.counts) + (self.counts - counts)
+        dirty = [bboxes.get(key) or self.bboxes[key] for key in changed]
+
+        self.counts, self.bboxes = counts, bboxes
+
+        if not dirty:
+            return None
+
+        x_min = max(min(b[0] for b in dirty), 0)
+        y_min = max(min(b[1] for b in dirty), 0)
+        x_max = min(max(b[2] for b in dirty), width)
+        y_max = min(max(b[3] for b in dirty), height)
+
+        if x_min >= x_max or y_min >= y_max:
+            return None
+
+        return x_min, y_min, x_max, y_max
+
+    def cells_within(self, region: BBoxType) -> List[CellGeometry]:
+        return [cell for cell, bbox in self.cells if bboxes_intersect(bbox, region)]
+
+
+def render_capsules_on_canvas(
+    canvas: Optional[np.ndarray],
+    capsules: Iterable[CapsuleType],
+    thickness: Optional[np.ndarray] = None,
+    shrink: float = 0.25,
+) -> Optional[np.ndarray]:
+    # pixel coverage follows from the signed distance to the capsule surface,
+    # the thickness (in um) of the solid of revolution from the distance to its axis,
+    # both are only evaluated within the bounding box window of each capsule
+    reference = canvas if canvas is not None else thickness
+    height, width = reference.shape[:2]
+
+    for start, stop, radius in capsules:
+        x_min, y_min = np.floor(np.minimum(start, stop) - radius).astype(int) - 1
+        x_max, y_max = np.ceil(np.maximum(start, stop) + radius).astype(int) + 2
+
+        x_min, y_min = max(x_min, 0), max(y_min, 0)
+        x_max, y_max = min(x_max, width), min(y_max, height)
+
+        if x_min >= x_max or y_min >= y_max:
+            continue
+
+        axis_x, axis_y = float(stop[0] - start[0]), float(stop[1] - start[1])
+        axis_length_squared = axis_x ** 2 + axis_y ** 2
+
+        x = np.arange(x_min, x_max, dtype=np.float32)[np.newaxis, :]
+        y = np.arange(y_min, y_max, dtype=np.float32)[:, np.newaxis]
+
+        delta_x, delta_y = x - float(start[0]), y - float(start[1])
+
+        if axis_length_squared > 0.0:
+            # project onto the medial segment
+            t = np.clip(
+                (delta_x * axis_x + delta_y * axis_y) / axis_length_squared, 0.0, 1.0
+            )
+            delta_x, delta_y = delta_x - t * axis_x, delta_y - t * axis_y
+
+        distance = np.hypot(delta_x, delta_y)
+
+        if canvas is not None:
+            coverage = np.clip(radius - shrink + 0.5 - distance, 0.0, 1.0)
+
+            window = canvas[y_min:y_max, x_min:x_max]
+            np.maximum(window, coverage, out=window)
+
+        if thickness is not None:
+            cell_thickness = pixel_to_um(
+                2.0 * np.sqrt(np.clip(radius ** 2 - distance ** 2, 0.0, None))
+            )
+
+            window = thickness[y_min:y_max, x_min:x_max]
+            np.maximum(window, cell_thickness, out=window)
+
+    return canvas
+
+
+def render_thickness_on_canvas(
+    thickness: np.ndarray, array_of_points: np.ndarray
+) -> np.ndarray:
+    # approximates arbitrary shapes as solids with a circular cross-section,
+    # whose radius is the largest distance from the outline within the shape
+    height, width = thickness.shape[:2]
+
+    for points in array_of_points:
+        # the mask window is not clipped to the canvas, as the distance transform
+        # needs the complete outline
+        x_min, y_min = np.floor(points.min(axis=0)).astype(int) - 1
+        x_max, y_max = np.ceil(points.max(axis=0)).astype(int) + 2
+
+        x_from, y_from = max(x_min, 0), max(y_min, 0)
+        x_to, y_to = min(x_max, width), min(y_max, height)
+
+        if x_from >= x_to or y_from >= y_to:
+            continue
+
+        mask = np.zeros((y_max - y_min, x_max - x_min), dtype=np.uint8)
+
+        cv2.fillPoly(
+            mask,
+            np.round((points - [x_min, y_min]) * 256)[np.newaxis].astype(np.int32),
+            1,
+            shift=8,
+        )
+
+        distance = cv2.distanceTransform(mask, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+
+        radius = distance.max()
+
+        cell_thickness = pixel_to_um(
+            2.0 * np.sqrt(np.clip(radius ** 2 - (radius - distance) ** 2, 0.0, None))
+        )
+        cell_thickness[mask == 0] = 0.0
+
+        cell_thickness = cell_thickness[
+            y_from - y_min : y_to - y_min, x_from - x_min : x_to - x_min
+        ]
+
+        window = thickness[y_from:y_to, x_from:x_to]
+        np.maximum(window, cell_thickness, out=window)
+
+    return thickness
+
+
 def cv2_has_write_support(extension: str) -> bool:
     try:
         # Suppress a warning, apparently in some old JPEG2000
@@ -277,18 +1039,32 @@ class PlainRenderer(Output):
     def __init__(self):
         super().__init__()
         self.fig = self.ax = self.imshow_data = None
+        self.buffers = {}
 
     @staticmethod
     def new_canvas():
         return new_canvas()
 
+    def buffer(self, name: str, shape: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        # working buffers are kept across frames, their content is undefined. they
+        # only grow, smaller shapes (e.g. dirty regions) are contiguous views
+        if shape is None:
+            shape = new_canvas().shape
+
+        size = int(np.prod(shape))
+
+        if name not in self.buffers or self.buffers[name].size < size:
+            self.buffers[name] = np.empty(size, dtype=np.float32)
+
+        return self.buffers[name][:size].reshape(shape)
+
     @staticmethod
     def imwrite(
         name: str,
         img: np.ndarray,
         overwrite: bool = False,
         output_count: Optional[int] = None,
-    ) -> bool:
+    ) -> None:
         name = check_overwrite(
             ensure_path_and_extension_and_number(
                 name,
@@ -299,7 +1075,7 @@ class PlainRenderer(Output):
             overwrite=overwrite,
         )
 
-        return cv2.imwrite(name, img)
+        submit_write(write_image, name, img)
 
     def debug_output(self, name: str, array: np.ndarray) -> None:
         if not self.write_debug_output:
@@ -313,23 +1089,150 @@ class PlainRenderer(Output):
     ) -> np.ndarray:
         if fast:
             canvas = render_on_canvas_cv2(canvas, array_of_points)
-        else:
+        elif RenderWithMatplotlib.value:
             canvas = render_on_canvas_matplotlib(canvas, array_of_points)
+        else:
+            canvas = render_on_canvas_antialiased(
+                canvas, array_of_points, over_sample=RenderOverSample.value
+            )
         return canvas
 
-    def output(self, world: World, **kwargs) -> np.ndarray:
+    @staticmethod
+    def prepare_cells(
+        cells: Iterable[CellGeometry],
+        image_height: int,
+        offset: Optional[np.ndarray] = None,
+    ) -> Tuple[List[CapsuleType], List[np.ndarray]]:
+        capsules, array_of_points = [], []
+
+        if offset is None:
+            offset = np.zeros(2)
+
+        analytically = (
+            RenderCapsulesAnalytically.value and not RenderWithMatplotlib.value
+        )
+
+        for cell in cells:
+            capsule = (
+                get_canvas_capsule_for_cell(cell, image_height)
+                if analytically
+                else None
+            )
+
+            if capsule is not None:
+                start, stop, radius = capsule
+                capsules.append((start - offset, stop - offset, radius))
+            else:
+                array_of_points.append(
+                    get_canvas_points_raw(cell, image_height) - offset
+                )
+
+        return capsules, array_of_points
+
+    def output(
+        self, world: World, context: Optional[FrameContext] = None, **kwargs
+    ) -> np.ndarray:
         canvas = self.new_canvas()
 
-        array_of_points = [
-            get_canvas_points_raw(cell, canvas.shape[0]) for cell in world.cells
-        ]
+        capsules, array_of_points = self.prepare_cells(
+            get_visible_cells(world, canvas.shape, context=context), canvas.shape[0]
+        )
 
-        canvas = self.render_cells(canvas, array_of_points)
+        canvas = self.render_prepared_cells(canvas, capsules, array_of_points)
 
         self.debug_output('raw-cells', canvas)
 
         return canvas
 
+    def output_thickness(
+        self, world: World, context: Optional[FrameContext] = None, **kwargs
+    ) -> np.ndarray:
+        thickness = self.new_canvas()
+
+        capsules, array_of_points = self.prepare_cells(
+            get_visible_cells(world, thickness.shape, context=context),
+            thickness.shape[0],
+        )
+
+        thickness = render_thickness_on_canvas(thickness, array_of_points)
+        render_capsules_on_canvas(None, capsules, thickness=thickness)
+
+        self.debug_output('thickness', thickness)
+
+        return thickness
+
+    def render_prepared_cells(
+        self,
+        canvas: np.ndarray,
+        capsules: List[CapsuleType],
+        array_of_points: List[np.ndarray],
+    ) -> np.ndarray:
+        # the raw cell canvas, merged with the canvas' content via the maximum
+        canvas = self.render_cells(canvas, array_of_points)
+        return render_capsules_on_canvas(canvas, capsules)
+
+    def render_window(
+        self, index: CellIndex, shape: Tuple[int, int], window: BBoxType
+    ) -> np.ndarray:
+        # the raw cell canvas within the window of a canvas of shape
+        x_min, y_min, x_max, y_max = window
+
+        canvas = np.zeros((y_max - y_min, x_max - x_min), dtype=np.float32)
+
+        capsules, array_of_points = self.prepare_cells(
+            get_cells_in_window(index, shape, window),
+            shape[0],
+            offset=np.array([x_min, y_min]),
+        )
+
+        return self.render_prepared_cells(canvas, capsules, array_of_points)
+
+    def output_tile(
+        self, index: CellIndex, shape: Tuple[int, int], tile: BBoxType
+    ) -> np.ndarray:
+        return self.render_window(index, shape, tile)
+
+    def output_tiles(
+        self,
+        world: World,
+        tile_size: Optional[int] = None,
+        context: Optional[FrameContext] = None,
+    ) -> Iterator[Tuple[BBoxType, np.ndarray]]:
+        if tile_size is None:
+            tile_size = RenderTileSize.value
+
+        shape = get_canvas_shape()
+        index = FrameContext.ensure(world, context).get('cell_index')
+
+        for tile in iterate_tiles(shape, tile_size):
+            yield tile, self.output_tile(index, shape, tile)
+
+    def reseed(self, seed: np.random.SeedSequence) -> None:
+        # renderers drawing random numbers per frame replace their generators,
+        # so that frames rendered out of order (in a worker pool) are reproducible
+        pass
+
+    def output_later(
+        self, world: World, context: Optional[FrameContext] = None
+    ) -> Future:
+        context = FrameContext.ensure(world, context)
+
+        def _output() -> Future:
+            if context.scheduler is not None:
+                return context.scheduler.submit(self, world, context=context)
+
+            future = Future()
+            future.set_result(self.output(world, context=context))
+            return future
+
+        # all outputs rendering this channel for the same frame share one image
+        return context.memoize(('rendered', self.__class__.__name__), _output)
+
+    def output_in_context(
+        self, world: World, context: Optional[FrameContext] = None
+    ) -> np.ndarray:
+        return self.output_later(world, context).result()
+
     @staticmethod
     def convert(image: np.ndarray, max_value: int = 255) -> np.ndarray:
         return (np.clip(image, 0, 1) * max_value).astype(np.uint8)
@@ -340,18 +1243,26 @@ class PlainRenderer(Output):
         file_name: str,
         overwrite: bool = False,
         output_count: int = 0,
+        context: Optional[FrameContext] = None,
         **kwargs
     ) -> None:
-        self.imwrite(
-            file_name,
-            self.convert(self.output(world)),
-            overwrite=overwrite,
-            output_count=output_count,
-        )
+        context = FrameContext.ensure(world, context)
+
+        def _write(image: np.ndarray) -> None:
+            self.imwrite(
+                file_name,
+                self.convert(image),
+                overwrite=overwrite,
+                output_count=output_count,
+            )
+
+        context.then(self.output_later(world, context), _write)
 
-    def display(self, world: World, **kwargs) -> None:
+    def display(
+        self, world: World, context: Optional[FrameContext] = None, **kwargs
+    ) -> None:
 
-        image = self.output(world)
+        image = self.output_in_context(world, context)
 
         if OpenCVimshow.value:
             cv2.imshow(self.__class__.__name__, self.convert(image))
@@ -436,58 +1347,79 @@ class FluorescenceCellSizeFactor(Tunable):
     default: float = 500.0
 
 
+@lru_cache(maxsize=16)
+def fluorescence_emitter_kernel(
+    width: int, height: int, sigma_x: float, sigma_y: float
+) -> np.ndarray:
+    emitter = np.zeros((height, width), dtype=np.float32)
+    emitter[height // 2, width // 2] = 1.0
+
+    emitter = cv2.GaussianBlur(emitter, (width, height), sigmaX=sigma_x, sigmaY=sigma_y)
+
+    emitter.setflags(write=False)
+
+    return emitter
+
+
 class FluorescenceRenderer(PlainRenderer):
 
     channel: int = 0
 
     def __init__(self):
         super().__init__()
-        canvas = self.new_canvas()
 
         self.rng = RRF.spawn_generator()
+        self.noise_rng = RRF.spawn_generator()
 
-        self.random_noise = RRF.sequence.normal(
-            FluorescenceNoiseMean.value,
-            FluorescenceNoiseStd.value,
-            canvas.shape,
+        if RenderNoiseBank.value:
+            self.noise_bank = NoiseBank(self.noise_rng)
+        else:
+            self.noise_bank = None
+
+    def reseed(self, seed: np.random.SeedSequence) -> None:
+        self.rng, self.noise_rng = (
+            RRF.spawn_generator(seed=child) for child in seed.spawn(2)
         )
 
-    def output(self, world: World, **kwargs) -> np.ndarray:
-        canvas = self.new_canvas()
+        if self.noise_bank is not None:
+            self.noise_bank.rng = self.noise_rng
 
-        int_background = FluorescenceRatioBackground.value
+    def output_tile(
+        self, index: CellIndex, shape: Tuple[int, int], tile: BBoxType
+    ) -> np.ndarray:
+        # emitters are placed randomly per cell, cells spanning several tiles
+        # would get inconsistent emitters
+        raise RuntimeError("FluorescenceRenderer does not support tiled rendering.")
 
-        emitter_size = (
-            FluorescenceEmitterKernelSizeW.value,
-            FluorescenceEmitterKernelSizeH.value,
-        )
+    def output(
+        self, world: World, context: Optional[FrameContext] = None, **kwargs
+    ) -> np.ndarray:
+        emitters = self.buffer('emitters')
+        emitters.fill(0.0)
 
-        emitter = np.zeros(emitter_size)
-        emitter[emitter_size[0] // 2, emitter_size[1] // 2] = 1.0
+        int_background = FluorescenceRatioBackground.value
 
-        emitter = cv2.GaussianBlur(
-            emitter,
-            emitter_size,
-            sigmaX=FluorescenceEmitterGaussianW.value,
-            sigmaY=FluorescenceEmitterGaussianH.value,
+        emitter = fluorescence_emitter_kernel(
+            int(FluorescenceEmitterKernelSizeW.value),
+            int(FluorescenceEmitterKernelSizeH.value),
+            FluorescenceEmitterGaussianW.value,
+            FluorescenceEmitterGaussianH.value,
         )
 
         self.debug_output('fluorescence-emitter', emitter)
 
-        p_canvas = np.pad(canvas, emitter_size, mode='reflect')
-
-        for cell in world.cells:
+        for cell in get_visible_cells(world, emitters.shape, context=context):
             points = um_to_pixel(cell.points_on_canvas())
             #
-            points[:, 1] = canvas.shape[0] - points[:, 1]
+            points[:, 1] = emitters.shape[0] - points[:, 1]
 
             pts = points[np.newaxis].astype(np.int32)
 
             # Skip cells which (partly) lie outside of the image
             # TODO proper handling, so that parts of cells
             #  poking into the image are still properly handled
-            if (points[:, 0].min() < 0 or points[:, 0].max() > canvas.shape[1]) or (
-                points[:, 1].min() < 0 or points[:, 1].max() > canvas.shape[0]
+            if (points[:, 0].min() < 0 or points[:, 0].max() > emitters.shape[1]) or (
+                points[:, 1].min() < 0 or points[:, 1].max() > emitters.shape[0]
             ):
                 continue
 
@@ -505,33 +1437,56 @@ class FluorescenceRenderer(PlainRenderer):
                 cv2.contourArea(pts) / FluorescenceCellSizeFactor.value
             )
 
-            points_x_min, points_x_max = points[:, 0].min(), points[:, 0].max()
-            points_y_min, points_y_max = points[:, 1].min(), points[:, 1].max()
-
-            while int_countdown > 0:
-                # TODO needs tests
-                x = self.rng.uniform(points_x_min, points_x_max)
-                y = self.rng.uniform(points_y_min, points_y_max)
-
-                if cv2.pointPolygonTest(pts, (x, y), measureDist=False) > 0.0:
-                    target = p_canvas[
-                        int(y)
-                        + emitter_size[1] // 2 : int(y)
-                        + 3 * emitter_size[1] // 2,
-                        int(x)
-                        + emitter_size[0] // 2 : int(x)
-                        + 3 * emitter_size[0] // 2,
-                    ]
-                    target += emitter[: target.shape[0], : target.shape[1]]
-                    int_countdown -= 1
-
-        canvas = p_canvas[
-            emitter_size[0] : -emitter_size[0], emitter_size[1] : -emitter_size[1]
-        ]
+            if int_countdown <= 0:
+                continue
+
+            # draw all emitter positions of the cell at once,
+            # uniformly from the pixels within the rasterized cell
+            x_min, y_min = np.floor(points.min(axis=0)).astype(int)
+            x_max, y_max = np.ceil(points.max(axis=0)).astype(int) + 1
+
+            mask = np.zeros((y_max - y_min, x_max - x_min), dtype=np.uint8)
+            cv2.fillPoly(
+                mask,
+                np.round((points - [x_min, y_min]) * 256)[np.newaxis].astype(np.int32),
+                1,
+                shift=8,
+            )
+
+            (inside,) = np.nonzero(mask.ravel())
+
+            if len(inside) == 0:
+                continue
+
+            positions = inside[
+                self.rng.integers(0, len(inside), size=int(np.ceil(int_countdown)))
+            ]
+
+            counts = np.bincount(positions, minlength=mask.size).reshape(mask.shape)
+
+            window = emitters[y_min:y_max, x_min:x_max]
+            window += counts[: window.shape[0], : window.shape[1]]
+
+        # place the emitter kernel at every emitter position at once
+        canvas = cv2.filter2D(emitters, -1, emitter, borderType=cv2.BORDER_CONSTANT)
 
         self.debug_output('raw-fluorescence-cells', canvas)
 
-        noise = int_background * np.abs(next(self.random_noise))
+        if self.noise_bank is not None:
+            noise = self.noise_bank.normal(
+                self.buffer('noise'),
+                FluorescenceNoiseMean.value,
+                FluorescenceNoiseStd.value,
+            )
+        else:
+            noise = self.noise_rng.normal(
+                FluorescenceNoiseMean.value,
+                FluorescenceNoiseStd.value,
+                canvas.shape,
+            )
+
+        np.abs(noise, out=noise)
+        noise *= int_background
 
         self.debug_output('raw-fluorescence-noise', noise)
 
@@ -542,35 +1497,178 @@ class FluorescenceRenderer(PlainRenderer):
         return canvas
 
 
+class RenderIncremental(Tunable):
+    """Re-render only the region of phase contrast frames changed since the last one"""
+
+    default: bool = False
+
+
+class RenderIncrementalMaximumDirtyFraction(Tunable):
+    """Fraction of the canvas changed above which a frame is rendered completely"""
+
+    default: float = 0.5
+
+
 class PhaseContrastRenderer(PlainRenderer):
-    def output(self, world: World, **kwargs) -> np.ndarray:
-        cell_canvas = super().output(world)
+    def __init__(self):
+        super().__init__()
+        self.dirty_regions = None
+        self.cell_canvas = None
+        self.clean = None
 
-        background = LuminanceBackground.value * np.ones_like(cell_canvas)
+    @staticmethod
+    def phase_contrast_radius() -> int:
+        # how far (in pixels) a change of the cell canvas affects the result
+        return (
+            max(gaussian_radius(0.75), gaussian_radius(1.0))
+            + gaussian_radius(0.05)
+            + gaussian_radius(0.075)
+        )
 
-        self.debug_output('pc-background', background)
+    def render_prepared_cells(
+        self,
+        canvas: np.ndarray,
+        capsules: List[CapsuleType],
+        array_of_points: List[np.ndarray],
+    ) -> np.ndarray:
+        if not PhaseContrastThickness.value:
+            return super().render_prepared_cells(canvas, capsules, array_of_points)
 
-        cell_halo = 0.5 * gaussian(cell_canvas, sigma=0.75)
+        # the cells' thickness (in um, i.e. their optical path length) instead
+        canvas = render_thickness_on_canvas(canvas, array_of_points)
+        render_capsules_on_canvas(None, capsules, thickness=canvas)
 
-        background_w_halo = background + cell_halo
+        return canvas
 
-        self.debug_output('pc-halo-background', background_w_halo)
+    def output(
+        self, world: World, context: Optional[FrameContext] = None, **kwargs
+    ) -> np.ndarray:
+        if RenderIncremental.value and not RenderWithMatplotlib.value:
+            return self.output_incremental(world, context=context)
+
+        cell_canvas = super().output(world, context=context)
+
+        # the raw cell canvas is not needed anymore, it becomes the result
+        return self.phase_contrast(cell_canvas, out=cell_canvas)
+
+    def output_incremental(
+        self, world: World, context: Optional[FrameContext] = None
+    ) -> np.ndarray:
+        shape = self.new_canvas().shape
+
+        if self.dirty_regions is None or self.dirty_regions.shape != shape:
+            self.dirty_regions = DirtyRegions(shape)
+            self.clean = None
+
+        region = self.dirty_regions.update(
+            get_visible_cells(world, shape, context=context)
+        )
+
+        if self.clean is None or (
+            region is not None
+            and (region[2] - region[0]) * (region[3] - region[1])
+            > RenderIncrementalMaximumDirtyFraction.value * shape[0] * shape[1]
+        ):
+            self.cell_canvas = super().output(world, context=context)
+            self.clean = self.phase_contrast(
+                self.cell_canvas, out=np.empty_like(self.cell_canvas)
+            )
+        elif region is not None:
+            self.update_region(region)
+
+        # later steps modify the result in-place
+        return self.clean.copy()
+
+    def update_region(self, region: BBoxType) -> None:
+        shape = self.cell_canvas.shape
+        x_min, y_min, x_max, y_max = region
+
+        self.cell_canvas[y_min:y_max, x_min:x_max] = 0.0
+
+        # cells are drawn completely, i.e. beyond the region as well, merging
+        # with the maximum leaves the (still valid) canvas there unchanged
+        capsules, array_of_points = self.prepare_cells(
+            self.dirty_regions.cells_within(region), shape[0]
+        )
+
+        self.render_prepared_cells(self.cell_canvas, capsules, array_of_points)
+
+        # the region's surroundings within the radius change as well, which in turn
+        # need their surroundings within the radius (of the window) to be computed
+        radius = self.phase_contrast_radius()
+
+        window = grow_bbox(region, 2 * radius, shape)
+        inner = grow_bbox(region, radius, shape)
+        canvas = (0, 0, shape[1], shape[0])
+
+        result = self.phase_contrast(
+            np.ascontiguousarray(crop_to_bbox(self.cell_canvas, canvas, window))
+        )
+
+        crop_to_bbox(self.clean, canvas, inner)[...] = crop_to_bbox(
+            result, window, inner
+        )
+
+    def output_tile(
+        self, index: CellIndex, shape: Tuple[int, int], tile: BBoxType
+    ) -> np.ndarray:
+        # the tile's surroundings within the radius are rendered as well
+        window = grow_bbox(tile, self.phase_contrast_radius(), shape)
+
+        cell_canvas = self.render_window(index, shape, window)
+        result = self.phase_contrast(cell_canvas, out=cell_canvas)
 
-        cell_canvas = gaussian(cell_canvas, sigma=0.05)
+        return crop_to_bbox(result, window, tile)
 
-        self.debug_output('pc-blurred-cells', cell_canvas)
+    def phase_contrast(
+        self, cell_canvas: np.ndarray, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        shape = cell_canvas.shape
+
+        if PhaseContrastThickness.value:
+            cell_canvas = np.divide(
+                cell_canvas,
+                PhaseContrastThickness.value,
+                out=self.buffer('thickness', shape),
+            )
+
+        if self.write_debug_output:
+            self.debug_output(
+                'pc-background', np.full_like(cell_canvas, LuminanceBackground.value)
+            )
+
+        cell_halo = gaussian(cell_canvas, dst=self.buffer('halo', shape), sigma=0.75)
+        cell_halo *= 0.5
+
+        blurred_cells = gaussian(
+            cell_canvas, dst=self.buffer('cells', shape), sigma=0.05
+        )
 
-        halo_glow_in_cells = (
-            0.4
-            * gaussian(cell_canvas, 0.1)
-            * gaussian(cell_halo * (1 - cell_canvas), sigma=0.05)
+        self.debug_output('pc-blurred-cells', blurred_cells)
+
+        outside_cells = np.subtract(
+            1.0, blurred_cells, out=self.buffer('outside', shape)
+        )
+
+        halo_glow_in_cells = np.multiply(
+            cell_halo, outside_cells, out=self.buffer('glow', shape)
+        )
+        gaussian(halo_glow_in_cells, dst=halo_glow_in_cells, sigma=0.05)
+        halo_glow_in_cells *= gaussian(
+            blurred_cells, dst=self.buffer('glow-mask', shape), sigma=1.0
         )
+        halo_glow_in_cells *= 0.4
 
         self.debug_output('pc-blur-in-cells', halo_glow_in_cells)
 
-        result = (
-            background_w_halo * (1 - cell_canvas) + cell_canvas * LuminanceCell.value
-        ) + halo_glow_in_cells
+        background_w_halo = cell_halo
+        background_w_halo += LuminanceBackground.value
+
+        self.debug_output('pc-halo-background', background_w_halo)
+
+        result = np.multiply(blurred_cells, LuminanceCell.value, out=out)
+        result += np.multiply(background_w_halo, outside_cells, out=background_w_halo)
+        result += halo_glow_in_cells
 
         self.debug_output('pc-unblurred-result', result)
 
@@ -594,36 +1692,118 @@ class UnevenIlluminationMultiplicativeFactor(Tunable):
     default: float = 0.25
 
 
+class UnevenIlluminationLegacy(Tunable):
+    """Generate the uneven illumination with the former (slow) interpolation method"""
+
+    default: bool = False
+
+
+class UnevenIlluminationCacheDirectory(Tunable):
+    """Directory to cache generated uneven illuminations in (empty to disable)"""
+
+    default: str = ''
+
+
 class UnevenIlluminationPhaseContrast(PhaseContrastRenderer):
     def __init__(self):
         super().__init__()
 
-        self.random_complex_noise = RRF.sequence.uniform(0, 1)
+        self.seed_sequence = RRF.spawn_seed_sequence()
         self.uneven_illumination = None
-        self.create_uneven_illumination()
+        self.uneven_illumination_factor = None
+        self.uneven_illumination_offset = None
+        self.uneven_illumination_coarse = None
+
+        if RenderTiled.value and not UnevenIlluminationLegacy.value:
+            # tiles of the illumination are upscaled from the coarse field on demand
+            self.uneven_illumination_coarse = uneven_illumination_field_coarse(
+                get_canvas_shape(),
+                m=10,
+                rng=RRF.spawn_generator(seed=self.seed_sequence),
+            )
+        else:
+            self.create_uneven_illumination()
 
     def new_uneven_illumination(self) -> np.ndarray:
         empty = self.new_canvas()
-        return noise_attempt(
-            times=5, m=10, n=max(empty.shape), r=self.random_complex_noise
-        )[: empty.shape[0], : empty.shape[1]]
+        rng = RRF.spawn_generator(seed=self.seed_sequence)
+
+        if UnevenIlluminationLegacy.value:
+
+            def random_complex_noise():
+                while True:
+                    yield rng.uniform(0, 1)
+
+            return noise_attempt(
+                times=5, m=10, n=max(empty.shape), r=random_complex_noise()
+            )[: empty.shape[0], : empty.shape[1]]
+
+        return uneven_illumination_field(empty.shape, m=10, rng=rng)
 
     def create_uneven_illumination(self) -> np.ndarray:
-        self.uneven_illumination = self.new_uneven_illumination()
+        shape = self.new_canvas().shape
+
+        key = dict(
+            entropy=str(self.seed_sequence.entropy),
+            spawn_key=list(self.seed_sequence.spawn_key),
+            generator=RandomNumberGenerator.value,
+            shape=list(shape),
+            legacy=UnevenIlluminationLegacy.value,
+            m=10,
+        )
+
+        self.uneven_illumination = np.asarray(
+            load_or_generate_cached(
+                UnevenIlluminationCacheDirectory.value,
+                key,
+                self.new_uneven_illumination,
+            ),
+            dtype=np.float32,
+        )
 
-    def output(self, world: World, **kwargs) -> np.ndarray:
-        canvas = super().output(world)
+        # the illumination is constant across frames, precompute its terms
+        self.uneven_illumination_factor = (
+            1.0
+            + UnevenIlluminationMultiplicativeFactor.value * self.uneven_illumination
+        )
+        self.uneven_illumination_offset = (
+            UnevenIlluminationAdditiveFactor.value * self.uneven_illumination
+        )
+
+    def uneven_illumination_window(self, window: BBoxType) -> np.ndarray:
+        if self.uneven_illumination_coarse is not None:
+            return uneven_illumination_from_coarse(
+                *self.uneven_illumination_coarse, window
+            ).astype(np.float32)
+
+        x_min, y_min, x_max, y_max = window
+
+        return self.uneven_illumination[y_min:y_max, x_min:x_max]
+
+    def output_tile(
+        self, index: CellIndex, shape: Tuple[int, int], tile: BBoxType
+    ) -> np.ndarray:
+        canvas = super().output_tile(index, shape, tile)
+
+        illumination = self.uneven_illumination_window(tile)
+
+        canvas *= 1.0 + UnevenIlluminationMultiplicativeFactor.value * illumination
+        canvas += UnevenIlluminationAdditiveFactor.value * illumination
+
+        return canvas
+
+    def output(
+        self, world: World, context: Optional[FrameContext] = None, **kwargs
+    ) -> np.ndarray:
+        if self.uneven_illumination is None:
+            self.create_uneven_illumination()
+
+        canvas = super().output(world, context=context)
 
         self.debug_output('uneven-illumination', self.uneven_illumination)
 
-        canvas = (
-            canvas
-            * (
-                1.0
-                + UnevenIlluminationMultiplicativeFactor.value
-                * self.uneven_illumination
-            )
-        ) + UnevenIlluminationAdditiveFactor.value * self.uneven_illumination
+        canvas *= self.uneven_illumination_factor
+        canvas += self.uneven_illumination_offset
 
         self.debug_output('pc-with-uneven-illumination', canvas)
 
@@ -634,21 +1814,50 @@ class NoisyUnevenIlluminationPhaseContrast(UnevenIlluminationPhaseContrast):
     def __init__(self):
         super().__init__()
 
-        empty = self.new_canvas()
+        if RenderNoiseBank.value:
+            self.noise_bank = NoiseBank(RRF.spawn_generator())
+        else:
+            self.noise_bank = None
+            self.product_noise_rng = RRF.spawn_generator()
+            self.sum_noise_rng = RRF.spawn_generator()
+
+    def reseed(self, seed: np.random.SeedSequence) -> None:
+        product_seed, sum_seed = seed.spawn(2)
+
+        if self.noise_bank is not None:
+            self.noise_bank.rng = RRF.spawn_generator(seed=product_seed)
+        else:
+            self.product_noise_rng = RRF.spawn_generator(seed=product_seed)
+            self.sum_noise_rng = RRF.spawn_generator(seed=sum_seed)
 
-        self.product_noise = RRF.sequence.normal(1.0, 0.002, empty.shape)
-        self.sum_noise = RRF.sequence.normal(0.0, 0.002, empty.shape)
+    def output_tile(
+        self, index: CellIndex, shape: Tuple[int, int], tile: BBoxType
+    ) -> np.ndarray:
+        return self.add_noise(super().output_tile(index, shape, tile))
 
-    def output(self, world: World, **kwargs) -> np.ndarray:
-        canvas = super().output(world)
+    def output(
+        self, world: World, context: Optional[FrameContext] = None, **kwargs
+    ) -> np.ndarray:
+        return self.add_noise(super().output(world, context=context))
 
-        product_noise = next(self.product_noise)
-        sum_noise = next(self.sum_noise)
+    def add_noise(self, canvas: np.ndarray) -> np.ndarray:
+        if self.noise_bank is not None:
+            product_noise = self.noise_bank.normal(
+                self.buffer('product_noise', canvas.shape), 1.0, 0.002
+            )
+            sum_noise = self.noise_bank.normal(
+                self.buffer('sum_noise', canvas.shape), 0.0, 0.002
+            )
+        else:
+            product_noise = self.product_noise_rng.normal(1.0, 0.002, canvas.shape)
+            sum_noise = self.sum_noise_rng.normal(0.0, 0.002, canvas.shape)
 
         self.debug_output('product_noise', product_noise)
         self.debug_output('sum_noise', sum_noise)
 
-        canvas = canvas * product_noise + sum_noise
+        # in-place, keeping the canvas float32
+        canvas *= product_noise
+        canvas += sum_noise
 
         self.debug_output('pc-uneven-w-noise', canvas)
 
@@ -703,71 +1912,244 @@ class RenderChannels(Tunable):
         return [mapping[class_.strip()]() for class_ in cls.value.split(',')]
 
 
+class TiffOutputDisplayRange(Tunable):
+    """Fixed range 'low,high' mapped to the TIFF output's range (empty: per channel)"""
+
+    default: str = ''
+
+    @classmethod
+    def test(cls, value: str) -> bool:
+        try:
+            parse_display_range(value)
+        except ValueError:
+            return False
+        return True
+
+
+def parse_display_range(value: str) -> Optional[Tuple[float, float]]:
+    if not value.strip():
+        return None
+
+    low, high = (float(part) for part in value.split(','))
+
+    if not low < high:
+        raise ValueError("Display range must be increasing.")
+
+    return low, high
+
+
 class TiffOutput(Output):
+    # frames are appended to the TIFF file as they are rendered. with a fixed
+    # display range, they are converted right away. otherwise, they are
+    # appended as float to a partial file first, which is converted in a
+    # second pass, frame by frame, once the per channel range is known.
+    # ROIs are appended to a ROI set next to the TIFF file
     output_type: np.dtype = np.uint8
 
     def __init__(self):
         self.channels = RenderChannels.instantiate()
-        self.images = []
         self.current = -1
         self.file_name = None
-        self.rois = []
+        self.display_range = parse_display_range(TiffOutputDisplayRange.value)
+        self.writer = None
+        self.frames = 0
+        self.minimum = self.maximum = None
+
+    def output(
+        self, world: World, context: Optional[FrameContext] = None, **kwargs
+    ) -> List[np.ndarray]:
+        return [c.output_in_context(world, context) for c in self.channels]
+
+    @property
+    def tiff_file_name(self) -> str:
+        return ensure_path_and_extension(self.file_name, '.tif')
+
+    @property
+    def partial_file_name(self) -> str:
+        return self.tiff_file_name + '.partial'
+
+    @property
+    def roi_file_name(self) -> str:
+        return str(Path(self.tiff_file_name).with_suffix('')) + '-RoiSet.zip'
+
+    def write_kwargs(self) -> Dict[str, Any]:
+        return dict(
+            contiguous=True,
+            resolution=(um_to_pixel(1.0), um_to_pixel(1.0)),
+            metadata=dict(unit='um'),
+        )
 
-    def output(self, world: World, **kwargs) -> List[np.ndarray]:
-        return [c.output(world) for c in self.channels]
+    def scale(self, frame: np.ndarray, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+        if self.output_type not in (np.uint8, np.uint16):
+            return frame.astype(self.output_type)
 
-    def __del__(self):
-        if not self.images:
-            return
+        for c in range(frame.shape[1]):
+            frame[0, c, :, :] -= low[c]
+            frame[0, c, :, :] /= high[c] - low[c]
+
+        if self.display_range is not None:
+            np.clip(frame, 0.0, 1.0, out=frame)
+
+        frame *= 2 ** (8 * np.dtype(self.output_type).itemsize) - 1
+
+        return frame.astype(self.output_type)
+
+    def append_frame(self, images: List[np.ndarray]) -> None:
+        frame = np.concatenate([image[np.newaxis] for image in images], axis=0)
+        frame = frame[np.newaxis].astype(np.float32)
+
+        if self.writer is None:
+            if self.display_range is not None:
+                self.writer = TiffWriter(self.tiff_file_name, imagej=True)
+            else:
+                self.writer = TiffWriter(self.partial_file_name, bigtiff=True)
+                self.minimum = np.full(frame.shape[1], np.inf)
+                self.maximum = np.full(frame.shape[1], -np.inf)
+
+        if self.display_range is not None:
+            low, high = self.display_range
+            frame = self.scale(
+                frame, np.full(frame.shape[1], low), np.full(frame.shape[1], high)
+            )
+            self.writer.write(frame, **self.write_kwargs())
+        else:
+            np.minimum(self.minimum, frame.min(axis=(0, 2, 3)), out=self.minimum)
+            np.maximum(self.maximum, frame.max(axis=(0, 2, 3)), out=self.maximum)
+            # one series per frame, readable even if the process ends prematurely
+            self.writer.write(frame)
 
-        stack = []
-        for stacklet in self.images:
-            stacklet = np.concatenate([image[np.newaxis] for image in stacklet], axis=0)
-            stack.append(stacklet[np.newaxis, np.newaxis])
+        self.frames += 1
 
-        result = np.concatenate(stack)
+    def append_rois(self, rois: List[ImagejRoi]) -> None:
+        if not rois:
+            return
+
+        roiwrite(
+            self.roi_file_name,
+            rois,
+            name=['%05d-%05d' % (self.current, n) for n in range(len(rois))],
+            mode='a' if Path(self.roi_file_name).is_file() else 'w',
+        )
 
-        if self.output_type in (np.uint8, np.uint16):
+    def close(self) -> None:
+        if self.writer is None:
+            return
 
-            for c in range(result.shape[2]):
-                result[:, 0, c, :, :] -= result[:, 0, c, :, :].min()
-                result[:, 0, c, :, :] /= result[:, 0, c, :, :].max()
+        self.writer.close()
+        self.writer = None
 
-            result *= 2 ** (8 * np.dtype(self.output_type).itemsize) - 1
+        if self.display_range is not None:
+            return
 
-        result = result.astype(self.output_type)
+        # second pass, scale per channel to the range of all frames
+        if Path(self.roi_file_name).is_file():
+            overlays = [roi.tobytes() for roi in roiread(self.roi_file_name)]
+        else:
+            overlays = []
 
-        binary_rois = [ImagejRoi.frompoints(roi["points"], position=roi["position"], index=roi["index"], t=roi["t"]).tobytes() for roi in self.rois]
+        kwargs = self.write_kwargs()
+        kwargs['metadata'] = dict(kwargs['metadata'], Overlays=overlays)
 
-        with TiffWriter(
-            ensure_path_and_extension(self.file_name, '.tif'), imagej=True
+        with TiffFile(self.partial_file_name) as partial, TiffWriter(
+            self.tiff_file_name, imagej=True
         ) as writer:
-            writer.save(
-                result,
-                resolution=(um_to_pixel(1.0), um_to_pixel(1.0)),
-                metadata=dict(unit='um', Overlays=binary_rois),
-            )
+            for series in partial.series:
+                frame = series.asarray()
+                writer.write(self.scale(frame, self.minimum, self.maximum), **kwargs)
+                kwargs['metadata'] = None
 
-    def write(self, world: World, file_name: str, **kwargs) -> None:
-        self.file_name = file_name
+        os.remove(self.partial_file_name)
+
+    def __del__(self):
+        self.close()
+
+    def write(
+        self,
+        world: World,
+        file_name: str,
+        context: Optional[FrameContext] = None,
+        **kwargs
+    ) -> None:
+        if self.file_name is None:
+            self.file_name = file_name
+            # a former run's ROIs must not be appended to
+            if Path(self.roi_file_name).is_file():
+                os.remove(self.roi_file_name)
 
         self.current += 1
 
-        stacklet = self.output(world)
+        context = FrameContext.ensure(world, context)
+
+        # rendered images might still be pending
+        context.then_all(
+            [channel.output_later(world, context) for channel in self.channels],
+            self.append_frame,
+        )
 
-        self.images.append(stacklet)
+        all_points = context.get('canvas_points', new_canvas().shape[0])
 
-        for idx, cell in enumerate(world.cells):
-            points = get_canvas_points_for_cell(cell, image_height=stacklet[0].shape[0])
+        rois = []
 
+        for idx, points in enumerate(all_points):
             if len(self.channels) > 1:
-                self.rois.append(
-                    dict(points=points, t=self.current, position=-1, index=idx)
-                )
+                roi = dict(t=self.current, position=-1, index=idx)
             else:
-                self.rois.append(
-                    dict(points=points, t=-1, position=self.current, index=idx)
-                )
+                roi = dict(t=-1, position=self.current, index=idx)
+
+            rois.append(ImagejRoi.frompoints(points, **roi))
+
+        self.append_rois(rois)
+
+
+class TiledTiffOutput(Output):
+    def __init__(self):
+        # renderers constructed for tiled rendering hold no canvas sized arrays,
+        # otherwise memory would not be bounded
+        if not RenderTiled.value:
+            RenderTiled.set(True)
+
+        self.channels = RenderChannels.instantiate()
+
+    def output(self, world: World, **kwargs) -> Optional[Any]:
+        raise RuntimeError("TiledTiffOutput only supports writing.")
+
+    def write(
+        self,
+        world: World,
+        file_name: str,
+        overwrite: bool = False,
+        output_count: int = 0,
+        context: Optional[FrameContext] = None,
+        **kwargs
+    ) -> None:
+        file_name = check_overwrite(
+            ensure_path_and_extension_and_number(
+                file_name, '.tif', output_count, disable_individual=not output_count
+            ),
+            overwrite=overwrite,
+        )
+
+        context = FrameContext.ensure(world, context)
+
+        tile_size = RenderTileSize.value
+        shape = (len(self.channels),) + get_canvas_shape()
+
+        # tiles are rendered (with their halos) while the file is written,
+        # the canvas is never held in memory completely
+        def _tiles() -> Iterator[np.ndarray]:
+            for channel in self.channels:
+                for _, image in channel.output_tiles(world, tile_size, context=context):
+                    yield channel.convert(image)
+
+        with TiffWriter(file_name, bigtiff=np.prod(shape) >= 2 ** 31) as writer:
+            writer.write(
+                _tiles(),
+                shape=shape,
+                dtype=np.uint8,
+                tile=(tile_size, tile_size),
+                resolution=(um_to_pixel(1.0), um_to_pixel(1.0)),
+                metadata=dict(unit='um'),
+            )
 
 
 __all__ = [
@@ -780,4 +2162,5 @@ __all__ = [
     'UnevenIlluminationPhaseContrast',
     'NoisyUnevenIlluminationPhaseContrast',
     'TiffOutput',
+    'TiledTiffOutput',
 ]
@@ -1,14 +1,21 @@
 """Serialization outputs."""
 import csv
+import json
+from importlib import import_module
+from itertools import chain
+from pathlib import Path
+from threading import Condition
 from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 import jsonpickle
 import jsonpickle.ext.numpy
 import jsonpickle.util
 import numpy as np
+from tunable import Tunable
 
 from ..simulation.simulator import World
 from . import Output, check_overwrite, ensure_path_and_extension_and_number
+from .writer import submit_write
 
 jsonpickle.ext.numpy.register_handlers()
 additional_primitives = (
@@ -130,7 +137,8 @@ class QuickAndDirtyTableDumper(Output):
         output_count: int = 0,
         **kwargs
     ):
-        np.savez(
+        submit_write(
+            np.savez,
             check_overwrite(
                 ensure_path_and_extension_and_number(file_name, '.npz', output_count),
                 overwrite=overwrite,
@@ -140,6 +148,641 @@ class QuickAndDirtyTableDumper(Output):
         )
 
 
+class ColumnarSerializerCompress(Tunable):
+    """Whether the ColumnarSerializer compresses its files"""
+
+    default: bool = True
+
+
+ColumnSpecType = Dict[str, Any]
+
+_SCALAR_TYPES = (bool, int, float, np.bool_, np.integer, np.floating)
+_SEQUENCE_TYPES = {'list': list, 'tuple': tuple, 'ndarray': np.ndarray}
+
+
+def get_class_path(cls: type) -> str:
+    return cls.__module__ + ':' + cls.__qualname__
+
+
+def get_class_from_path(path: str) -> type:
+    module_name, qualified_name = path.split(':')
+
+    result = import_module(module_name)
+
+    for name in qualified_name.split('.'):
+        result = getattr(result, name)
+
+    return result
+
+
+def encode_column(values: List[Any]) -> Tuple[ColumnSpecType, Dict[str, np.ndarray]]:
+    # one attribute of a group of cells: scalars and equally shaped sequences as
+    # one array, other numeric sequences as concatenated values plus offsets,
+    # anything else falls back to jsonpickle
+    types = {type(value) for value in values}
+
+    if len(types) > 1 and all(issubclass(type_, _SCALAR_TYPES) for type_ in types):
+        # e.g. floats mixed with np.float64, numpy scalars become Python scalars
+        normalized = [
+            value.item() if isinstance(value, np.generic) else value
+            for value in values
+        ]
+        normalized_types = {type(value) for value in normalized}
+
+        if len(normalized_types) == 1:
+            values, types = normalized, normalized_types
+
+    type_ = types.pop() if len(types) == 1 else None
+
+    if type_ is not None and issubclass(type_, _SCALAR_TYPES):
+        return (
+            dict(kind='scalar', numpy=issubclass(type_, np.generic)),
+            {'': np.array(values)},
+        )
+
+    container = [
+        name
+        for name, sequence_type in _SEQUENCE_TYPES.items()
+        if type_ is sequence_type
+    ]
+
+    if container:
+        arrays = [np.asarray(value) for value in values]
+
+        if all(array.dtype.kind in 'biuf' for array in arrays):
+            spec = dict(container=container[0])
+
+            if len({array.shape for array in arrays}) == 1:
+                return dict(spec, kind='fixed'), {'': np.stack(arrays)}
+
+            if all(array.ndim == 1 for array in arrays):
+                dtype = np.result_type(*[array for array in arrays if len(array)])
+                return dict(spec, kind='ragged'), {
+                    '': np.concatenate(arrays).astype(dtype),
+                    '.offsets': np.cumsum([0] + [len(array) for array in arrays]),
+                }
+
+    return dict(kind='json'), {'': np.array([jsonpickle.dumps(v) for v in values])}
+
+
+def decode_column(spec: ColumnSpecType, arrays: Mapping[str, np.ndarray]) -> List[Any]:
+    kind, data = spec['kind'], arrays['']
+
+    if kind == 'scalar':
+        return list(data) if spec['numpy'] else data.tolist()
+    elif kind == 'json':
+        return [jsonpickle.loads(value) for value in data.tolist()]
+
+    if kind == 'fixed':
+        values = list(data)
+    else:
+        offsets = arrays['.offsets']
+        values = [data[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+
+    container = spec['container']
+
+    if container == 'ndarray':
+        return [value.copy() for value in values]
+    elif container == 'tuple':
+        return [tuple(value.tolist()) for value in values]
+    else:
+        return [value.tolist() for value in values]
+
+
+def world_to_columns(
+    world: World, time: Optional[float] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Converts a World to named arrays, cell attributes are stored column-wise,
+    per group of cells of the same class and with the same attributes.
+
+    :param world: World
+    :param time: Simulation time
+    :return: Dictionary of arrays
+    """
+    groups: Dict[Tuple[str, Tuple[str, ...]], List[Any]] = {}
+    group_numbers: Dict[Tuple[str, Tuple[str, ...]], int] = {}
+
+    cell_group, cell_index = [], []
+
+    for cell in world.cells:
+        key = (get_class_path(cell.__class__), tuple(cell.__dict__.keys()))
+        group = groups.setdefault(key, [])
+
+        cell_group.append(group_numbers.setdefault(key, len(group_numbers)))
+        cell_index.append(len(group))
+
+        group.append(cell)
+
+    schema, result = [], {}
+
+    for n, ((class_path, fields), cells) in enumerate(groups.items()):
+        specs = []
+
+        for field in fields:
+            spec, arrays = encode_column([cell.__dict__[field] for cell in cells])
+            specs.append((field, spec))
+
+            for suffix, array in arrays.items():
+                result['%d.%s%s' % (n, field, suffix)] = array
+
+        schema.append(dict(cls=class_path, count=len(cells), fields=specs))
+
+    boundaries = [
+        np.asarray(boundary, dtype=np.float64) for boundary in world.boundaries
+    ]
+
+    result.update(
+        schema=np.array(json.dumps(schema)),
+        time=np.array(np.nan if time is None else time),
+        cell_group=np.array(cell_group, dtype=np.int64),
+        cell_index=np.array(cell_index, dtype=np.int64),
+        boundaries=np.concatenate(boundaries) if boundaries else np.zeros((0, 2)),
+        boundary_offsets=np.cumsum([0] + [len(boundary) for boundary in boundaries]),
+    )
+
+    return result
+
+
+class WorldArchive:
+    """
+    Reads a World written by ColumnarSerializer.
+
+    Arrays are only read when accessed, cells (and the World) are only
+    reconstructed if requested, columns can be obtained without doing so.
+    """
+
+    def __init__(self, file_name: str):
+        self.data = np.load(file_name)
+        self.schema = json.loads(str(self.data['schema']))
+
+        self.cell_group = self.data['cell_group']
+        self.cell_index = self.data['cell_index']
+
+        time = float(self.data['time'])
+        self.time = None if np.isnan(time) else time
+
+    def __len__(self) -> int:
+        return len(self.cell_group)
+
+    def arrays(self, group: int, field: str) -> Dict[str, np.ndarray]:
+        prefix = '%d.%s' % (group, field)
+        return {
+            suffix: self.data[prefix + suffix]
+            for suffix in ('', '.offsets')
+            if prefix + suffix in self.data.files
+        }
+
+    def column(self, field: str) -> np.ndarray:
+        """
+        Returns a scalar or fixed shape attribute of all cells, in World order.
+
+        :param field: Attribute name
+        :return: Array
+        """
+        columns = {
+            n: self.arrays(n, field)['']
+            for n, group in enumerate(self.schema)
+            if dict(group['fields']).get(field, {}).get('kind') in ('scalar', 'fixed')
+        }
+
+        if len(columns) != len(self.schema):
+            raise KeyError(f"Not all cells have {field!r} as a scalar or fixed column.")
+
+        result = np.zeros(
+            (len(self),) + next(iter(columns.values())).shape[1:],
+            dtype=np.result_type(*columns.values()),
+        )
+
+        for n, column in columns.items():
+            selection = self.cell_group == n
+            result[selection] = column[self.cell_index[selection]]
+
+        return result
+
+    def cells(self) -> List[Any]:
+        """
+        Reconstructs the cells, in World order.
+
+        :return: List of cells
+        """
+        groups = []
+
+        for n, group in enumerate(self.schema):
+            cls = get_class_from_path(group['cls'])
+
+            columns = [
+                (field, decode_column(spec, self.arrays(n, field)))
+                for field, spec in group['fields']
+            ]
+
+            cells = []
+
+            for index in range(group['count']):
+                cell = cls.__new__(cls)
+                cell.__dict__.update(
+                    (field, values[index]) for field, values in columns
+                )
+                cells.append(cell)
+
+            groups.append(cells)
+
+        return [
+            groups[group][index]
+            for group, index in zip(self.cell_group.tolist(), self.cell_index.tolist())
+        ]
+
+    def world(self) -> World:
+        """
+        Reconstructs the World.
+
+        :return: World
+        """
+        world = World()
+        world.cells = self.cells()
+
+        offsets = self.data['boundary_offsets']
+        boundaries = self.data['boundaries']
+
+        world.boundaries = [
+            boundaries[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])
+        ]
+
+        return world
+
+    def close(self) -> None:
+        self.data.close()
+
+    def __enter__(self) -> "WorldArchive":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class ColumnarSerializer(Output):
+    """Output as column-wise binary files, read them via WorldArchive."""
+
+    def output(
+        self, world: World, time: Optional[float] = None, **kwargs
+    ) -> Dict[str, np.ndarray]:
+        return world_to_columns(world, time=time)
+
+    def write(
+        self,
+        world: World,
+        file_name: str,
+        time: Optional[float] = None,
+        overwrite: bool = False,
+        output_count: int = 0,
+        **kwargs
+    ) -> None:
+        submit_write(
+            np.savez_compressed if ColumnarSerializerCompress.value else np.savez,
+            check_overwrite(
+                ensure_path_and_extension_and_number(file_name, '.npz', output_count),
+                overwrite=overwrite,
+            ),
+            **self.output(world, time=time)
+        )
+
+
+CELL_TABLE_FRAMES = 'frames.bin'
+CELL_TABLE_TIMES = 'times.bin'
+CELL_TABLE_SCHEMA = 'columns.json'
+
+
+def get_cell_table_column_spec(values: List[Any]) -> Optional[ColumnSpecType]:
+    # scalars are stored as one value per row, all numeric sequences as values
+    # plus lengths, as their lengths (e.g. of the lineage history) might change
+    arrays = [np.asarray(value) for value in values]
+
+    if not all(array.dtype.kind in 'biuf' for array in arrays):
+        return None
+
+    if all(array.ndim == 0 for array in arrays):
+        kind = 'scalar'
+    elif all(array.ndim == 1 for array in arrays):
+        kind = 'sequence'
+        arrays = [array for array in arrays if len(array)] or [np.zeros(0)]
+    else:
+        return None
+
+    return dict(kind=kind, dtype=np.result_type(*arrays).str)
+
+
+def get_cell_table_column(
+    cells: List[Any], field: str, spec: ColumnSpecType
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    # the values of all cells, converted at once in their own dtype, cells without
+    # the attribute (of another class) get NaN, False or 0, or no values
+    dtype = np.dtype(spec['dtype'])
+
+    if spec['kind'] == 'scalar':
+        fill = np.nan if dtype.kind == 'f' else dtype.type(0).item()
+        return np.array([cell.__dict__.get(field, fill) for cell in cells]), None
+
+    sequences = [cell.__dict__.get(field, ()) for cell in cells]
+    lengths = np.fromiter(map(len, sequences), dtype=np.int64, count=len(sequences))
+
+    if not lengths.sum():
+        return np.zeros(0, dtype=dtype), lengths
+
+    return np.array(list(chain.from_iterable(sequences))), lengths
+
+
+def append_to_file(file_name: Path, array: np.ndarray) -> None:
+    with open(file_name, 'ab') as fp:
+        fp.write(np.ascontiguousarray(array).tobytes())
+
+
+def convert_file(file_name: Path, dtype: np.dtype, new_dtype: np.dtype) -> None:
+    if file_name.exists():
+        file_name.write_bytes(np.fromfile(file_name, dtype=dtype).astype(new_dtype))
+
+
+class CellTableOutput(Output):
+    """Output of the cells of all frames, appended to one columnar store."""
+
+    def __init__(self):
+        super().__init__()
+
+        self.path: Optional[Path] = None
+        self.columns: Optional[Dict[str, ColumnSpecType]] = None
+        self.rows = 0
+
+        # frames are written in order, even by several writer threads
+        self.written = Condition()
+        self.submitted_frames = 0
+        self.written_frames = 0
+
+    def initialize(self, file_name: str, overwrite: bool = False) -> None:
+        path = Path(file_name)
+
+        if path.exists():
+            if not overwrite:
+                raise RuntimeError(f"Path {path} already exists. Not overwriting.")
+
+            # the store is appended to, remove a previous run's files
+            schema = path / CELL_TABLE_SCHEMA
+            columns = json.loads(schema.read_text()) if schema.exists() else {}
+
+            names = [CELL_TABLE_FRAMES, CELL_TABLE_TIMES, CELL_TABLE_SCHEMA]
+
+            for field in columns:
+                names += [field + '.bin', field + '.lengths.bin']
+
+            for name in names:
+                (path / name).unlink(missing_ok=True)
+
+        path.mkdir(parents=True, exist_ok=True)
+
+        self.path = path
+        self.columns = None
+        self.rows = 0
+
+    def initialize_columns(self, cells: List[Any]) -> None:
+        fields = {field: None for cell in cells for field in cell.__dict__.keys()}
+
+        self.columns = {}
+
+        for field in fields:
+            spec = get_cell_table_column_spec(
+                [cell.__dict__[field] for cell in cells if field in cell.__dict__]
+            )
+
+            if spec is not None:
+                self.columns[field] = spec
+
+    def output(self, world: World, **kwargs) -> Dict[str, np.ndarray]:
+        cells = world.cells
+
+        if self.columns is None:
+            return {}
+
+        result = {}
+
+        for field, spec in self.columns.items():
+            values, lengths = get_cell_table_column(cells, field, spec)
+            result[field] = values
+
+            if lengths is not None:
+                result[field + '.lengths'] = lengths
+
+        return result
+
+    def promote_columns(
+        self, arrays: Dict[str, np.ndarray]
+    ) -> Dict[str, Tuple[np.dtype, np.dtype]]:
+        # columns are widened if values do not fit their dtype (e.g. an integer
+        # attribute becoming a float), instead of silently truncating them
+        promoted = {}
+
+        for field, spec in self.columns.items():
+            dtype, values = np.dtype(spec['dtype']), arrays[field]
+
+            converted = values.astype(dtype)
+
+            if not np.array_equal(converted, values, equal_nan=dtype.kind in 'fc'):
+                new_dtype = np.result_type(dtype, values)
+                promoted[field + '.bin'] = (dtype, new_dtype)
+                spec['dtype'] = new_dtype.str
+
+                converted = values.astype(new_dtype)
+
+            arrays[field] = converted
+
+        return promoted
+
+    def write(
+        self,
+        world: World,
+        file_name: str,
+        time: Optional[float] = None,
+        overwrite: bool = False,
+        output_count: int = 0,
+        **kwargs
+    ) -> None:
+        if self.path is None:
+            self.initialize(file_name, overwrite=overwrite)
+
+        initialized = self.columns is None and bool(world.cells)
+
+        if initialized:
+            self.initialize_columns(world.cells)
+
+        arrays = self.output(world)
+        promoted = self.promote_columns(arrays) if arrays else {}
+
+        schema = None
+
+        if initialized or promoted:
+            schema = {field: dict(spec) for field, spec in self.columns.items()}
+
+        start, self.rows = self.rows, self.rows + len(world.cells)
+
+        frame = (
+            np.array([np.nan if time is None else time], dtype=np.float64),
+            np.array([[output_count, start, self.rows]], dtype=np.int64),
+        )
+
+        submit_write(
+            self.write_frame, self.submitted_frames, arrays, promoted, schema, *frame
+        )
+        self.submitted_frames += 1
+
+    def write_frame(
+        self,
+        number: int,
+        arrays: Dict[str, np.ndarray],
+        promoted: Dict[str, Tuple[np.dtype, np.dtype]],
+        schema: Optional[Dict[str, ColumnSpecType]],
+        time: np.ndarray,
+        frame: np.ndarray,
+    ) -> None:
+        """
+        Appends a frame to the files, after all previous frames.
+
+        :param number: Number of the frame (in order of writes)
+        :param arrays: Column arrays
+        :param promoted: Column files to convert from a dtype to another first
+        :param schema: Columns to write to the schema, if changed
+        :param time: Simulation time
+        :param frame: Row of the frame index
+        :return: None
+        """
+        with self.written:
+            self.written.wait_for(lambda: self.written_frames == number)
+
+        try:
+            for name, (dtype, new_dtype) in promoted.items():
+                convert_file(self.path / name, dtype, new_dtype)
+
+            if schema is not None:
+                (self.path / CELL_TABLE_SCHEMA).write_text(json.dumps(schema))
+
+            for name, array in arrays.items():
+                append_to_file(self.path / (name + '.bin'), array)
+
+            # the index is appended last, readers only see completely written frames
+            append_to_file(self.path / CELL_TABLE_TIMES, time)
+            append_to_file(self.path / CELL_TABLE_FRAMES, frame)
+        finally:
+            with self.written:
+                self.written_frames += 1
+                self.written.notify_all()
+
+
+class CellTable:
+    """Reader of stores written by CellTableOutput, columns are memory-mapped."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+        frames = self.read(CELL_TABLE_FRAMES, np.int64).reshape(-1, 3)
+        #: Frame (output) numbers
+        self.frames = frames[:, 0]
+        #: Row ranges of the frames
+        self.starts, self.stops = frames[:, 1], frames[:, 2]
+        #: Simulation times of the frames
+        self.times = self.read(CELL_TABLE_TIMES, np.float64)[: len(frames)]
+
+        self.rows = int(self.stops[-1]) if len(frames) else 0
+
+        schema = self.path / CELL_TABLE_SCHEMA
+        self.columns: Dict[str, ColumnSpecType] = (
+            json.loads(schema.read_text()) if schema.exists() else {}
+        )
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def read(self, name: str, dtype: np.dtype) -> np.ndarray:
+        file_name = self.path / name
+
+        if not file_name.exists() or file_name.stat().st_size == 0:
+            return np.zeros(0, dtype=dtype)
+
+        return np.memmap(file_name, dtype=dtype, mode='r')
+
+    def ragged(self, field: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the values and row offsets of a sequence column.
+
+        :param field: Attribute name
+        :return: Tuple of values and offsets (rows + 1)
+        """
+        lengths = self.read(field + '.lengths.bin', np.int64)[: self.rows]
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        values = self.read(field + '.bin', np.dtype(self.columns[field]['dtype']))
+
+        return values[: offsets[-1]], offsets
+
+    def column(self, field: str) -> np.ndarray:
+        """
+        Returns a column of all rows. Sequence columns are returned as
+        two-dimensional arrays, which requires them to be of equal length.
+
+        :param field: Attribute name
+        :return: Array
+        """
+        spec = self.columns[field]
+
+        if spec['kind'] == 'scalar':
+            return self.read(field + '.bin', np.dtype(spec['dtype']))[: self.rows]
+
+        values, offsets = self.ragged(field)
+        lengths = np.diff(offsets)
+
+        if len(np.unique(lengths)) > 1:
+            raise ValueError(
+                f"Column {field!r} has sequences of different lengths, use ragged."
+            )
+
+        return values.reshape(len(lengths), lengths[0] if len(lengths) else 0)
+
+    def row_frames(self) -> np.ndarray:
+        """
+        Returns the frame number of each row.
+
+        :return: Array
+        """
+        return np.repeat(self.frames, self.stops - self.starts)
+
+    def row_times(self) -> np.ndarray:
+        """
+        Returns the simulation time of each row.
+
+        :return: Array
+        """
+        return np.repeat(self.times, self.stops - self.starts)
+
+    def frame(self, n: int) -> Dict[str, Any]:
+        """
+        Returns the columns of the n-th frame, sequences as lists of arrays.
+
+        :param n: Index of the frame
+        :return: Dictionary of columns
+        """
+        start, stop = self.starts[n], self.stops[n]
+
+        result = {}
+
+        for field, spec in self.columns.items():
+            if spec['kind'] == 'scalar':
+                result[field] = self.column(field)[start:stop]
+            else:
+                values, offsets = self.ragged(field)
+                result[field] = [
+                    values[offsets[row] : offsets[row + 1]]
+                    for row in range(start, stop)
+                ]
+
+        return result
+
+
 class CsvOutput(Output):
     """CSV Tabular Output."""
 
@@ -180,6 +823,10 @@ class CsvOutput(Output):
 
 __all__ = [
     'JsonPickleSerializer',
+    'ColumnarSerializer',
+    'WorldArchive',
+    'CellTableOutput',
+    'CellTable',
     'QuickAndDirtyTableDumper',
     'CsvOutput',
 ]
@@ -0,0 +1,208 @@
+"""Output as time-lapse videos."""
+import threading
+from queue import Queue
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+from tunable import Tunable
+
+from ..simulation.simulator import World
+from . import FrameContext, Output, check_overwrite, ensure_path_and_extension
+from .render import PlainRenderer, RenderChannels
+
+
+class VideoOutputCodec(Tunable):
+    """FourCC code of the codec used for video output"""
+
+    default: str = 'mp4v'
+
+    @classmethod
+    def test(cls, value: str) -> bool:
+        return len(value) == 4
+
+
+class VideoOutputExtension(Tunable):
+    """File extension (container) used for video output"""
+
+    default: str = '.mp4'
+
+
+class VideoOutputFrameRate(Tunable):
+    """Frame rate of the video output, in frames per second"""
+
+    default: float = 10.0
+
+    @classmethod
+    def test(cls, value: float) -> bool:
+        return value > 0.0
+
+
+class VideoOutputFrameStep(Tunable):
+    """Only every n-th frame is added to the video output"""
+
+    default: int = 1
+
+    @classmethod
+    def test(cls, value: int) -> bool:
+        return value >= 1
+
+
+class VideoOutputScale(Tunable):
+    """Scale factor applied to frames of the video output (e.g. 0.5 to downscale)"""
+
+    default: float = 1.0
+
+    @classmethod
+    def test(cls, value: float) -> bool:
+        return value > 0.0
+
+
+class VideoOutputMaximumPending(Tunable):
+    """Maximum number of frames waiting to be encoded"""
+
+    default: int = 16
+
+
+_STOP = None
+
+
+class VideoOutput(Output):
+    # frames are encoded in a background thread, so encoding overlaps simulation.
+    # multiple render channels are placed side by side
+
+    def __init__(self):
+        super().__init__()
+
+        self.channels = RenderChannels.instantiate()
+        self.written = 0
+        self.frame_size: Optional[Tuple[int, int]] = None
+
+        self.queue: Optional[Queue] = None
+        self.thread: Optional[threading.Thread] = None
+        self.error: Optional[BaseException] = None
+
+    def compose(self, images: List[np.ndarray]) -> np.ndarray:
+        frame = np.concatenate(
+            [PlainRenderer.convert(image) for image in images], axis=1
+        )
+
+        if self.frame_size is None:
+            scale = VideoOutputScale.value
+            self.frame_size = (
+                max(1, int(round(frame.shape[1] * scale))),
+                max(1, int(round(frame.shape[0] * scale))),
+            )
+
+        # the encoder requires all frames to be of the same size
+        if (frame.shape[1], frame.shape[0]) != self.frame_size:
+            frame = cv2.resize(frame, self.frame_size, interpolation=cv2.INTER_AREA)
+
+        return frame
+
+    def output(
+        self, world: World, context: Optional[FrameContext] = None, **kwargs
+    ) -> np.ndarray:
+        return self.compose(
+            [channel.output_in_context(world, context) for channel in self.channels]
+        )
+
+    def encode(self, file_name: str) -> None:
+        writer = None
+
+        try:
+            while True:
+                frame = self.queue.get()
+
+                if frame is _STOP:
+                    break
+
+                if writer is None:
+                    writer = cv2.VideoWriter(
+                        file_name,
+                        cv2.VideoWriter_fourcc(*VideoOutputCodec.value),
+                        VideoOutputFrameRate.value,
+                        (frame.shape[1], frame.shape[0]),
+                        True,
+                    )
+
+                    if not writer.isOpened():
+                        raise RuntimeError(
+                            f"Could not open {file_name!r} for video output."
+                        )
+
+                writer.write(cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR))
+        except BaseException as e:
+            self.error = e
+            # keep consuming, so that producers never block on a full queue
+            while self.queue.get() is not _STOP:
+                pass
+        finally:
+            if writer is not None:
+                writer.release()
+
+    def check_error(self) -> None:
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def start(self, file_name: str) -> None:
+        self.queue = Queue(maxsize=max(1, VideoOutputMaximumPending.value))
+        self.thread = threading.Thread(
+            target=self.encode, args=(file_name,), daemon=True
+        )
+        self.thread.start()
+
+    def close(self) -> None:
+        """
+        Waits for all pending frames to be encoded and finishes the video file.
+
+        :return: None
+        """
+        if self.thread is None:
+            return
+
+        self.queue.put(_STOP)
+        self.thread.join()
+        self.thread = None
+
+        self.check_error()
+
+    def __del__(self):
+        self.close()
+
+    def write(
+        self,
+        world: World,
+        file_name: str,
+        overwrite: bool = False,
+        context: Optional[FrameContext] = None,
+        **kwargs
+    ) -> None:
+        self.check_error()
+
+        step, self.written = self.written, self.written + 1
+
+        if step % VideoOutputFrameStep.value != 0:
+            return
+
+        if self.thread is None:
+            self.start(
+                check_overwrite(
+                    ensure_path_and_extension(file_name, VideoOutputExtension.value),
+                    overwrite=overwrite,
+                )
+            )
+
+        context = FrameContext.ensure(world, context)
+
+        def _enqueue(images: List[np.ndarray]) -> None:
+            self.queue.put(self.compose(images))
+
+        context.then_all(
+            [channel.output_later(world, context) for channel in self.channels],
+            _enqueue,
+        )
+
+
+__all__ = ['VideoOutput']
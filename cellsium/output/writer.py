@@ -0,0 +1,139 @@
+"""Write-behind of output files in a pool of threads."""
+import atexit
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Optional
+
+import cv2
+import numpy as np
+from tunable import Tunable
+
+
+class OutputWriteThreads(Tunable):
+    """Number of threads writing output files in the background (0 to disable)"""
+
+    default: int = 0
+
+
+class OutputWriteMaximumPending(Tunable):
+    """Maximum number of output files waiting to be written before outputs block"""
+
+    default: int = 32
+
+
+class OutputPNGCompression(Tunable):
+    """PNG compression level (0-9) of written images, -1 for the OpenCV default"""
+
+    default: int = -1
+
+    @classmethod
+    def test(cls, value: int) -> bool:
+        return -1 <= value <= 9
+
+
+class WriteBehindQueue:
+    """
+    Calls file writing functions in a pool of threads.
+
+    The number of pending writes is bounded, submitting blocks until older
+    writes are done. Errors of writes are raised on a later submit or flush.
+    """
+
+    def __init__(self, threads: int, maximum_pending: int):
+        self.maximum_pending = max(1, maximum_pending)
+        self.pending: Deque[Future] = deque()
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def collect(self, block: bool = False) -> None:
+        """
+        Removes done writes, raising their errors.
+
+        :param block: Whether to wait for all pending writes
+        :return: None
+        """
+        while self.pending and (block or self.pending[0].done()):
+            self.pending.popleft().result()
+
+    def submit(self, function: Callable[..., Any], *args, **kwargs) -> None:
+        """
+        Submits a call of function, blocks if too many writes are pending.
+
+        :param function: Function writing a file
+        :param args: Arguments
+        :param kwargs: Keyword arguments
+        :return: None
+        """
+        while len(self.pending) >= self.maximum_pending:
+            self.pending.popleft().result()
+
+        self.pending.append(self.executor.submit(function, *args, **kwargs))
+
+        self.collect()
+
+    def close(self) -> None:
+        """
+        Waits for all pending writes and shuts down the thread pool.
+
+        :return: None
+        """
+        try:
+            self.collect(block=True)
+        finally:
+            self.executor.shutdown()
+
+
+_write_queue: Optional[WriteBehindQueue] = None
+
+
+def submit_write(function: Callable[..., Any], *args, **kwargs) -> None:
+    """
+    Calls function, writing a file, in the background if OutputWriteThreads is set,
+    otherwise right away. The arguments must not be modified afterwards.
+
+    :param function: Function writing a file
+    :param args: Arguments
+    :param kwargs: Keyword arguments
+    :return: None
+    """
+    global _write_queue
+
+    if OutputWriteThreads.value <= 0:
+        function(*args, **kwargs)
+        return
+
+    if _write_queue is None:
+        _write_queue = WriteBehindQueue(
+            OutputWriteThreads.value, OutputWriteMaximumPending.value
+        )
+
+    _write_queue.submit(function, *args, **kwargs)
+
+
+def flush_writes() -> None:
+    """
+    Waits for all writes submitted via submit_write.
+
+    :return: None
+    """
+    global _write_queue
+
+    if _write_queue is not None:
+        queue, _write_queue = _write_queue, None
+        queue.close()
+
+
+atexit.register(flush_writes)
+
+
+def write_image(name: str, image: np.ndarray) -> None:
+    # the image is encoded by the calling (writing) thread, OpenCV releases the GIL
+    params = []
+
+    if name.lower().endswith('.png') and OutputPNGCompression.value >= 0:
+        params = [cv2.IMWRITE_PNG_COMPRESSION, OutputPNGCompression.value]
+
+    if not cv2.imwrite(name, image, params):
+        raise RuntimeError(f"Could not write image {name!r}.")
+
+
+__all__ = ['submit_write', 'flush_writes']
@@ -1,5 +1,5 @@
 """Random number generation infrastructure."""
-from typing import Dict, Iterable, Iterator, Type, Union
+from typing import Dict, Iterable, Iterator, Optional, Type, Union
 
 import numpy as np
 from tunable import Tunable
@@ -86,14 +86,27 @@ class RRF:
         return seed
 
     @classmethod
-    def spawn_generator(cls) -> np.random.Generator:
+    def spawn_seed_sequence(cls) -> np.random.SeedSequence:
+        """
+        Spawns a new np.random.SeedSequence from the seed.
+
+        :return: The SeedSequence instance
+        """
+        return cls.seed_sequence.spawn(1)[0]
+
+    @classmethod
+    def spawn_generator(
+        cls, seed: Optional[np.random.SeedSequence] = None
+    ) -> np.random.Generator:
         """
         Generates a new np.random.Generator from
         the seed and the configured bitgenerator.
 
+        :param seed: Optional SeedSequence to use instead of spawning a new one
         :return: The Generator instance
         """
-        seed = cls.seed_sequence.spawn(1)[0]
+        if seed is None:
+            seed = cls.spawn_seed_sequence()
 
         rng = RandomNumberGenerator.get()
 
@@ -1,4 +1,6 @@
 """Simulator base classes."""
+from copy import copy
+from typing import List, Optional
 
 import numpy as np
 
@@ -6,6 +8,140 @@ from ..parameters import s_to_h
 from . import BaseSimulator
 
 
+class CellIndex:
+    """
+    Uniform grid spatial index over the bounding circles of cells.
+    Cells without a position or bounding radius are part of every query result.
+    """
+
+    def __init__(self, cells: List[object], bucket_size: float = 0.0):
+        cells = list(cells)
+
+        bounded, centers, radii = [], [], []
+
+        for n, cell in enumerate(cells):
+            try:
+                center, radius = cell.position, cell.bounding_radius()
+            except AttributeError:
+                continue
+
+            bounded.append(n)
+            centers.append(center[:2])
+            radii.append(radius)
+
+        self.build(cells, bounded, centers, radii, bucket_size)
+
+    def build(
+        self,
+        cells: List[object],
+        bounded: List[int],
+        centers: List[np.ndarray],
+        radii: List[float],
+        bucket_size: float,
+    ) -> None:
+        self.cells = cells
+        self.bucket_size_requested = bucket_size
+
+        self.bounded = np.array(bounded, dtype=np.int64)
+        self.unbounded = np.setdiff1d(np.arange(len(self.cells)), self.bounded)
+
+        self.centers = np.array(centers, dtype=np.float64).reshape(-1, 2)
+        self.radii = np.array(radii, dtype=np.float64)
+        self.maximum_radius = self.radii.max(initial=0.0)
+
+        # with buckets larger than any cell, the cells intersecting a rectangle
+        # are found via their center's bucket within the rectangle grown by the
+        # maximum radius
+        self.bucket_size = max(bucket_size, 2.0 * self.maximum_radius, 1e-6)
+        self.origin = self.centers.min(axis=0, initial=0.0)
+
+        buckets = self.bucket_of(self.centers)
+        self.columns = int(buckets[:, 0].max(initial=0)) + 1
+        self.rows = int(buckets[:, 1].max(initial=0)) + 1
+
+        keys = buckets[:, 0] * self.rows + buckets[:, 1]
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    def subset(self, cells: List[object]) -> "CellIndex":
+        """
+        Creates an index of some of the indexed cells,
+        without computing their bounding circles again.
+
+        :param cells: Cells, all of them must be part of this index
+        :return: CellIndex
+        """
+        rows = np.full(len(self.cells), -1, dtype=np.int64)
+        rows[self.bounded] = np.arange(len(self.bounded))
+
+        positions = {id(cell): n for n, cell in enumerate(self.cells)}
+        selected_rows = [rows[positions[id(cell)]] for cell in cells]
+
+        bounded = [n for n, row in enumerate(selected_rows) if row >= 0]
+        selected_rows = [row for row in selected_rows if row >= 0]
+
+        result = self.__class__.__new__(self.__class__)
+        result.build(
+            list(cells),
+            bounded,
+            self.centers[selected_rows],
+            self.radii[selected_rows],
+            self.bucket_size_requested,
+        )
+
+        return result
+
+    def bucket_of(self, coordinates: np.ndarray) -> np.ndarray:
+        return np.floor((coordinates - self.origin) / self.bucket_size).astype(np.int64)
+
+    def query(
+        self, x_min: float, y_min: float, x_max: float, y_max: float
+    ) -> List[object]:
+        """
+        Returns the cells whose bounding circle intersects the rectangle,
+        in their original order.
+
+        :param x_min: Minimum x coordinate
+        :param y_min: Minimum y coordinate
+        :param x_max: Maximum x coordinate
+        :param y_max: Maximum y coordinate
+        :return: List of cells
+        """
+        grow = self.maximum_radius
+
+        (column_from, row_from), (column_to, row_to) = self.bucket_of(
+            np.array([[x_min - grow, y_min - grow], [x_max + grow, y_max + grow]])
+        )
+
+        row_from, row_to = max(row_from, 0), min(row_to, self.rows - 1)
+        columns = np.arange(max(column_from, 0), min(column_to, self.columns - 1) + 1)
+
+        # within a column, the buckets of consecutive rows are stored consecutively
+        starts = np.searchsorted(self.sorted_keys, columns * self.rows + row_from)
+        stops = np.searchsorted(
+            self.sorted_keys, columns * self.rows + row_to, side='right'
+        )
+
+        candidates = np.concatenate(
+            [self.order[start:stop] for start, stop in zip(starts, stops)]
+            + [np.zeros(0, dtype=np.int64)]
+        )
+
+        # distance of the circles' centers to the rectangle
+        centers = self.centers[candidates]
+        delta_x = np.maximum(x_min - centers[:, 0], centers[:, 0] - x_max)
+        delta_y = np.maximum(y_min - centers[:, 1], centers[:, 1] - y_max)
+
+        hits = candidates[
+            np.maximum(delta_x, 0.0) ** 2 + np.maximum(delta_y, 0.0) ** 2
+            <= self.radii[candidates] ** 2
+        ]
+
+        indices = np.sort(np.concatenate([self.bounded[hits], self.unbounded]))
+
+        return [self.cells[n] for n in indices]
+
+
 class World:
     """The World class contains the cells and, if present, the boundaries."""
 
@@ -69,6 +205,52 @@ class World:
         self.cells_to_remove.clear()
         self.cells_to_add.clear()
 
+    def index(self) -> CellIndex:
+        """
+        Creates a spatial index of the cells at their current positions.
+        As cells are moved in-place (e.g. by the physics simulation),
+        the index is not kept up to date, but should be created once per frame.
+
+        :return: CellIndex
+        """
+        return CellIndex(self.cells)
+
+    def view(
+        self,
+        x: float,
+        y: float,
+        width: float,
+        height: float,
+        index: Optional[CellIndex] = None,
+    ) -> "World":
+        """
+        Creates a World of the cells (possibly) within a field of view,
+        shifted so that the field of view starts at the origin.
+        The cells are shallow copies, they should not be modified.
+
+        :param x: X offset of the field of view
+        :param y: Y offset of the field of view
+        :param width: Width of the field of view
+        :param height: Height of the field of view
+        :param index: CellIndex of the World's cells, created if not passed
+        :return: World
+        """
+        if index is None:
+            index = self.index()
+
+        new_world = self.__class__()
+
+        for cell in index.query(x, y, x + width, y + height):
+            cell = copy(cell)
+            cell.position = [cell.position[0] - x, cell.position[1] - y]
+            new_world.cells.append(cell)
+
+        new_world.boundaries = [
+            boundary - np.array([x, y]) for boundary in self.boundaries
+        ]
+
+        return new_world
+
     def copy(self) -> "World":
         """
         Creates a copy of thw World.
@@ -1,3 +1,6 @@
+import numpy as np
+import pytest
+
 from ..cli import Cell, initialize_cells
 from ..cli.cli import load_class_from_module
 from ..model import (
@@ -76,6 +79,27 @@ def test_cell_zoo(simulator, tunables, add_cell_zoo):
         simulator.step(60.0)
 
 
+def test_cell_bounding_radius(simulator, add_cell_zoo):
+    add_cell_zoo(simulator)
+
+    for cell in simulator.simulation.world.cells:
+        distances = np.hypot(*(cell.points_on_canvas() - cell.position).T)
+        assert distances.max() <= cell.bounding_radius() + 1e-9
+
+
+@pytest.mark.parametrize(
+    'bends', [(0.0, 0.0, 0.0), (0.3, 0.0, 0.0), (-0.2, 0.5, -0.4), (0.0, -1.0, 1.0)]
+)
+def test_cell_bentrod_bounding_radius(simulator, bends):
+    cell = simulator.simulation.world.cells[0]
+    assert isinstance(cell, BentRod)
+
+    cell.bend_overall, cell.bend_upper, cell.bend_lower = bends
+
+    distances = np.hypot(*(cell.points_on_canvas() - cell.position).T)
+    assert distances.max() <= cell.bounding_radius() + 1e-9
+
+
 def test_cell_bentrod_call_unused_meshfunction(simulator):
     cell = simulator.simulation.world.cells[0]
     BentRod.raw_points3d(cell)
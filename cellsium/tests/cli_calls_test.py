@@ -1,25 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
 import pytest
+import tifffile
 
 from ..cli.cli import main
 from ..output import Output
+from ..output.all import COCOOutput, PackedDatasetOutput, TiffOutput, VideoOutput
+from ..output.dataset import PackedDataset
 from ..simulation.placement.base import PlacementSimulationSimplification
 
 ALL_OUTPUTS = [
+    'CellTableOutput',
     'COCOOutput',
+    'ColumnarSerializer',
+    'CroppedMaskOutput',
     'FluorescenceRenderer',
     'GenericMaskOutput',
+    'InstanceMaskOutput',
     'JsonPickleSerializer',
     'CsvOutput',
     'MeshOutput',
     'NoisyUnevenIlluminationPhaseContrast',
+    'PackedDatasetOutput',
     'PhaseContrastRenderer',
     'PlainRenderer',
     'PlotRenderer',
     'QuickAndDirtyTableDumper',
     'SvgRenderer',
     'TiffOutput',
+    'TiledTiffOutput',
     'TrackMateXML',
     'UnevenIlluminationPhaseContrast',
+    'VideoOutput',
     'YOLOOutput',
 ]
 
@@ -114,6 +130,36 @@ def test_training_outputs(reset_state, tmpdir):
     assert len(generated_files) > 0
 
 
+def test_training_outputs_closed(reset_state, tmpdir, monkeypatch):
+    # outputs are finished by the command, not when garbage collected
+    for output_class in (COCOOutput, PackedDatasetOutput, TiffOutput, VideoOutput):
+        monkeypatch.setattr(output_class, '__del__', lambda self: None)
+
+    output_dir = tmpdir.mkdir('result')
+
+    call_main(
+        'training',
+        prefix=True,
+        t=dict(TrainingDataCount=3, TrainingImageWidth=64, TrainingImageHeight=64),
+        output=str(output_dir) + '/output_name',
+        Output=['COCOOutput', 'PackedDatasetOutput', 'TiffOutput', 'VideoOutput'],
+    )
+
+    dataset = PackedDataset(str(output_dir.join('PackedDatasetOutput-output_name')))
+    assert len(dataset) == 3
+
+    coco = json.loads(
+        output_dir.join('COCOOutput-output_name', 'annotations.json').read()
+    )
+    assert len(coco['images']) == 3
+
+    with tifffile.TiffFile(str(output_dir.join('TiffOutput-output_name.tif'))) as tiff:
+        assert len(tiff.pages) == 3
+
+    assert not output_dir.join('TiffOutput-output_name.tif.partial').exists()
+    assert output_dir.join('VideoOutput-output_name.mp4').size() > 0
+
+
 def test_quiet_switch(reset_state, tmpdir):
     output_dir = tmpdir.mkdir('result')
 
@@ -205,6 +251,95 @@ def test_simulation_outputs(reset_state, tmpdir):
     assert len(generated_files) > 0
 
 
+def test_simulation_outputs_parallel_fresh_process(tmpdir):
+    # a fresh interpreter, as reset_state would hide state set by parsing --Output
+    output_dir = tmpdir.mkdir('result')
+
+    args = generate_commandline(
+        'simulate',
+        overwrite=True,
+        t=dict(
+            SimulationTimestep=0.1,
+            SimulationOutputInterval=0.1,
+            SimulationDuration=0.2,
+            Width=10,
+            Height=10,
+            RenderWorkers=2,
+        ),
+        output=str(output_dir) + '/output_name',
+        Output=['PlainRenderer'],
+    )
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [str(Path(__file__).parents[2])] + env.get('PYTHONPATH', '').split(os.pathsep)
+    )
+
+    subprocess.run(
+        [sys.executable, '-m', 'cellsium'] + args, env=env, check=True, timeout=600
+    )
+
+    assert len(output_dir.listdir()) > 0
+
+
+def test_simulation_outputs_parallel(reset_state, tmpdir):
+    generated_files = []
+
+    for workers in [0, 2]:
+        reset_state()
+
+        output_dir = tmpdir.mkdir('result%d' % workers)
+
+        call_main(
+            'simulate',
+            prefix=True,
+            overwrite=True,
+            t=dict(
+                SimulationTimestep=0.1,
+                SimulationOutputInterval=0.1,
+                SimulationDuration=0.2,
+                SimulationOutputFirstState=1,
+                Width=10,
+                Height=10,
+                RenderWorkers=workers,
+            ),
+            output=str(output_dir) + '/output_name',
+            Output=['COCOOutput', 'PlainRenderer', 'TiffOutput'],
+        )
+
+        generated_files.append(
+            sorted(path.relto(output_dir) for path in output_dir.visit())
+        )
+
+    assert len(generated_files[0]) > 0
+    assert generated_files[0] == generated_files[1]
+
+
+def test_simulation_fields_of_view(reset_state, tmpdir):
+    output_dir = tmpdir.mkdir('result')
+
+    call_main(
+        'simulate',
+        prefix=True,
+        overwrite=True,
+        t=dict(
+            SimulationTimestep=0.1,
+            SimulationOutputInterval=0.1,
+            SimulationDuration=0.2,
+            Width=10,
+            Height=10,
+            FieldsOfView='0,0;-5,-5;1000,1000',
+        ),
+        output=str(output_dir) + '/output_name',
+        Output=['PlainRenderer', 'TiffOutput'],
+    )
+
+    generated_files = sorted(path.basename for path in output_dir.listdir())
+
+    for number in range(3):
+        assert 'TiffOutput-FOV%03d-output_name.tif' % number in generated_files
+
+
 @pytest.mark.parametrize('s', [2, 1])
 def test_simulation_placementsimplification(s, reset_state, tmpdir):
     output_dir = tmpdir.mkdir('result')
@@ -350,7 +485,11 @@ def test_simulation_with_boundary_box2d(dxftype, reset_state, tmpdir, dxf_file):
     assert len(generated_files) > 0
 
 
-def test_render(reset_state, tmpdir):
+@pytest.mark.parametrize(
+    'serializer, extension',
+    [('JsonPickleSerializer', '.json'), ('ColumnarSerializer', '.npz')],
+)
+def test_render(serializer, extension, reset_state, tmpdir):
     output_dir = tmpdir.mkdir('result')
 
     call_main(
@@ -358,7 +497,7 @@ def test_render(reset_state, tmpdir):
         overwrite=True,
         t=dict(TrainingDataCount=1),
         output=str(output_dir) + '/output_name',
-        Output=['JsonPickleSerializer'],
+        Output=[serializer],
     )
 
     generated_files = output_dir.listdir()
@@ -373,7 +512,7 @@ def test_render(reset_state, tmpdir):
         'render',
         output=str(output_dir_2) + '/output_name',
         Output=['GenericMaskOutput'],
-        args=['--input-file', str(output_dir) + '/output_name000.json'],
+        args=['--input-file', str(output_dir) + '/output_name000' + extension],
     )
 
     generated_files = output_dir_2.listdir()
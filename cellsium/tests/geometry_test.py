@@ -1,7 +1,7 @@
 import numpy as np
 from numpy.testing import assert_array_almost_equal
 
-from ..geometry import line
+from ..geometry import add_empty_third_dimension, line, rotate3d, rotate_and_mesh
 from ..model import Shape, Shape3D
 
 
@@ -46,3 +46,30 @@ def test_shape():
 def test_shape3d():
     s = Shape3D()
     s.raw_points3d()
+
+
+def test_rotate_and_mesh():
+    points = add_empty_third_dimension(line([-1, 1], [1, 1], times=5))
+
+    steps = 8
+
+    vertices, triangles = rotate_and_mesh(points, steps=steps)
+
+    ring_length = len(points) + 2
+    assert vertices.shape == (steps * ring_length, 3)
+    assert triangles.shape == (steps * (ring_length - 1) * 2, 3)
+    assert triangles.max() < len(vertices)
+
+    # the revolution keeps the distance to the x axis
+    assert_array_almost_equal(
+        np.linalg.norm(vertices[ring_length : 2 * ring_length, 1:], axis=1),
+        np.linalg.norm(vertices[:ring_length, 1:], axis=1),
+    )
+
+    assert_array_almost_equal(
+        vertices[ring_length : 2 * ring_length],
+        rotate3d(vertices[:ring_length], 2 * np.pi / (steps - 1), ((1,), (0,), (0,))),
+    )
+
+    # connectivity only depends on the topology and is cached
+    assert rotate_and_mesh(points, steps=steps)[1] is triangles
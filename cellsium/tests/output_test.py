@@ -1,58 +1,128 @@
+import json
+import pickle
+from concurrent.futures import Future
+from copy import copy
 from pathlib import Path
 
 import cv2
 import matplotlib.pyplot
 import numpy as np
 import pytest
+import tifffile
 from numpy.testing import assert_almost_equal
+from roifile import roiread
+from tunable import TunableError
 
 from ..output import (
+    FrameContext,
     OutputReproducibleFiles,
     check_overwrite,
     ensure_extension,
     ensure_path,
 )
 from ..output.all import (
+    CellTableOutput,
     COCOOutput,
+    ColumnarSerializer,
+    CroppedMaskOutput,
     FluorescenceRenderer,
     GenericMaskOutput,
+    InstanceMaskOutput,
     JsonPickleSerializer,
     MeshOutput,
     NoisyUnevenIlluminationPhaseContrast,
     Output,
+    PackedDatasetOutput,
     PlainRenderer,
     QuickAndDirtyTableDumper,
     SvgRenderer,
     TiffOutput,
+    TiledTiffOutput,
     TrackMateXML,
+    VideoOutput,
     YOLOOutput,
 )
+from ..output.dataset import PackedDataset, PackedDatasetChunkSize
 from ..output.gt import (
     COCOEncodeRLE,
+    COCOOutputIndent,
+    COCOOutputShards,
     COCOOutputStuff,
+    CroppedMaskOutputFormat,
     GroundTruthOnlyCompleteCellsInImages,
     GroundTruthOutput,
+    InstanceMaskOutputType,
+    MaskOutputDistances,
+    MaskOutputFlows,
+    MaskOutputStarConvexRays,
+    YOLOOutputSegmentation,
     binary_to_rle,
+    convert_points_to_rle,
+    get_coco_partial_path,
+    local_binary_to_rle,
+    read_cropped_masks,
 )
 from ..output.mesh import MeshCellScaleFactor
+from ..output.parallel import RenderScheduler
 from ..output.plot import PlotRenderer
 from ..output.render import (
+    FluorescenceCellSizeFactor,
+    FluorescenceNoiseStd,
+    NoiseBank,
     OpenCVimshow,
+    PhaseContrastRenderer,
+    PhaseContrastThickness,
+    RenderCapsulesAnalytically,
     RenderChannels,
+    RenderIncremental,
+    RenderNoiseBank,
+    RenderTiled,
+    RenderTileSize,
+    RenderWithMatplotlib,
     RoiOutputScaleDelta,
     RoiOutputScaleFactor,
+    TiffOutputDisplayRange,
+    UnevenIlluminationCacheDirectory,
+    UnevenIlluminationLegacy,
+    UnevenIlluminationPhaseContrast,
+    WorldSnapshot,
     add_if_uneven,
     bytescale,
     cv2_has_write_support,
+    get_canvas_capsule_for_cell,
     get_canvas_points_for_cell,
     get_canvas_points_raw,
+    get_visible_cells,
     new_canvas,
+    offset_points,
+    render_capsules_on_canvas,
+    render_on_canvas_antialiased,
     render_on_canvas_matplotlib,
+    render_thickness_on_canvas,
     scale_points_absolute,
     scale_points_relative,
+    uneven_illumination_field,
+)
+from ..output.serialization import (
+    CellTable,
+    ColumnarSerializerCompress,
+    WorldArchive,
+    decode_column,
+    encode_column,
+    type2numpy,
+)
+from ..output.video import VideoOutputFrameStep, VideoOutputScale
+from ..output.writer import (
+    OutputPNGCompression,
+    OutputWriteMaximumPending,
+    OutputWriteThreads,
+    flush_writes,
+    submit_write,
 )
-from ..output.serialization import type2numpy
 from ..output.xml import TrackMateXMLExportFluorescences, TrackMateXMLExportLengthTypo
+from ..parameters import Height, Width, um_to_pixel
+from ..random import RRF
+from ..simulation.simulator import World
 
 
 def test_jsonpickle(simulator, capsys):
@@ -77,6 +147,140 @@ def test_jsonpickle(simulator, capsys):
     assert result == expected
 
 
+@pytest.mark.parametrize('compress', [True, False])
+def test_columnar_serializer(simulator, tmpdir, tunables, compress):
+    # a few divisions, so lineage histories are of different lengths
+    for _ in range(8):
+        simulator.step(60.0 * 60.0)
+
+    world = simulator.simulation.world
+    world.boundaries = [np.array([[0.0, 0.0], [10.0, 10.0]])]
+
+    file_name = str(tmpdir.join('world'))
+
+    with tunables((ColumnarSerializerCompress, compress)):
+        ColumnarSerializer().write(world, file_name, time=3.0)
+
+    with WorldArchive(file_name + '000.npz') as archive:
+        assert len(archive) == len(world.cells) > 1
+        assert archive.time == 3.0
+
+        assert_almost_equal(
+            archive.column('position'), [cell.position for cell in world.cells]
+        )
+
+        loaded = archive.world()
+
+    assert [cell.__class__ for cell in loaded.cells] == [
+        cell.__class__ for cell in world.cells
+    ]
+
+    assert len({len(cell.lineage_history) for cell in world.cells}) > 1
+
+    for cell, loaded_cell in zip(world.cells, loaded.cells):
+        assert loaded_cell.__dict__.keys() == cell.__dict__.keys()
+
+        for key, value in cell.__dict__.items():
+            assert type(loaded_cell.__dict__[key]) is type(value)
+            assert_almost_equal(loaded_cell.__dict__[key], value)
+
+    assert_almost_equal(loaded.boundaries[0], world.boundaries[0])
+
+
+def test_encode_column_mixed_scalars():
+    # numpy scalars are normalized, values of different Python types are not
+    for values, kind in [
+        ([1.0, np.float64(2.5), 3.0], 'scalar'),
+        ([1, np.int64(2)], 'scalar'),
+        ([True, np.bool_(False)], 'scalar'),
+        ([1, 2.5], 'json'),
+    ]:
+        spec, arrays = encode_column(values)
+
+        assert spec['kind'] == kind
+        assert decode_column(spec, arrays) == values
+
+
+def test_cell_table_output(simulator, tmpdir):
+    output = CellTableOutput()
+    path = str(tmpdir.join('table'))
+
+    world = simulator.simulation.world
+    frames = []
+
+    for n in range(6):
+        output.write(world, path, time=n * 3600.0, output_count=n)
+        frames.append([copy(cell.__dict__) for cell in world.cells])
+        simulator.step(2 * 60.0 * 60.0)
+
+    table = CellTable(path)
+
+    assert len(table) == 6
+    assert table.rows == sum(len(cells) for cells in frames)
+    assert_almost_equal(table.times, np.arange(6) * 3600.0)
+
+    cells = [cell for cells in frames for cell in cells]
+
+    assert_almost_equal(table.column('length'), [cell['length'] for cell in cells])
+    assert_almost_equal(table.column('position'), [cell['position'] for cell in cells])
+    assert_almost_equal(
+        table.row_frames(), [n for n, cells in enumerate(frames) for _ in cells]
+    )
+
+    # lineage histories grow with divisions
+    with pytest.raises(ValueError):
+        table.column('lineage_history')
+
+    values, offsets = table.ragged('lineage_history')
+
+    for row, cell in enumerate(cells):
+        assert (
+            values[offsets[row] : offsets[row + 1]].tolist() == cell['lineage_history']
+        )
+
+    last = table.frame(5)
+
+    assert last['id_'].tolist() == [cell['id_'] for cell in frames[-1]]
+
+    with pytest.raises(RuntimeError):
+        CellTableOutput().write(world, path)
+
+    other_file = Path(path) / 'other.bin'
+    other_file.write_bytes(b'')
+
+    CellTableOutput().write(world, path, overwrite=True)
+
+    assert len(CellTable(path)) == 1
+    # only files of the store are removed
+    assert other_file.exists()
+
+
+@pytest.mark.parametrize('write_threads', [0, 2])
+def test_cell_table_output_promotion(simulator, tmpdir, tunables, write_threads):
+    output = CellTableOutput()
+    path = str(tmpdir.join('table'))
+
+    world = simulator.simulation.world
+    values = []
+
+    with tunables((OutputWriteThreads, write_threads)):
+        for n in range(4):
+            for cell in world.cells:
+                # an integer attribute, becoming a float
+                cell.counter = n + (0.5 if n >= 2 else 0)
+                values.append(cell.counter)
+
+            output.write(world, path, output_count=n)
+
+        flush_writes()
+
+    table = CellTable(path)
+
+    assert table.columns['counter']['dtype'] == np.dtype(np.float64).str
+    assert_almost_equal(table.column('counter'), values)
+    assert table.column('counter')[-1] == 3.5
+
+
 def test_type2numpy_nomaxlen():
     assert type2numpy([1, 2]) == '(2,)i8'
 
@@ -174,6 +378,43 @@ def test_yolo_off_canvas_cells(simulator, tmpdir, tunables):
         output.write(simulator.simulation.world, testdir, overwrite=True)
 
 
+def test_yolo_labels(simulator, tmpdir, tunables):
+    simulator.step(60.0 * 60.0)
+
+    world = simulator.simulation.world
+    shape = new_canvas().shape
+
+    with tunables((RenderChannels, 'PlainRenderer')):
+        bboxes = FrameContext(world).get('ground_truth_bboxes', shape)
+
+        for segmentation in [False, True]:
+            testdir = Path(str(tmpdir.join('yolo-%d' % segmentation)))
+
+            with tunables((YOLOOutputSegmentation, segmentation)):
+                YOLOOutput().write(world, str(testdir))
+
+            lines = (testdir / '000000000000.txt').read_text().split('\n')
+
+            assert len(lines) == len(bboxes)
+
+            for line, bbox in zip(lines, bboxes):
+                class_, *values = line.split(' ')
+
+                assert class_ == '0'
+
+                if segmentation:
+                    expected = (bbox.points / (shape[1], shape[0])).ravel()
+                else:
+                    expected = [
+                        bbox.rel_x_center,
+                        bbox.rel_y_center,
+                        bbox.rel_x_delta,
+                        bbox.rel_y_delta,
+                    ]
+
+                assert_almost_equal(np.array(values, dtype=float), expected, decimal=3)
+
+
 def test_yolo_no_overwrite(simulator, tmpdir, tunables):
     with tunables((RenderChannels, 'PlainRenderer')):
         testdir = tmpdir.join('yoloout')
@@ -225,6 +466,44 @@ def test_coco_unreproducible_stuffthings(simulator, tmpdir, tunables):
             output.write(simulator.simulation.world, testdir, overwrite=True)
 
 
+def test_coco_streaming_sharded(simulator, tmpdir, tunables):
+    with tunables(
+        (RenderChannels, 'PlainRenderer'),
+        (COCOOutputShards, 2),
+        (COCOOutputIndent, 0),
+    ):
+        testdir = Path(str(tmpdir.join('cocoout')))
+
+        output = COCOOutput()
+
+        for _ in range(3):
+            output.write(simulator.simulation.world, str(testdir))
+
+        # flushed partial annotations are on disk while the output is open
+        partial = get_coco_partial_path(testdir / 'annotations-00000.json', 'images')
+        assert len(partial.read_text().splitlines()) == 2
+
+        output.close()
+
+    shards = [
+        json.loads((testdir / ('annotations-%05d.json' % shard)).read_text())
+        for shard in range(2)
+    ]
+
+    assert [image['id'] for image in shards[0]['images']] == [0, 2]
+    assert [image['id'] for image in shards[1]['images']] == [1]
+
+    annotation_ids = [
+        annotation['id'] for shard in shards for annotation in shard['annotations']
+    ]
+
+    assert len(annotation_ids) == 3 * len(simulator.simulation.world.cells)
+    assert len(set(annotation_ids)) == len(annotation_ids)
+
+    assert '\n' not in (testdir / 'annotations-00000.json').read_text()
+    assert not partial.exists()
+
+
 def test_genericmaskoutput_no_overwrite(simulator, tmpdir, tunables):
     with tunables((RenderChannels, 'PlainRenderer')):
 
@@ -240,6 +519,344 @@ def test_genericmaskoutput_no_overwrite(simulator, tmpdir, tunables):
             output.write(simulator.simulation.world, testdir)
 
 
+def test_instance_mask_output(simulator, tmpdir, tunables):
+    world = simulator.simulation.world
+
+    with tunables((RenderChannels, 'PlainRenderer')):
+        testdir = Path(str(tmpdir.join('instances')))
+
+        InstanceMaskOutput().write(world, str(testdir))
+
+        labels = cv2.imread(
+            str(testdir / 'labels' / '000000000000.png'), cv2.IMREAD_UNCHANGED
+        )
+        mask = FrameContext(world).get('cells_mask', labels.shape, 1, True)
+
+        assert labels.dtype == np.uint16
+        assert labels.max() == len(world.cells)
+        assert ((labels > 0) == (mask > 0)).all()
+
+        mapping = (testdir / 'mappings' / '000000000000.csv').read_text().split()
+
+        assert mapping == ['label,id'] + [
+            '%d,%d' % (label, cell.id_) for label, cell in enumerate(world.cells, 1)
+        ]
+
+        with tunables((InstanceMaskOutputType, 'uint32')):
+            InstanceMaskOutput().write(world, str(testdir), overwrite=True)
+
+        labels_32 = tifffile.imread(str(testdir / 'labels' / '000000000000.tif'))
+
+        assert labels_32.dtype == np.uint32
+        assert (labels_32 == labels).all()
+
+
+def test_cropped_mask_output(simulator, tmpdir, tunables):
+    world = simulator.simulation.world
+
+    for format_ in ['npz', 'npy']:
+        with tunables(
+            (RenderChannels, 'PlainRenderer'), (CroppedMaskOutputFormat, format_)
+        ):
+            testdir = Path(str(tmpdir.join('cropped-' + format_)))
+
+            CroppedMaskOutput().write(world, str(testdir))
+
+            mask = FrameContext(world).get('cells_mask', new_canvas().shape, 1, True)
+
+            file_name = testdir / 'masks' / '000000000000'
+            if format_ == 'npz':
+                file_name = file_name.with_suffix('.npz')
+
+            bboxes, masks = read_cropped_masks(str(file_name))
+
+            assert len(bboxes) == len(masks) == len(world.cells)
+
+            full = np.zeros_like(mask)
+
+            for (x, y, width, height), cropped in zip(bboxes, masks):
+                assert cropped.shape == (height, width)
+                full[y : y + height, x : x + width] |= cropped
+
+            assert (full == mask).all()
+
+
+def test_mask_output_targets(simulator, tmpdir, tunables, add_cell_zoo):
+    add_cell_zoo(simulator)
+
+    world = simulator.simulation.world
+
+    with tunables(
+        (RenderChannels, 'PlainRenderer'),
+        (MaskOutputDistances, True),
+        (MaskOutputFlows, True),
+        (MaskOutputStarConvexRays, 32),
+    ):
+        testdir = Path(str(tmpdir.join('targets')))
+
+        GenericMaskOutput().write(world, str(testdir))
+
+        context = FrameContext(world).get('complete_context', new_canvas().shape)
+        mask = context.get('cells_mask', new_canvas().shape, 1, True) > 0
+        bboxes = context.get('ground_truth_bboxes', new_canvas().shape)
+
+    distances = tifffile.imread(str(testdir / 'distances' / '000000000000.tif'))
+    flows = tifffile.imread(str(testdir / 'flows' / '000000000000.tif'))
+    rays = np.load(str(testdir / 'rays' / '000000000000.npy'))
+
+    assert ((distances > 0) == mask).all()
+    assert_almost_equal(np.hypot(flows[0], flows[1])[mask], 1.0, decimal=5)
+    assert (flows[:, ~mask] == 0).all()
+
+    assert rays.shape == (len(bboxes), 2 + 32)
+
+    angles = np.arange(32) * (2 * np.pi / 32)
+
+    for bbox, (x, y, *distance) in zip(bboxes, rays):
+        outline = bbox.points.astype(np.float32)
+
+        for angle, length in zip(angles, distance):
+            point = (x + length * np.cos(angle), y + length * np.sin(angle))
+            assert abs(cv2.pointPolygonTest(outline, point, True)) < 1e-3
+
+
+@pytest.mark.parametrize('write_threads', [0, 2])
+def test_packed_dataset_output(simulator, tmpdir, tunables, write_threads):
+    world = simulator.simulation.world
+
+    with tunables(
+        (RenderChannels, 'PlainRenderer'),
+        (PackedDatasetChunkSize, 2),
+        (OutputWriteThreads, write_threads),
+    ):
+        testdir = str(tmpdir.join('packed'))
+
+        output = PackedDatasetOutput()
+
+        for _ in range(5):
+            simulator.step(60.0 * 60.0)
+            output.write(world, testdir)
+
+        output.close()
+        flush_writes()
+
+        shape = new_canvas().shape
+        context = FrameContext(world).get('complete_context', shape)
+        expected_mask = context.get('instance_labels', shape, 'uint16')
+
+    dataset = PackedDataset(testdir)
+
+    assert len(dataset) == 5
+    assert len(list(Path(testdir).glob('images-*.npy'))) == 3
+
+    image, mask, boxes = dataset[4]
+
+    assert image.shape == mask.shape == shape
+    assert image.dtype == np.uint8
+    assert (mask == expected_mask).all()
+    assert boxes.shape == (len(world.cells), 4)
+
+    for (image, mask, boxes), n in zip(dataset, range(len(dataset))):
+        random_access = dataset[n]
+
+        assert (image == random_access[0]).all()
+        assert (mask == random_access[1]).all()
+        assert (boxes == random_access[2]).all()
+
+
+def test_write_behind(simulator, tmpdir, tunables):
+    with tunables(
+        (RenderChannels, 'PlainRenderer'),
+        (OutputWriteThreads, 2),
+        (OutputWriteMaximumPending, 2),
+        (OutputPNGCompression, 9),
+    ):
+        testdir = Path(str(tmpdir.join('masks')))
+
+        output = GenericMaskOutput()
+
+        for _ in range(4):
+            output.write(simulator.simulation.world, str(testdir))
+
+        flush_writes()
+
+        assert len(list((testdir / 'masks').glob('*.png'))) == 4
+
+        def _fail():
+            raise IOError()
+
+        # raised by a later submit or at the latest by flushing
+        with pytest.raises(IOError):
+            submit_write(_fail)
+            flush_writes()
+
+        flush_writes()
+
+
+def test_frame_context_shared_products(simulator, tmpdir, tunables):
+    with tunables((RenderChannels, 'PlainRenderer')):
+        world = simulator.simulation.world
+        context = FrameContext(world)
+
+        outputs = [GenericMaskOutput(), YOLOOutput(), TiffOutput()]
+
+        render_calls = []
+
+        for output in outputs:
+            channel = output.channels[0]
+
+            def counting_output(world, _output=channel.output, **kwargs):
+                render_calls.append(world)
+                return _output(world, **kwargs)
+
+            channel.output = counting_output
+
+        for n, output in enumerate(outputs):
+            output.write(world, str(tmpdir.join('out%d' % n)), context=context)
+
+        assert render_calls == [world]
+
+        shape = outputs[0].canvas_shape
+
+        assert context.get('bboxes', shape) is context.get('bboxes', shape)
+        assert len(context.get('bboxes', shape)) == len(world.cells)
+
+
+def test_frame_context_then_all(simulator):
+    context = FrameContext(simulator.simulation.world)
+
+    futures = [Future() for _ in range(3)]
+    results = []
+
+    context.then_all(futures[:0], results.append)
+
+    for n, future in enumerate(futures):
+        future.set_result(n)
+
+    context.then_all(futures, results.append)
+
+    assert results == [[0, 1, 2]]
+
+
+def test_frame_context_shared_index(simulator, tmpdir, tunables, monkeypatch):
+    world = simulator.simulation.world
+    context = FrameContext(world)
+
+    index_calls = []
+
+    def counting_index(self, _index=World.index):
+        index_calls.append(self)
+        return _index(self)
+
+    monkeypatch.setattr(World, 'index', counting_index)
+
+    with tunables((RenderChannels, 'NoisyUnevenIlluminationPhaseContrast')):
+        outputs = [GenericMaskOutput(), YOLOOutput(), TiffOutput(), VideoOutput()]
+
+        for n, output in enumerate(outputs):
+            output.write(world, str(tmpdir.join('out%d' % n)), context=context)
+
+        outputs[-1].close()
+
+    # renderers, ground truth and reduced contexts all cull via one index
+    assert index_calls == [world]
+
+
+def test_world_snapshot(reset_state, simulator, add_cell_zoo):
+    add_cell_zoo(simulator)
+
+    world = simulator.simulation.world
+    restored = pickle.loads(pickle.dumps(WorldSnapshot(world))).to_world()
+
+    assert len(restored.cells) == len(world.cells)
+
+    for cell, restored_cell in zip(world.cells, restored.cells):
+        assert_almost_equal(cell.points_on_canvas(), restored_cell.points_on_canvas())
+        assert getattr(cell, 'fluorescences', []) == getattr(
+            restored_cell, 'fluorescences', []
+        )
+
+
+def test_render_scheduler(reset_state, simulator, add_cell_zoo):
+    add_cell_zoo(simulator)
+
+    world = simulator.simulation.world
+    renderer = NoisyUnevenIlluminationPhaseContrast()
+
+    expected = PlainRenderer().output(world)
+
+    results = []
+
+    for workers in [1, 2]:
+        with RenderScheduler(workers=workers) as scheduler:
+            plain = scheduler.submit(PlainRenderer(), world)
+            noisy = [scheduler.submit(renderer, world) for _ in range(3)]
+
+            assert_almost_equal(plain.result(), expected)
+
+            results.append([future.result() for future in noisy])
+
+    for first, second in zip(*results):
+        assert_almost_equal(first, second)
+
+    assert np.abs(results[0][0] - results[0][1]).max() > 0.0
+
+
+@pytest.mark.parametrize(
+    'renderer_class', [PlainRenderer, PhaseContrastRenderer, FluorescenceRenderer]
+)
+def test_render_scheduler_sequential(
+    reset_state, simulator, add_cell_zoo, renderer_class
+):
+    add_cell_zoo(simulator)
+
+    world = simulator.simulation.world
+
+    # renderers without per-frame random numbers render the same in workers
+    expected = [renderer_class().output(world) for _ in range(2)]
+
+    with RenderScheduler(workers=2) as scheduler:
+        futures = [scheduler.submit(renderer_class(), world) for _ in range(2)]
+
+        parallel = [future.result() for future in futures]
+
+    if renderer_class is FluorescenceRenderer:
+        # emitters are drawn per frame from generators reseeded per submission,
+        # sequential frames continue one stream instead
+        assert np.abs(parallel[0] - expected[0]).max() > 0.0
+    else:
+        for image, expected_image in zip(parallel, expected):
+            assert_almost_equal(image, expected_image)
+
+
+def test_render_scheduler_constructed_renderers(reset_state, simulator, add_cell_zoo):
+    add_cell_zoo(simulator)
+
+    world = simulator.simulation.world
+
+    results = []
+
+    for workers in [1, 3]:
+        with RenderScheduler(workers=workers) as scheduler:
+            futures = []
+
+            # the illumination is drawn when the renderer is constructed, which
+            # happens after a varying number of other renderers in each worker
+            for _ in range(6):
+                scheduler.submit(FluorescenceRenderer(), world)
+                futures.append(
+                    scheduler.submit(UnevenIlluminationPhaseContrast(), world)
+                )
+
+            results.append([future.result() for future in futures])
+
+    for images in results:
+        for image in images[1:]:
+            assert_almost_equal(image, images[0])
+
+    assert_almost_equal(results[0][0], results[1][0])
+
+
 def test_mesh_scale(reset_state, simulator, tmpdir, tunables):
     testfile = tmpdir.join('testfile.stl')
 
@@ -296,6 +913,57 @@ def test_render_debug(reset_state, simulator, tmpdir, add_cell_zoo, chdir):
     assert len(new_pwd.listdir()) > 0
 
 
+def test_render_phase_contrast_buffers(reset_state, simulator):
+    output = NoisyUnevenIlluminationPhaseContrast()
+
+    first = output.output(simulator.simulation.world)
+    second = output.output(simulator.simulation.world)
+
+    assert first.dtype == second.dtype == np.float32
+    assert not np.shares_memory(first, second)
+    assert_almost_equal(first.mean(), second.mean(), decimal=3)
+
+
+def test_render_uneven_illumination_cache(reset_state, tmpdir, tunables):
+    cache_dir = tmpdir.mkdir('cache')
+
+    with tunables((UnevenIlluminationCacheDirectory, str(cache_dir))):
+        generated = UnevenIlluminationPhaseContrast().uneven_illumination
+
+        cached_files = cache_dir.listdir()
+
+        assert len(cached_files) > 0
+
+        RRF.seed(1)
+
+        cached = UnevenIlluminationPhaseContrast().uneven_illumination
+
+        assert cache_dir.listdir() == cached_files
+
+    assert_almost_equal(generated, cached)
+
+    another = UnevenIlluminationPhaseContrast().uneven_illumination
+
+    assert np.abs(another - generated).max() > 0.0
+
+
+def test_render_uneven_illumination_legacy(reset_state, tunables):
+    with tunables((UnevenIlluminationLegacy, True), (Width, 10.0), (Height, 10.0)):
+        legacy = UnevenIlluminationPhaseContrast()
+
+    assert legacy.uneven_illumination.dtype == np.float32
+
+
+def test_render_uneven_illumination_field():
+    rng = np.random.default_rng(1)
+
+    fields = np.array([uneven_illumination_field((64, 96), rng=rng) for _ in range(8)])
+
+    assert fields.shape == (8, 64, 96)
+    assert_almost_equal(fields.mean(), 0.6, decimal=1)
+    assert 0.05 < fields.std() < 0.2
+
+
 def test_render_bytescale_nochange():
     input_data = np.zeros((256, 256), dtype=np.uint8)
 
@@ -320,6 +988,159 @@ def test_fluorescence_not_the_right_channel(
     output.write(simulator.simulation.world, testfile)
 
 
+def test_fluorescence_emitters(reset_state, simulator, add_cell_zoo, tunables):
+    add_cell_zoo(simulator)
+
+    cell = simulator.simulation.world.cells[-1]
+    cell.position = [Width.value / 2, Height.value / 2]
+    cell.fluorescences = [1000.0]
+
+    world = World()
+    world.add(cell)
+    world.commit()
+
+    area = cv2.contourArea(um_to_pixel(cell.points_on_canvas()).astype(np.int32))
+    emitter_count = np.ceil(
+        cell.fluorescences[0] * area / FluorescenceCellSizeFactor.value
+    )
+
+    with tunables((FluorescenceNoiseStd, 0.0)):
+        output = FluorescenceRenderer()
+
+        canvas = output.output(world)
+
+    assert_almost_equal(canvas.sum() / emitter_count, 1.0, decimal=2)
+
+
+def test_render_noise_bank(reset_state, simulator, tunables):
+    bank = NoiseBank(np.random.default_rng(1), tiles=4, tile_size=32)
+
+    noise = bank.normal(np.empty((100, 70), dtype=np.float32), 1.0, 0.5)
+
+    assert noise.dtype == np.float32
+    assert_almost_equal(noise.mean(), 1.0, decimal=1)
+    assert_almost_equal(noise.std(), 0.5, decimal=1)
+
+    def render():
+        RRF.seed(1)
+        renderers = [NoisyUnevenIlluminationPhaseContrast(), FluorescenceRenderer()]
+        return [renderer.output(simulator.simulation.world) for renderer in renderers]
+
+    with tunables((RenderNoiseBank, True)):
+        first, second = render(), render()
+
+    for first_canvas, second_canvas in zip(first, second):
+        assert first_canvas.dtype == np.float32
+        assert_almost_equal(first_canvas, second_canvas)
+
+
+def test_render_visible_cells(reset_state, simulator, add_cell_zoo, tunables):
+    add_cell_zoo(simulator)
+
+    world = simulator.simulation.world
+    visible = list(world.cells)
+
+    expected = PlainRenderer().output(world)
+
+    far_away = copy(world.cells[0])
+    far_away.position = [-1000.0, -1000.0]
+    world.add(far_away)
+    world.commit()
+
+    assert get_visible_cells(world) == visible
+    assert_almost_equal(PlainRenderer().output(world), expected)
+
+
+def test_render_incremental(reset_state, simulator, add_cell_zoo, tunables):
+    add_cell_zoo(simulator)
+
+    world = simulator.simulation.world
+
+    with tunables((RenderIncremental, True)):
+        renderer = PhaseContrastRenderer()
+        renderer.output(world)
+        cell_canvas = renderer.cell_canvas
+        buffers = dict(renderer.buffers)
+
+        cell = world.cells[1]
+        cell.position = [cell.position[0] + 1.5, cell.position[1] - 0.5]
+        world.remove(world.cells[3])
+        world.commit()
+
+        incremental = renderer.output(world)
+
+        # only the changed region was re-rendered, within the existing buffers
+        assert renderer.cell_canvas is cell_canvas
+        assert all(renderer.buffers[name] is buffers[name] for name in buffers)
+
+        # nothing changed, the previous image is reused
+        assert_almost_equal(renderer.output(world), incremental)
+
+    full = PhaseContrastRenderer().output(world)
+
+    assert_almost_equal(incremental, full, decimal=5)
+
+
+def test_render_tiled(reset_state, simulator, add_cell_zoo, tunables, tmpdir):
+    add_cell_zoo(simulator)
+
+    world = simulator.simulation.world
+
+    def assemble(renderer):
+        canvas = new_canvas()
+
+        for (x_min, y_min, x_max, y_max), image in renderer.output_tiles(world, 128):
+            canvas[y_min:y_max, x_min:x_max] = image
+
+        return canvas
+
+    assert_almost_equal(
+        assemble(PhaseContrastRenderer()),
+        PhaseContrastRenderer().output(world),
+        decimal=5,
+    )
+
+    RRF.seed(1)
+    expected = UnevenIlluminationPhaseContrast().output(world)
+
+    with tunables((RenderTiled, True)):
+        RRF.seed(1)
+        renderer = UnevenIlluminationPhaseContrast()
+
+        assert renderer.uneven_illumination is None
+        assert_almost_equal(assemble(renderer), expected, decimal=5)
+
+    with tunables(
+        (RenderChannels, 'PhaseContrastRenderer'),
+        (RenderTileSize, 128),
+        (RenderTiled, False),
+    ):
+        TiledTiffOutput().write(world, str(tmpdir.join('tiled')))
+
+        image = tifffile.imread(str(tmpdir.join('tiled.tif')))
+
+    expected = PlainRenderer.convert(PhaseContrastRenderer().output(world))
+
+    assert image.shape == (1,) + expected.shape
+    assert np.abs(image[0].astype(int) - expected).max() <= 1
+
+    with pytest.raises(RuntimeError):
+        next(FluorescenceRenderer().output_tiles(world))
+
+    # tiled output enables tiled rendering, and tiles align with TIFF tiles
+    with tunables(
+        (RenderChannels, 'UnevenIlluminationPhaseContrast'), (RenderTiled, False)
+    ):
+
+        output = TiledTiffOutput()
+
+        assert RenderTiled.value
+        assert output.channels[0].uneven_illumination is None
+
+        with pytest.raises(TunableError):
+            RenderTileSize.set(100)
+
+
 def test_render_multichannel_tif(
     reset_state, simulator, tmpdir, add_cell_zoo, tunables
 ):
@@ -333,6 +1154,79 @@ def test_render_multichannel_tif(
         output = TiffOutput()
 
         output.write(simulator.simulation.world, file_name=str(testfile))
+        output.write(simulator.simulation.world, file_name=str(testfile))
+        output.close()
+
+    with tifffile.TiffFile(str(testfile)) as tiff:
+        assert tiff.is_imagej
+        image = tiff.asarray()
+        overlays = tiff.imagej_metadata['Overlays']
+
+    assert image.dtype == np.uint8
+    assert image.shape[:2] == (2, 2)
+    for c in range(2):
+        assert image[:, c].min() == 0
+        assert image[:, c].max() == 255
+
+    assert len(overlays) == 2 * len(simulator.simulation.world.cells)
+    assert not Path(str(testfile) + '.partial').exists()
+
+    with tunables((RenderChannels, 'PlainRenderer'), (TiffOutputDisplayRange, '0,2')):
+        output = TiffOutput()
+
+        output.write(simulator.simulation.world, file_name=str(testfile))
+        output.close()
+
+    expected = PlainRenderer().output(simulator.simulation.world)
+
+    with tifffile.TiffFile(str(testfile)) as tiff:
+        image = tiff.asarray()
+
+    assert np.abs(image.astype(int) - expected * 127.5).max() <= 1
+    assert len(roiread(str(tmpdir.join('testfile-RoiSet.zip')))) == len(
+        simulator.simulation.world.cells
+    )
+
+
+def test_video_output(reset_state, simulator, tmpdir, add_cell_zoo, tunables):
+    add_cell_zoo(simulator)
+
+    world = simulator.simulation.world
+    expected = PlainRenderer().output(world)
+
+    with tunables(
+        (RenderChannels, 'PlainRenderer'),
+        (VideoOutputFrameStep, 2),
+        (VideoOutputScale, 0.5),
+    ):
+        output = VideoOutput()
+
+        frame = output.output(world)
+
+        assert frame.dtype == np.uint8
+        assert frame.shape == tuple(int(round(size * 0.5)) for size in expected.shape)
+
+        for _ in range(4):
+            output.write(world, str(tmpdir.join('video')))
+
+        output.close()
+
+        with pytest.raises(RuntimeError):
+            VideoOutput().write(world, str(tmpdir.join('video')))
+
+    capture = cv2.VideoCapture(str(tmpdir.join('video.mp4')))
+
+    frames = []
+    while True:
+        success, image = capture.read()
+        if not success:
+            break
+        frames.append(image)
+
+    capture.release()
+
+    assert len(frames) == 2
+    assert frames[0].shape == frame.shape + (3,)
 
 
 def test_render_renderchannels_nonsense(tunables):
@@ -424,6 +1318,140 @@ def test_render_on_canvas_matplotlib_obscure_options(simulator, monkeypatch, nop
     render_on_canvas_matplotlib(canvas, array_of_points, over_sample=2)
 
 
+def test_render_antialiased_like_matplotlib(reset_state, simulator, add_cell_zoo):
+    add_cell_zoo(simulator)
+
+    canvas = new_canvas()
+    array_of_points = [
+        get_canvas_points_raw(cell, canvas.shape[0])
+        for cell in simulator.simulation.world.cells
+    ]
+
+    reference = render_on_canvas_matplotlib(new_canvas(), array_of_points)
+    result = render_on_canvas_antialiased(new_canvas(), array_of_points)
+
+    assert result.dtype == canvas.dtype
+    assert 0.0 <= result.min() and result.max() <= 1.0
+    assert np.abs(result - reference).mean() < 0.005
+    assert_almost_equal(result.sum() / reference.sum(), 1.0, decimal=1)
+
+
+def test_render_with_matplotlib(simulator, tunables):
+    with tunables((RenderWithMatplotlib, True)):
+        assert PlainRenderer().output(simulator.simulation.world).max() == 1.0
+
+
+def test_render_default_matches_matplotlib(
+    reset_state, simulator, add_cell_zoo, tunables
+):
+    add_cell_zoo(simulator)
+
+    world = simulator.simulation.world
+
+    # the default rasterization (capsules and anti-aliased polygons) against the
+    # previous default, matplotlib
+    result = PlainRenderer().output(world)
+
+    with tunables((RenderWithMatplotlib, True)):
+        reference = PlainRenderer().output(world)
+
+    assert np.abs(result - reference).mean() < 0.005
+    assert ((result > 0.5) == (reference > 0.5)).mean() > 0.99
+    assert_almost_equal(result.sum() / reference.sum(), 1.0, decimal=1)
+
+
+def test_render_offset_points():
+    points = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0]])
+
+    assert id(offset_points(points)) == id(points)
+
+    assert_almost_equal(
+        np.ptp(offset_points(points, 0.5), axis=0), 2 * [1.0 + np.sqrt(0.5)]
+    )
+    assert_almost_equal(
+        np.ptp(offset_points(points[::-1], 0.5), axis=0),
+        2 * [1.0 + np.sqrt(0.5)],
+    )
+
+
+def test_render_capsules(reset_state, simulator, add_cell_zoo):
+    add_cell_zoo(simulator)
+
+    height = new_canvas().shape[0]
+
+    capsules, array_of_points = [], []
+
+    for cell in simulator.simulation.world.cells:
+        capsule = get_canvas_capsule_for_cell(cell, height)
+        if capsule is not None:
+            capsules.append(capsule)
+            array_of_points.append(get_canvas_points_raw(cell, height))
+
+    # the RodShaped and the Coccoid cell
+    assert len(capsules) == 2
+
+    reference = render_on_canvas_antialiased(new_canvas(), array_of_points)
+    result = render_capsules_on_canvas(new_canvas(), capsules)
+
+    assert np.abs(result - reference).mean() < 0.005
+
+    thickness = new_canvas()
+    render_capsules_on_canvas(None, capsules, thickness=thickness)
+
+    reference_thickness = render_thickness_on_canvas(new_canvas(), array_of_points)
+
+    assert np.abs(thickness - reference_thickness).mean() < 0.01
+    assert ((thickness > 0) == (result > 0.5)).mean() > 0.99
+
+
+def test_render_output_thickness(reset_state, simulator, add_cell_zoo, tunables):
+    add_cell_zoo(simulator)
+
+    output = PlainRenderer()
+
+    for analytically in [True, False]:
+        with tunables((RenderCapsulesAnalytically, analytically)):
+            thickness = output.output_thickness(simulator.simulation.world)
+            assert thickness.max() > 0.5
+
+
+def test_render_phase_contrast_thickness(
+    reset_state, simulator, add_cell_zoo, tunables
+):
+    add_cell_zoo(simulator)
+
+    world = simulator.simulation.world
+
+    coverage = PhaseContrastRenderer().output(world)
+
+    with tunables((PhaseContrastThickness, 1.0)):
+        full = PhaseContrastRenderer().output(world)
+
+        assert np.abs(full - coverage).max() > 0.01
+
+        # the thickness is rendered consistently by tiles and dirty regions
+        canvas = new_canvas()
+
+        for (x_min, y_min, x_max, y_max), image in PhaseContrastRenderer().output_tiles(
+            world, 128
+        ):
+            canvas[y_min:y_max, x_min:x_max] = image
+
+        assert_almost_equal(canvas, full, decimal=5)
+
+        with tunables((RenderIncremental, True)):
+            renderer = PhaseContrastRenderer()
+            renderer.output(world)
+
+            cell = world.cells[1]
+            cell.position = [cell.position[0] + 1.5, cell.position[1] - 0.5]
+            world.commit()
+
+            incremental = renderer.output(world)
+
+        assert_almost_equal(incremental, PhaseContrastRenderer().output(world), 5)
+
+
 def test_rle():
     mask = np.zeros((128, 128), dtype=bool)
     mask[32 : 32 + 64, 32 : 32 + 64] = 1
@@ -433,6 +1461,31 @@ def test_rle():
     assert result.ravel().tolist() == ([4128] + ([64] * 127) + [4128])
 
 
+def test_rle_bbox_local():
+    shape = (64, 48)
+    angles = np.linspace(0, 2 * np.pi, 17)[:-1]
+
+    for x, y, radius in [(20.3, 30.7, 9.5), (2.0, 10.0, 6.0), (40.0, 60.5, 12.0)]:
+        points = np.c_[x + radius * np.cos(angles), y + 0.5 * radius * np.sin(angles)]
+
+        mask = np.zeros(shape, dtype=np.float32)
+        cv2.fillPoly(mask, points[np.newaxis].astype(np.int32), 1.0)
+
+        assert (
+            convert_points_to_rle(points, shape).tolist()
+            == binary_to_rle(mask > 0.5).tolist()
+        )
+
+    # a run continuing from one column into the next
+    mask = np.zeros(shape, dtype=bool)
+    mask[40:, 10] = mask[:5, 11] = True
+
+    assert (
+        local_binary_to_rle(mask[:, 10:12], (0, 10), shape).tolist()
+        == binary_to_rle(mask).tolist()
+    )
+
+
 def test_output_dummy():
     output = object.__new__(Output)
     output.output(None)
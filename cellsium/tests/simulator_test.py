@@ -1,6 +1,9 @@
+import numpy as np
+
+from cellsium.model import CellGeometry, Coccoid
 from cellsium.simulation import BaseSimulator
 from cellsium.simulation.placement import Chipmunk
-from cellsium.simulation.simulator import Simulator, Timestep
+from cellsium.simulation.simulator import CellIndex, Simulator, Timestep
 
 
 def test_simulator_empty(simulator):
@@ -46,6 +49,71 @@ def test_simulator_timestep():
     assert ts.time_hours == 0.5
 
 
+def test_cell_index():
+    rng = np.random.default_rng(1)
+
+    class Cell(Coccoid, CellGeometry):
+        pass
+
+    cells = []
+
+    for _ in range(500):
+        cell = Cell()
+        cell.position = rng.uniform(-50.0, 150.0, 2).tolist()
+        cell.angle = 0.0
+        cell.length = rng.uniform(0.5, 4.0)
+        cells.append(cell)
+
+    unbounded = object()
+    cells.insert(10, unbounded)
+
+    index = CellIndex(cells)
+
+    for x_min, y_min in rng.uniform(-60.0, 160.0, (25, 2)):
+        x_max, y_max = x_min + rng.uniform(0.0, 60.0), y_min + rng.uniform(0.0, 60.0)
+
+        expected = [
+            cell
+            for cell in cells
+            if cell is unbounded
+            or np.hypot(
+                max(x_min - cell.position[0], cell.position[0] - x_max, 0.0),
+                max(y_min - cell.position[1], cell.position[1] - y_max, 0.0),
+            )
+            <= cell.length / 2.0
+        ]
+
+        assert index.query(x_min, y_min, x_max, y_max) == expected
+
+    assert CellIndex([]).query(0.0, 0.0, 1.0, 1.0) == []
+
+    subset = cells[::2]
+    subset_index = index.subset(subset)
+
+    assert subset_index.query(-60.0, -60.0, 160.0, 160.0) == subset
+    assert subset_index.query(0.0, 0.0, 50.0, 50.0) == [
+        cell for cell in index.query(0.0, 0.0, 50.0, 50.0) if cell in subset
+    ]
+
+
+def test_world_view(simulator):
+    world = simulator.simulation.world
+    world.add_boundary([[0.0, 0.0], [10.0, 0.0], [10.0, 10.0]])
+
+    cell = world.cells[0]
+    x, y = cell.position
+
+    view = world.view(x - 5.0, y - 5.0, 10.0, 10.0)
+
+    assert len(view.cells) == 1
+    assert view.cells[0] is not cell
+    assert view.cells[0].position == [5.0, 5.0]
+    assert cell.position == [x, y]
+    assert np.allclose(view.boundaries[0][0], [5.0 - x, 5.0 - y])
+
+    assert world.view(x + 100.0, y + 100.0, 10.0, 10.0).cells == []
+
+
 def test_simulator_basesimulator_class():
     bs = BaseSimulator()
 